@@ -4,6 +4,9 @@ import os
 import shutil
 import base64
 import redis
+import threading
+import time
+import uuid
 
 from datetime import datetime
 from pathlib import Path
@@ -255,9 +258,28 @@ class PersistentConfig(Generic[T]):
         self.config_value = self.value
 
 
+REDIS_CONFIG_PREFIX = "open-webui:config"
+
+# Seconds between checks of the config version in Redis, to catch up on the updates
+# missed while disconnected from the pub/sub channel
+REDIS_CONFIG_SYNC_INTERVAL = 10
+
+
 class AppConfig:
+    """
+    Config values, read from memory. With Redis, every update is also stored in Redis
+    and published on a channel with the incremented config version. Each worker
+    applies the updates it receives on a listener thread, and reloads every value when
+    its version falls behind the one in Redis.
+
+    The values stored in Redis are loaded, and the listener started, by start(): once
+    every config key is registered.
+    """
+
     _state: dict[str, PersistentConfig]
     _redis: Optional[redis.Redis] = None
+    _version: int = 0
+    _listener: Optional[threading.Thread] = None
 
     def __init__(
         self, redis_url: Optional[str] = None, redis_sentinels: Optional[list] = []
@@ -268,40 +290,120 @@ class AppConfig:
                 "_redis",
                 get_redis_connection(redis_url, redis_sentinels, decode_responses=True),
             )
+            # Updates published by this worker are already applied
+            super().__setattr__("_origin", str(uuid.uuid4()))
+
+    def start(self):
+        if self._redis is None or self._listener is not None:
+            return
+
+        # Every value in one round trip, then the updates published from now on
+        self._sync_from_redis()
+        super().__setattr__(
+            "_listener",
+            threading.Thread(target=self._listen, name="config-listener", daemon=True),
+        )
+        self._listener.start()
 
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
             self._state[key] = value
+            if self._listener is not None:
+                # Registered late, after the values were loaded
+                self._load_from_redis([key])
         else:
             self._state[key].value = value
             self._state[key].save()
 
             if self._redis:
-                redis_key = f"open-webui:config:{key}"
-                self._redis.set(redis_key, json.dumps(self._state[key].value))
+                redis_key = f"{REDIS_CONFIG_PREFIX}:{key}"
+                pipe = self._redis.pipeline()
+                pipe.set(redis_key, json.dumps(self._state[key].value))
+                pipe.incr(f"{REDIS_CONFIG_PREFIX}:version")
+                _, version = pipe.execute()
+
+                if version != self._version + 1:
+                    # Updates of other workers were missed
+                    self._load_from_redis([name for name in self._state if name != key])
+                super().__setattr__("_version", version)
+                self._redis.publish(
+                    REDIS_CONFIG_PREFIX,
+                    json.dumps(
+                        {
+                            "key": key,
+                            "value": self._state[key].value,
+                            "version": version,
+                            "origin": self._origin,
+                        }
+                    ),
+                )
 
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
-        # If Redis is available, check for an updated value
-        if self._redis:
-            redis_key = f"open-webui:config:{key}"
-            redis_value = self._redis.get(redis_key)
+        return self._state[key].value
 
-            if redis_value is not None:
-                try:
-                    decoded_value = json.loads(redis_value)
+    def _set_value(self, key: str, value):
+        # Update the in-memory value if different
+        if self._state[key].value != value:
+            self._state[key].value = value
+            log.info(f"Updated {key} from Redis: {value}")
 
-                    # Update the in-memory value if different
-                    if self._state[key].value != decoded_value:
-                        self._state[key].value = decoded_value
-                        log.info(f"Updated {key} from Redis: {decoded_value}")
+    def _load_from_redis(self, keys: list[str]):
+        redis_values = self._redis.mget(
+            [f"{REDIS_CONFIG_PREFIX}:{key}" for key in keys]
+        )
+        for key, redis_value in zip(keys, redis_values):
+            if redis_value is None:
+                continue
+            try:
+                self._set_value(key, json.loads(redis_value))
+            except json.JSONDecodeError:
+                log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+
+    def _sync_from_redis(self):
+        version = int(self._redis.get(f"{REDIS_CONFIG_PREFIX}:version") or 0)
+        if version != self._version:
+            self._load_from_redis(list(self._state))
+            super().__setattr__("_version", version)
+
+    def _apply_message(self, data: str):
+        try:
+            update = json.loads(data)
+        except json.JSONDecodeError:
+            return
 
-                except json.JSONDecodeError:
-                    log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+        if update.get("origin") == self._origin or update["key"] not in self._state:
+            return
 
-        return self._state[key].value
+        self._set_value(update["key"], update["value"])
+        if update["version"] == self._version + 1:
+            super().__setattr__("_version", update["version"])
+        else:
+            # Updates were missed, or arrived out of order
+            self._sync_from_redis()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CONFIG_PREFIX)
+                # Updates published before the subscription
+                self._sync_from_redis()
+
+                last_sync = time.monotonic()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._apply_message(message["data"])
+
+                    if time.monotonic() - last_sync >= REDIS_CONFIG_SYNC_INTERVAL:
+                        self._sync_from_redis()
+                        last_sync = time.monotonic()
+            except Exception as e:
+                log.warning(f"Config listener disconnected from Redis: {e}")
+                time.sleep(1)
 
 
 ####################################
@@ -1659,6 +1761,17 @@ Ensure that the tools are effectively utilized to achieve the highest-quality an
 
 VECTOR_DB = os.environ.get("VECTOR_DB", "chroma")
 
+# Quantized vector storage where supported (qdrant, local): int8 or binary
+VECTOR_DB_QUANTIZATION = os.environ.get("VECTOR_DB_QUANTIZATION", "").lower()
+# Candidates per result found on the quantized codes, then rescored on the full vectors.
+# Binary codes lose more precision than int8 and need a larger factor for the same recall.
+VECTOR_DB_QUANTIZATION_OVERSAMPLING = float(
+    os.environ.get(
+        "VECTOR_DB_QUANTIZATION_OVERSAMPLING",
+        "8" if VECTOR_DB_QUANTIZATION == "binary" else "2",
+    )
+)
+
 # Chroma
 CHROMA_DATA_PATH = f"{DATA_DIR}/vector_db"
 
@@ -1723,6 +1836,50 @@ if VECTOR_DB == "pgvector" and not PGVECTOR_DB_URL.startswith("postgres"):
 PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH = int(
     os.environ.get("PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH", "1536")
 )
+# Index of the whole table: ivfflat, hnsw or none
+PGVECTOR_INDEX_METHOD = os.environ.get("PGVECTOR_INDEX_METHOD", "ivfflat").lower()
+PGVECTOR_IVFFLAT_LISTS = int(os.environ.get("PGVECTOR_IVFFLAT_LISTS", "100"))
+PGVECTOR_HNSW_M = int(os.environ.get("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(
+    os.environ.get("PGVECTOR_HNSW_EF_CONSTRUCTION", "64")
+)
+# Per query search settings, the server defaults apply when unset
+PGVECTOR_IVFFLAT_PROBES = (
+    int(os.environ.get("PGVECTOR_IVFFLAT_PROBES"))
+    if os.environ.get("PGVECTOR_IVFFLAT_PROBES")
+    else None
+)
+PGVECTOR_HNSW_EF_SEARCH = (
+    int(os.environ.get("PGVECTOR_HNSW_EF_SEARCH"))
+    if os.environ.get("PGVECTOR_HNSW_EF_SEARCH")
+    else None
+)
+# Partial HNSW index per collection, once a collection reaches the given number of rows
+PGVECTOR_ENABLE_COLLECTION_INDEXES = (
+    os.environ.get("PGVECTOR_ENABLE_COLLECTION_INDEXES", "False").lower() == "true"
+)
+PGVECTOR_COLLECTION_INDEX_MIN_ROWS = int(
+    os.environ.get("PGVECTOR_COLLECTION_INDEX_MIN_ROWS", "1000")
+)
+
+# Local
+LOCAL_VECTOR_DB_PATH = os.environ.get(
+    "LOCAL_VECTOR_DB_PATH", f"{DATA_DIR}/vector_db_local"
+)
+LOCAL_VECTOR_DB_HNSW_M = int(os.environ.get("LOCAL_VECTOR_DB_HNSW_M", "16"))
+LOCAL_VECTOR_DB_HNSW_EF_CONSTRUCTION = int(
+    os.environ.get("LOCAL_VECTOR_DB_HNSW_EF_CONSTRUCTION", "100")
+)
+LOCAL_VECTOR_DB_HNSW_EF_SEARCH = int(
+    os.environ.get("LOCAL_VECTOR_DB_HNSW_EF_SEARCH", "64")
+)
+
+# Garbage collection of the collections left behind by deleted files and knowledge bases,
+# and of the unreferenced ones (web searches, URLs and texts added to chats) after a TTL.
+# Interval in seconds, 0 disables it.
+VECTOR_DB_GC_INTERVAL = int(os.environ.get("VECTOR_DB_GC_INTERVAL", "86400"))
+VECTOR_DB_GC_TTL = int(os.environ.get("VECTOR_DB_GC_TTL", str(30 * 86400)))
+VECTOR_DB_GC_BATCH_SIZE = int(os.environ.get("VECTOR_DB_GC_BATCH_SIZE", "100"))
 
 ####################################
 # Information Retrieval (RAG)
@@ -1824,12 +1981,23 @@ ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     os.environ.get("ENABLE_RAG_HYBRID_SEARCH", "").lower() == "true",
 )
 
+# Rank the results of multiple queries by reciprocal rank fusion instead of best distance
+ENABLE_RAG_RECIPROCAL_RANK_FUSION = (
+    os.environ.get("ENABLE_RAG_RECIPROCAL_RANK_FUSION", "False").lower() == "true"
+)
+
 RAG_FULL_CONTEXT = PersistentConfig(
     "RAG_FULL_CONTEXT",
     "rag.full_context",
     os.getenv("RAG_FULL_CONTEXT", "False").lower() == "true",
 )
 
+# Chunks read per request when gathering whole collections in full context mode
+RAG_FULL_CONTEXT_BATCH_SIZE = int(os.environ.get("RAG_FULL_CONTEXT_BATCH_SIZE", "1000"))
+
+# Upper bound on the tokens of full context mode, used when the model has no num_ctx (0 = no limit)
+RAG_FULL_CONTEXT_MAX_TOKENS = int(os.environ.get("RAG_FULL_CONTEXT_MAX_TOKENS", "0"))
+
 RAG_FILE_MAX_COUNT = PersistentConfig(
     "RAG_FILE_MAX_COUNT",
     "rag.file.max_count",
@@ -1887,6 +2055,17 @@ RAG_EMBEDDING_BATCH_SIZE = PersistentConfig(
     ),
 )
 
+RAG_REINDEX_CONCURRENCY = int(os.environ.get("RAG_REINDEX_CONCURRENCY", "4"))
+
+# Local embedding models run on one worker thread, which coalesces concurrent requests
+# into batches of up to this many texts, waiting at most this many milliseconds for more
+RAG_EMBEDDING_WORKER_BATCH_SIZE = int(
+    os.environ.get("RAG_EMBEDDING_WORKER_BATCH_SIZE", "64")
+)
+RAG_EMBEDDING_WORKER_MAX_WAIT_MS = float(
+    os.environ.get("RAG_EMBEDDING_WORKER_MAX_WAIT_MS", "5")
+)
+
 RAG_EMBEDDING_QUERY_PREFIX = os.environ.get("RAG_EMBEDDING_QUERY_PREFIX", None)
 
 RAG_EMBEDDING_CONTENT_PREFIX = os.environ.get("RAG_EMBEDDING_CONTENT_PREFIX", None)
@@ -1912,6 +2091,19 @@ RAG_RERANKING_MODEL_TRUST_REMOTE_CODE = (
     os.environ.get("RAG_RERANKING_MODEL_TRUST_REMOTE_CODE", "True").lower() == "true"
 )
 
+# Reranker scores kept in memory, per (model, query, chunk); 0 disables the cache
+RAG_RERANKING_SCORE_CACHE_SIZE = int(
+    os.environ.get("RAG_RERANKING_SCORE_CACHE_SIZE", "100000")
+)
+
+# Token embeddings of the documents seen by a ColBERT reranker, kept on disk up to this
+# size and then compacted to half of it
+RAG_COLBERT_EMBEDDINGS_CACHE_MAX_SIZE = (
+    int(os.environ.get("RAG_COLBERT_EMBEDDINGS_CACHE_MAX_SIZE_MB", "1024"))
+    * 1024
+    * 1024
+)
+
 
 RAG_TEXT_SPLITTER = PersistentConfig(
     "RAG_TEXT_SPLITTER",
@@ -2062,12 +2254,26 @@ WEB_SEARCH_CONCURRENT_REQUESTS = PersistentConfig(
     int(os.getenv("WEB_SEARCH_CONCURRENT_REQUESTS", "10")),
 )
 
+# Calls to the search engine API, shared by all the queries being searched concurrently
+WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS = int(
+    os.getenv("WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS", "4")
+)
+WEB_SEARCH_ENGINE_REQUESTS_PER_SECOND = float(
+    os.getenv("WEB_SEARCH_ENGINE_REQUESTS_PER_SECOND", "5")
+)
+
 WEB_LOADER_ENGINE = PersistentConfig(
     "WEB_LOADER_ENGINE",
     "rag.web.loader.engine",
     os.environ.get("WEB_LOADER_ENGINE", ""),
 )
 
+# Fetched pages are cached on disk, shared by all users; a maximum size of 0 disables it
+WEB_LOADER_CACHE_DIR = os.environ.get("WEB_LOADER_CACHE_DIR", f"{CACHE_DIR}/web")
+WEB_LOADER_CACHE_MAX_SIZE = (
+    int(os.environ.get("WEB_LOADER_CACHE_MAX_SIZE_MB", "256")) * 1024 * 1024
+)
+
 ENABLE_WEB_LOADER_SSL_VERIFICATION = PersistentConfig(
     "ENABLE_WEB_LOADER_SSL_VERIFICATION",
     "rag.web.loader.ssl_verification",
@@ -318,6 +318,31 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# Realtime saves are buffered and written to the database every interval (seconds),
+# and to a journal every journal interval so a crash loses at most that much
+REALTIME_CHAT_SAVE_INTERVAL = float(os.environ.get("REALTIME_CHAT_SAVE_INTERVAL", "2"))
+REALTIME_CHAT_SAVE_JOURNAL_INTERVAL = float(
+    os.environ.get("REALTIME_CHAT_SAVE_JOURNAL_INTERVAL", "0.2")
+)
+
+# Messages with event writes (status, message and replace events) waiting for the
+# database; event emitters wait for room when it is full
+CHAT_EVENT_WRITE_QUEUE_SIZE = int(os.environ.get("CHAT_EVENT_WRITE_QUEUE_SIZE", "1000"))
+
+# Streamed responses are sent to the clients as content deltas, at most one frame per
+# interval, with the whole content every CHAT_STREAM_SNAPSHOT_FRAMES frames
+CHAT_STREAM_FRAME_INTERVAL_MS = int(
+    os.environ.get("CHAT_STREAM_FRAME_INTERVAL_MS", "40")
+)
+CHAT_STREAM_SNAPSHOT_FRAMES = int(os.environ.get("CHAT_STREAM_SNAPSHOT_FRAMES", "100"))
+
+# Users of authenticated requests are cached for USER_CACHE_TTL seconds (0 disables the
+# cache), and their last active timestamps written every flush interval
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "10"))
+USER_LAST_ACTIVE_FLUSH_INTERVAL = float(
+    os.environ.get("USER_LAST_ACTIVE_FLUSH_INTERVAL", "10")
+)
+
 ####################################
 # REDIS
 ####################################
@@ -399,6 +424,10 @@ WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Users coming online and going offline are broadcast at most once per interval
+# (seconds), as one diff
+WEBSOCKET_PRESENCE_INTERVAL = float(os.environ.get("WEBSOCKET_PRESENCE_INTERVAL", "1"))
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -344,6 +344,7 @@ from open_webui.env import (
     ENABLE_WEBSOCKET_SUPPORT,
     BYPASS_MODEL_ACCESS_CONTROL,
     RESET_CONFIG_ON_START,
+    ENABLE_REALTIME_CHAT_SAVE,
     OFFLINE_MODE,
     ENABLE_OTEL,
     EXTERNAL_PWA_MANIFEST_URL,
@@ -371,6 +372,11 @@ from open_webui.utils.auth import (
     get_verified_user,
 )
 from open_webui.utils.oauth import OAuthManager
+from open_webui.utils.reindex import resume_reindex_job
+from open_webui.utils.collection_gc import periodic_collection_gc
+from open_webui.utils.chat_save import CHAT_EVENT_WRITER, MESSAGE_WRITE_BUFFER
+from open_webui.utils.user_cache import USER_CACHE
+from open_webui.retrieval.web.utils import close_http_sessions
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 
 from open_webui.tasks import (
@@ -447,13 +453,25 @@ async def lifespan(app: FastAPI):
     start_logger()
     if RESET_CONFIG_ON_START:
         reset_config()
+    app.state.config.start()
 
     if LICENSE_KEY:
         get_license_data(app, LICENSE_KEY)
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    resume_reindex_job(app)
+    asyncio.create_task(periodic_collection_gc())
+    if ENABLE_REALTIME_CHAT_SAVE:
+        MESSAGE_WRITE_BUFFER.start()
+    USER_CACHE.start(Users.update_users_last_active_by_ids)
+    CHAT_EVENT_WRITER.start()
     yield
 
+    await CHAT_EVENT_WRITER.close()
+    await MESSAGE_WRITE_BUFFER.close()
+    await USER_CACHE.close()
+    await close_http_sessions()
+
 
 app = FastAPI(
     title="Open WebUI",
@@ -0,0 +1,149 @@
+"""Add chat_message table
+
+Revision ID: d31026856c01
+Revises: 3781e22d8b01
+Create Date: 2025-03-01 03:00:00.000000
+
+"""
+
+import time
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, column
+
+revision = "d31026856c01"
+down_revision = "3781e22d8b01"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 100
+
+chat = table(
+    "chat",
+    column("id", sa.String()),
+    column("chat", sa.JSON()),
+)
+
+chat_message = table(
+    "chat_message",
+    column("chat_id", sa.Text()),
+    column("id", sa.Text()),
+    column("parent_id", sa.Text()),
+    column("role", sa.Text()),
+    column("content", sa.Text()),
+    column("status_history", sa.JSON()),
+    column("data", sa.JSON()),
+    column("created_at", sa.BigInteger()),
+    column("updated_at", sa.BigInteger()),
+)
+
+
+def get_chat_ids(conn) -> list[str]:
+    return [row.id for row in conn.execute(sa.select(chat.c.id))]
+
+
+def upgrade():
+    op.create_table(
+        "chat_message",
+        sa.Column("chat_id", sa.Text(), nullable=False),
+        sa.Column("id", sa.Text(), nullable=False),
+        sa.Column("parent_id", sa.Text(), nullable=True),
+        sa.Column("role", sa.Text(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("status_history", sa.JSON(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "id"),
+    )
+
+    # Move the messages of every chat history to their own rows
+    conn = op.get_bind()
+    now = int(time.time())
+    chat_ids = get_chat_ids(conn)
+    for start in range(0, len(chat_ids), BATCH_SIZE):
+        rows = conn.execute(
+            sa.select(chat.c.id, chat.c.chat).where(
+                chat.c.id.in_(chat_ids[start : start + BATCH_SIZE])
+            )
+        ).fetchall()
+
+        for row in rows:
+            history = (row.chat or {}).get("history")
+            if not isinstance(history, dict) or "messages" not in history:
+                continue
+
+            messages = history.pop("messages") or {}
+            if messages:
+                conn.execute(
+                    chat_message.insert(),
+                    [
+                        {
+                            "chat_id": row.id,
+                            "id": message_id,
+                            "parent_id": message.get("parentId"),
+                            "role": message.get("role"),
+                            "content": message.get("content"),
+                            "status_history": message.get("statusHistory"),
+                            "data": {
+                                key: value
+                                for key, value in message.items()
+                                if key not in ("content", "statusHistory")
+                            },
+                            "created_at": (
+                                int(message["timestamp"])
+                                if isinstance(message.get("timestamp"), (int, float))
+                                else now
+                            ),
+                            "updated_at": now,
+                        }
+                        for message_id, message in messages.items()
+                    ],
+                )
+
+            conn.execute(
+                chat.update()
+                .where(chat.c.id == row.id)
+                .values(chat={**row.chat, "history": history})
+            )
+
+
+def downgrade():
+    # Move the messages back into the chat histories
+    conn = op.get_bind()
+    chat_ids = get_chat_ids(conn)
+    for start in range(0, len(chat_ids), BATCH_SIZE):
+        batch = chat_ids[start : start + BATCH_SIZE]
+        messages = {}
+        for row in conn.execute(
+            sa.select(chat_message)
+            .where(chat_message.c.chat_id.in_(batch))
+            .order_by(chat_message.c.created_at)
+        ):
+            message = {**(row.data or {})}
+            if row.content is not None:
+                message["content"] = row.content
+            if row.status_history is not None:
+                message["statusHistory"] = row.status_history
+            messages.setdefault(row.chat_id, {})[row.id] = message
+
+        for row in conn.execute(
+            sa.select(chat.c.id, chat.c.chat).where(chat.c.id.in_(batch))
+        ):
+            history = (row.chat or {}).get("history")
+            if not isinstance(history, dict):
+                continue
+
+            conn.execute(
+                chat.update()
+                .where(chat.c.id == row.id)
+                .values(
+                    chat={
+                        **row.chat,
+                        "history": {**history, "messages": messages.get(row.id, {})},
+                    }
+                )
+            )
+
+    op.drop_table("chat_message")
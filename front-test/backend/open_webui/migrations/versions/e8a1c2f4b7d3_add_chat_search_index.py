@@ -0,0 +1,183 @@
+"""Add chat search index
+
+Revision ID: e8a1c2f4b7d3
+Revises: d31026856c01
+Create Date: 2025-03-02 03:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e8a1c2f4b7d3"
+down_revision = "d31026856c01"
+branch_labels = None
+depends_on = None
+
+
+# SQLite: one full-text row per chat title (message_id "") and per message, kept in
+# sync by triggers. chat_search_id gives each (chat_id, message_id) a stable integer
+# id for the FTS rowid, as the rowids of the chat tables may change on VACUUM.
+SQLITE_UPGRADE = [
+    """
+    CREATE TABLE chat_search_id (
+        id INTEGER PRIMARY KEY,
+        chat_id TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        UNIQUE (chat_id, message_id)
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE chat_search USING fts5(
+        user_id, title, content, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_search_chat_insert AFTER INSERT ON chat BEGIN
+        INSERT INTO chat_search_id (chat_id, message_id) VALUES (new.id, '');
+        INSERT INTO chat_search (rowid, user_id, title, content) VALUES (
+            (SELECT id FROM chat_search_id WHERE chat_id = new.id AND message_id = ''),
+            new.user_id, new.title, ''
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_chat_update AFTER UPDATE OF title, user_id ON chat BEGIN
+        UPDATE chat_search SET user_id = new.user_id, title = new.title
+        WHERE rowid = (
+            SELECT id FROM chat_search_id WHERE chat_id = new.id AND message_id = ''
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_chat_delete AFTER DELETE ON chat BEGIN
+        DELETE FROM chat_search WHERE rowid = (
+            SELECT id FROM chat_search_id WHERE chat_id = old.id AND message_id = ''
+        );
+        DELETE FROM chat_search_id WHERE chat_id = old.id AND message_id = '';
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_message_insert AFTER INSERT ON chat_message BEGIN
+        INSERT INTO chat_search_id (chat_id, message_id) VALUES (new.chat_id, new.id);
+        INSERT INTO chat_search (rowid, user_id, title, content) VALUES (
+            (
+                SELECT id FROM chat_search_id
+                WHERE chat_id = new.chat_id AND message_id = new.id
+            ),
+            (SELECT user_id FROM chat WHERE id = new.chat_id),
+            '',
+            new.content
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_message_update AFTER UPDATE OF content ON chat_message
+    BEGIN
+        UPDATE chat_search SET content = new.content
+        WHERE rowid = (
+            SELECT id FROM chat_search_id
+            WHERE chat_id = new.chat_id AND message_id = new.id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER chat_search_message_delete AFTER DELETE ON chat_message BEGIN
+        DELETE FROM chat_search WHERE rowid = (
+            SELECT id FROM chat_search_id
+            WHERE chat_id = old.chat_id AND message_id = old.id
+        );
+        DELETE FROM chat_search_id WHERE chat_id = old.chat_id AND message_id = old.id;
+    END
+    """,
+    # Index the existing chats and messages
+    """
+    INSERT INTO chat_search_id (chat_id, message_id)
+    SELECT id, '' FROM chat
+    UNION ALL
+    SELECT chat_id, id FROM chat_message
+    """,
+    """
+    INSERT INTO chat_search (rowid, user_id, title, content)
+    SELECT chat_search_id.id, chat.user_id, chat.title, ''
+    FROM chat JOIN chat_search_id
+        ON chat_search_id.chat_id = chat.id AND chat_search_id.message_id = ''
+    UNION ALL
+    SELECT chat_search_id.id, chat.user_id, '', chat_message.content
+    FROM chat_message
+        JOIN chat ON chat.id = chat_message.chat_id
+        JOIN chat_search_id
+            ON chat_search_id.chat_id = chat_message.chat_id
+            AND chat_search_id.message_id = chat_message.id
+    """,
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS chat_search_chat_insert",
+    "DROP TRIGGER IF EXISTS chat_search_chat_update",
+    "DROP TRIGGER IF EXISTS chat_search_chat_delete",
+    "DROP TRIGGER IF EXISTS chat_search_message_insert",
+    "DROP TRIGGER IF EXISTS chat_search_message_update",
+    "DROP TRIGGER IF EXISTS chat_search_message_delete",
+    "DROP TABLE IF EXISTS chat_search",
+    "DROP TABLE IF EXISTS chat_search_id",
+]
+
+# PostgreSQL: GIN indexes on the same expressions as the search queries, maintained by
+# PostgreSQL on every write
+POSTGRESQL_UPGRADE = [
+    """
+    CREATE INDEX IF NOT EXISTS chat_title_search_idx ON chat
+    USING GIN (to_tsvector('simple', coalesce(title, '')))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS chat_message_content_search_idx ON chat_message
+    USING GIN (to_tsvector('simple', coalesce(content, '')))
+    """,
+    "CREATE INDEX IF NOT EXISTS chat_user_id_idx ON chat (user_id)",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS chat_title_search_idx",
+    "DROP INDEX IF EXISTS chat_message_content_search_idx",
+    "DROP INDEX IF EXISTS chat_user_id_idx",
+]
+
+
+def has_fts5(conn) -> bool:
+    try:
+        conn.execute(sa.text("CREATE VIRTUAL TABLE temp._fts5_check USING fts5(x)"))
+        conn.execute(sa.text("DROP TABLE temp._fts5_check"))
+        return True
+    except Exception:
+        return False
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        if not has_fts5(conn):
+            # Chats are then searched without an index
+            print("SQLite is built without FTS5, skipping the chat search index")
+            return
+        statements = SQLITE_UPGRADE
+    elif conn.dialect.name == "postgresql":
+        statements = POSTGRESQL_UPGRADE
+    else:
+        return
+
+    for statement in statements:
+        conn.execute(sa.text(statement))
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        statements = SQLITE_DOWNGRADE
+    elif conn.dialect.name == "postgresql":
+        statements = POSTGRESQL_DOWNGRADE
+    else:
+        return
+
+    for statement in statements:
+        conn.execute(sa.text(statement))
@@ -4,7 +4,7 @@ import uuid
 from typing import Optional
 
 from open_webui.internal.db import Base, get_db
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_accessible
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
@@ -96,13 +96,9 @@ class ChannelTable:
     def get_channels_by_user_id(
         self, user_id: str, permission: str = "read"
     ) -> list[ChannelModel]:
-        channels = self.get_channels()
-        return [
-            channel
-            for channel in channels
-            if channel.user_id == user_id
-            or has_access(user_id, permission, channel.access_control)
-        ]
+        with get_db() as db:
+            channels = get_accessible(db.query(Channel), Channel, user_id, permission)
+            return [ChannelModel.model_validate(channel) for channel in channels]
 
     def get_channel_by_id(self, id: str) -> Optional[ChannelModel]:
         with get_db() as db:
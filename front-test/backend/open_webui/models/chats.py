@@ -1,5 +1,6 @@
 import logging
 import json
+import re
 import time
 import uuid
 from typing import Optional
@@ -9,7 +10,7 @@ from open_webui.models.tags import TagModel, Tag, Tags
 from open_webui.env import SRC_LOG_LEVELS
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Boolean, Column, Float, String, Text, JSON
 from sqlalchemy import or_, func, select, and_, text
 from sqlalchemy.sql import exists
 
@@ -40,6 +41,92 @@ class Chat(Base):
     folder_id = Column(Text, nullable=True)
 
 
+_has_sqlite_search_index: Optional[bool] = None
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_message"
+
+    # The messages of chat["history"]["messages"], so a message is written on its own
+    chat_id = Column(Text, primary_key=True)
+    id = Column(Text, primary_key=True)
+
+    parent_id = Column(Text, nullable=True)
+    role = Column(Text, nullable=True)
+    content = Column(Text, nullable=True)
+    status_history = Column(JSON, nullable=True)
+
+    # The other fields of the message
+    data = Column(JSON, nullable=True)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+
+def get_message_values(message: dict) -> dict:
+    return {
+        "parent_id": message.get("parentId"),
+        "role": message.get("role"),
+        "content": message.get("content"),
+        "status_history": message.get("statusHistory"),
+        "data": {
+            key: value
+            for key, value in message.items()
+            if key not in ("content", "statusHistory")
+        },
+    }
+
+
+def get_message_from_row(row: ChatMessage) -> dict:
+    message = {**(row.data or {})}
+    if row.content is not None:
+        message["content"] = row.content
+    if row.status_history is not None:
+        message["statusHistory"] = row.status_history
+    return message
+
+
+def new_message_row(chat_id: str, message_id: str, message: dict) -> ChatMessage:
+    now = int(time.time())
+    timestamp = message.get("timestamp")
+    return ChatMessage(
+        chat_id=chat_id,
+        id=message_id,
+        **get_message_values(message),
+        # Messages are listed in the order they were sent
+        created_at=int(timestamp) if isinstance(timestamp, (int, float)) else now,
+        updated_at=now,
+    )
+
+
+def has_sqlite_search_index(db) -> bool:
+    # The index is not created if SQLite is built without FTS5
+    global _has_sqlite_search_index
+    if _has_sqlite_search_index is None:
+        _has_sqlite_search_index = (
+            db.execute(
+                text(
+                    "SELECT 1 FROM sqlite_master "
+                    "WHERE type = 'table' AND name = 'chat_search'"
+                )
+            ).first()
+            is not None
+        )
+    return _has_sqlite_search_index
+
+
+def split_chat_messages(chat: dict) -> tuple[dict, Optional[dict]]:
+    # The chat as stored in its row, and the messages of its history if it has any
+    history = chat.get("history")
+    if not isinstance(history, dict) or "messages" not in history:
+        return chat, None
+
+    return {
+        **chat,
+        "history": {key: value for key, value in history.items() if key != "messages"},
+    }, (history["messages"] or {})
+
+
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -105,7 +192,87 @@ class ChatTitleIdResponse(BaseModel):
 
 
 class ChatTable:
+    def _get_models(self, db, chats: list[Chat]) -> list[ChatModel]:
+        # Chats as the API returns them, with their messages back in the history
+        messages = {chat.id: {} for chat in chats}
+        chat_ids = list(messages)
+        for start in range(0, len(chat_ids), 500):
+            rows = (
+                db.query(ChatMessage)
+                .filter(ChatMessage.chat_id.in_(chat_ids[start : start + 500]))
+                .order_by(ChatMessage.created_at)
+            )
+            for row in rows:
+                messages[row.chat_id][row.id] = get_message_from_row(row)
+
+        models = []
+        for chat in chats:
+            model = ChatModel.model_validate(chat)
+            history = model.chat.get("history")
+            if isinstance(history, dict):
+                model.chat = {
+                    **model.chat,
+                    "history": {
+                        **history,
+                        "messages": {
+                            **history.get("messages", {}),
+                            **messages[chat.id],
+                        },
+                    },
+                }
+            models.append(model)
+        return models
+
+    def _get_model(self, db, chat: Optional[Chat]) -> ChatModel:
+        if chat is None:
+            raise ValueError("Chat not found")
+        return self._get_models(db, [chat])[0]
+
+    def _write_messages(self, db, chat_id: str, messages: dict):
+        # Only the messages that changed are written
+        rows = {row.id: row for row in db.query(ChatMessage).filter_by(chat_id=chat_id)}
+        for message_id, message in messages.items():
+            row = rows.pop(message_id, None)
+            if row is None:
+                db.add(new_message_row(chat_id, message_id, message))
+                continue
+
+            values = get_message_values(message)
+            if any(getattr(row, key) != value for key, value in values.items()):
+                for key, value in values.items():
+                    setattr(row, key, value)
+                row.updated_at = int(time.time())
+
+        if rows:
+            db.query(ChatMessage).filter(
+                ChatMessage.chat_id == chat_id, ChatMessage.id.in_(list(rows))
+            ).delete(synchronize_session=False)
+
+    def _copy_messages(self, db, chat_id: str, to_chat_id: str):
+        db.query(ChatMessage).filter_by(chat_id=to_chat_id).delete()
+        for row in db.query(ChatMessage).filter_by(chat_id=chat_id).all():
+            db.add(
+                ChatMessage(
+                    chat_id=to_chat_id,
+                    id=row.id,
+                    parent_id=row.parent_id,
+                    role=row.role,
+                    content=row.content,
+                    status_history=row.status_history,
+                    data=row.data,
+                    created_at=row.created_at,
+                    updated_at=row.updated_at,
+                )
+            )
+
+    def _delete_messages(self, db, chat_ids):
+        # chat_ids is a list or a select of chat ids
+        db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
+        chat_json, messages = split_chat_messages(form_data.chat)
         with get_db() as db:
             id = str(uuid.uuid4())
             chat = ChatModel(
@@ -117,7 +284,7 @@ class ChatTable:
                         if "title" in form_data.chat
                         else "New Chat"
                     ),
-                    "chat": form_data.chat,
+                    "chat": chat_json,
                     "created_at": int(time.time()),
                     "updated_at": int(time.time()),
                 }
@@ -125,13 +292,15 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._write_messages(db, id, messages or {})
             db.commit()
             db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return self._get_model(db, result) if result else None
 
     def import_chat(
         self, user_id: str, form_data: ChatImportForm
     ) -> Optional[ChatModel]:
+        chat_json, messages = split_chat_messages(form_data.chat)
         with get_db() as db:
             id = str(uuid.uuid4())
             chat = ChatModel(
@@ -143,7 +312,7 @@ class ChatTable:
                         if "title" in form_data.chat
                         else "New Chat"
                     ),
-                    "chat": form_data.chat,
+                    "chat": chat_json,
                     "meta": form_data.meta,
                     "pinned": form_data.pinned,
                     "folder_id": form_data.folder_id,
@@ -154,21 +323,25 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._write_messages(db, id, messages or {})
             db.commit()
             db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return self._get_model(db, result) if result else None
 
     def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat_item = db.get(Chat, id)
-                chat_item.chat = chat
+                chat_json, messages = split_chat_messages(chat)
+                chat_item.chat = chat_json
                 chat_item.title = chat["title"] if "title" in chat else "New Chat"
                 chat_item.updated_at = int(time.time())
+                if messages is not None:
+                    self._write_messages(db, id, messages)
                 db.commit()
                 db.refresh(chat_item)
 
-                return ChatModel.model_validate(chat_item)
+                return self._get_model(db, chat_item)
         except Exception:
             return None
 
@@ -210,61 +383,79 @@ class ChatTable:
         return chat.chat.get("title", "New Chat")
 
     def get_messages_by_chat_id(self, id: str) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
+        with get_db() as db:
+            if db.query(Chat.id).filter_by(id=id).first() is None:
+                return None
 
-        return chat.chat.get("history", {}).get("messages", {}) or {}
+            rows = (
+                db.query(ChatMessage)
+                .filter_by(chat_id=id)
+                .order_by(ChatMessage.created_at)
+            )
+            return {row.id: get_message_from_row(row) for row in rows}
 
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
+        with get_db() as db:
+            row = db.get(ChatMessage, (id, message_id))
+            if row is not None:
+                return get_message_from_row(row)
 
-        return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
+            if db.query(Chat.id).filter_by(id=id).first() is None:
+                return None
+            return {}
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
-
-        history["currentId"] = message_id
+    ) -> Optional[dict]:
+        """
+        Merge the message into the chat, make it the current message, and return it.
+        The chat row itself is only written for its current message id and updated_at.
+        """
+        with get_db() as db:
+            chat = db.get(Chat, id)
+            if chat is None:
+                return None
+
+            row = db.get(ChatMessage, (id, message_id))
+            if row is not None:
+                message = {**get_message_from_row(row), **message}
+                for key, value in get_message_values(message).items():
+                    setattr(row, key, value)
+                row.updated_at = int(time.time())
+            else:
+                db.add(new_message_row(id, message_id, message))
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+            history = chat.chat.get("history", {})
+            if history.get("currentId") != message_id:
+                chat.chat = {
+                    **chat.chat,
+                    "history": {**history, "currentId": message_id},
+                }
+            chat.updated_at = int(time.time())
+            db.commit()
+            return message
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        chat = chat.chat
-        history = chat.get("history", {})
+    ) -> Optional[dict]:
+        return self.add_message_statuses_to_chat_by_id_and_message_id(
+            id, message_id, [status]
+        )
 
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
+    def add_message_statuses_to_chat_by_id_and_message_id(
+        self, id: str, message_id: str, statuses: list[dict]
+    ) -> Optional[dict]:
+        with get_db() as db:
+            row = db.get(ChatMessage, (id, message_id))
+            if row is None:
+                return None
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+            row.status_history = [*(row.status_history or []), *statuses]
+            row.updated_at = int(time.time())
+            db.commit()
+            return get_message_from_row(row)
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
@@ -286,6 +477,7 @@ class ChatTable:
             )
             shared_result = Chat(**shared_chat.model_dump())
             db.add(shared_result)
+            self._copy_messages(db, chat_id, shared_chat.id)
             db.commit()
             db.refresh(shared_result)
 
@@ -296,7 +488,7 @@ class ChatTable:
                 .update({"share_id": shared_chat.id})
             )
             db.commit()
-            return shared_chat if (shared_result and result) else None
+            return self._get_model(db, shared_result) if result else None
 
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         try:
@@ -311,18 +503,22 @@ class ChatTable:
 
                 shared_chat.title = chat.title
                 shared_chat.chat = chat.chat
+                self._copy_messages(db, chat_id, shared_chat.id)
 
                 shared_chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(shared_chat)
 
-                return ChatModel.model_validate(shared_chat)
+                return self._get_model(db, shared_chat)
         except Exception:
             return None
 
     def delete_shared_chat_by_chat_id(self, chat_id: str) -> bool:
         try:
             with get_db() as db:
+                self._delete_messages(
+                    db, select(Chat.id).where(Chat.user_id == f"shared-{chat_id}")
+                )
                 db.query(Chat).filter_by(user_id=f"shared-{chat_id}").delete()
                 db.commit()
 
@@ -339,7 +535,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -351,7 +547,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -363,7 +559,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -387,7 +583,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chat_list_by_user_id(
         self,
@@ -409,7 +605,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -460,13 +656,13 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -488,7 +684,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -499,7 +695,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -508,7 +704,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -517,7 +713,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -526,7 +722,77 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
+
+    def _get_search_ranks(self, db, user_id: str, search_text: str):
+        """
+        Subquery of the chats of the user matching the search text, with the rank of
+        their best match, lower first. None if there is no full-text index.
+        """
+        words = re.findall(r"\w+", search_text)
+        if not words:
+            return None
+
+        dialect_name = db.bind.dialect.name
+        if dialect_name == "sqlite":
+            if not has_sqlite_search_index(db):
+                return None
+
+            # Every word in the title or in the same message, and the chat of the user
+            phrases = " AND ".join(f'"{word}"*' for word in words)
+            user_phrase = '"' + user_id.replace('"', '""') + '"'
+            search_query = (
+                f"user_id : {user_phrase} AND {{title content}} : ({phrases})"
+            )
+            statement = text(
+                """
+                SELECT chat_search_id.chat_id AS chat_id, MIN(matches.rank) AS rank
+                FROM (
+                    SELECT rowid, rank
+                    FROM chat_search
+                    WHERE chat_search MATCH :search_query
+                        AND rank MATCH 'bm25(0.0, 4.0, 1.0)'
+                ) AS matches
+                    JOIN chat_search_id ON chat_search_id.id = matches.rowid
+                GROUP BY chat_search_id.chat_id
+                """
+            )
+        elif dialect_name == "postgresql":
+            search_query = " & ".join(f"{word}:*" for word in words)
+            statement = text(
+                """
+                SELECT chat_id, MIN(rank) AS rank FROM (
+                    SELECT chat.id AS chat_id,
+                        -4 * ts_rank(
+                            to_tsvector('simple', coalesce(chat.title, '')),
+                            to_tsquery('simple', :search_query)
+                        ) AS rank
+                    FROM chat
+                    WHERE chat.user_id = :user_id
+                        AND to_tsvector('simple', coalesce(chat.title, ''))
+                            @@ to_tsquery('simple', :search_query)
+                    UNION ALL
+                    SELECT chat_message.chat_id AS chat_id,
+                        -ts_rank(
+                            to_tsvector('simple', coalesce(chat_message.content, '')),
+                            to_tsquery('simple', :search_query)
+                        ) AS rank
+                    FROM chat_message JOIN chat ON chat.id = chat_message.chat_id
+                    WHERE chat.user_id = :user_id
+                        AND to_tsvector('simple', coalesce(chat_message.content, ''))
+                            @@ to_tsquery('simple', :search_query)
+                ) AS matches
+                GROUP BY chat_id
+                """
+            ).bindparams(user_id=user_id)
+        else:
+            return None
+
+        return (
+            statement.bindparams(search_query=search_query)
+            .columns(chat_id=Text, rank=Float)
+            .subquery("search_ranks")
+        )
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -537,7 +803,9 @@ class ChatTable:
         limit: int = 60,
     ) -> list[ChatModel]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Filters chats based on a search query, allowing pagination using skip and limit.
+        The words are matched as prefixes of the words of the title or of a message,
+        through the full-text index, and chats are ranked by their best match.
         """
         search_text = search_text.lower().strip()
 
@@ -565,29 +833,9 @@ class ChatTable:
             if not include_archived:
                 query = query.filter(Chat.archived == False)
 
-            query = query.order_by(Chat.updated_at.desc())
-
             # Check if the database dialect is either 'sqlite' or 'postgresql'
             dialect_name = db.bind.dialect.name
             if dialect_name == "sqlite":
-                # SQLite case: using JSON1 extension for JSON searching
-                query = query.filter(
-                    (
-                        Chat.title.ilike(
-                            f"%{search_text}%"
-                        )  # Case-insensitive search in title
-                        | text(
-                            """
-                            EXISTS (
-                                SELECT 1 
-                                FROM json_each(Chat.chat, '$.messages') AS message 
-                                WHERE LOWER(message.value->>'content') LIKE '%' || :search_text || '%'
-                            )
-                            """
-                        )
-                    ).params(search_text=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -619,24 +867,6 @@ class ChatTable:
                     )
 
             elif dialect_name == "postgresql":
-                # PostgreSQL relies on proper JSON query for search
-                query = query.filter(
-                    (
-                        Chat.title.ilike(
-                            f"%{search_text}%"
-                        )  # Case-insensitive search in title
-                        | text(
-                            """
-                            EXISTS (
-                                SELECT 1
-                                FROM json_array_elements(Chat.chat->'messages') AS message
-                                WHERE LOWER(message->>'content') LIKE '%' || :search_text || '%'
-                            )
-                            """
-                        )
-                    ).params(search_text=search_text)
-                )
-
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
                     query = query.filter(
@@ -671,13 +901,35 @@ class ChatTable:
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
+            if search_text:
+                search_ranks = self._get_search_ranks(db, user_id, search_text)
+                if search_ranks is not None:
+                    # Best ranked first
+                    query = query.join(
+                        search_ranks, search_ranks.c.chat_id == Chat.id
+                    ).order_by(search_ranks.c.rank)
+                else:
+                    query = query.filter(
+                        or_(
+                            Chat.title.ilike(f"%{search_text}%"),
+                            exists().where(
+                                ChatMessage.chat_id == Chat.id,
+                                func.lower(ChatMessage.content).like(
+                                    f"%{search_text}%"
+                                ),
+                            ),
+                        )
+                    )
+
+            query = query.order_by(Chat.updated_at.desc())
+
             # Perform pagination at the SQL level
             all_chats = query.offset(skip).limit(limit).all()
 
             log.info(f"The number of chats: {len(all_chats)}")
 
             # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str
@@ -690,7 +942,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -705,7 +957,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -718,7 +970,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -757,7 +1009,7 @@ class ChatTable:
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_models(db, list(all_chats))
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -778,7 +1030,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_model(db, chat)
         except Exception:
             return None
 
@@ -855,6 +1107,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 db.query(Chat).filter_by(id=id).delete()
+                self._delete_messages(db, [id])
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -864,7 +1117,8 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(id=id, user_id=user_id).delete()
+                if db.query(Chat).filter_by(id=id, user_id=user_id).delete():
+                    self._delete_messages(db, [id])
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -876,6 +1130,9 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                self._delete_messages(
+                    db, select(Chat.id).where(Chat.user_id == user_id)
+                )
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -888,6 +1145,12 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                self._delete_messages(
+                    db,
+                    select(Chat.id).where(
+                        Chat.user_id == user_id, Chat.folder_id == folder_id
+                    ),
+                )
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
@@ -901,6 +1164,9 @@ class ChatTable:
                 chats_by_user = db.query(Chat).filter_by(user_id=user_id).all()
                 shared_chat_ids = [f"shared-{chat.id}" for chat in chats_by_user]
 
+                self._delete_messages(
+                    db, select(Chat.id).where(Chat.user_id.in_(shared_chat_ids))
+                )
                 db.query(Chat).filter(Chat.user_id.in_(shared_chat_ids)).delete()
                 db.commit()
 
@@ -147,6 +147,10 @@ class FilesTable:
         with get_db() as db:
             return [FileModel.model_validate(file) for file in db.query(File).all()]
 
+    def get_file_ids(self) -> list[str]:
+        with get_db() as db:
+            return [id for (id,) in db.query(File.id).all()]
+
     def get_files_by_ids(self, ids: list[str]) -> list[FileModel]:
         with get_db() as db:
             return [
@@ -14,7 +14,7 @@ from open_webui.models.users import Users, UserResponse
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_accessible
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -128,31 +128,28 @@ class KnowledgeTable:
 
     def get_knowledge_bases(self) -> list[KnowledgeUserModel]:
         with get_db() as db:
-            knowledge_bases = []
-            for knowledge in (
-                db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all()
-            ):
-                user = Users.get_user_by_id(knowledge.user_id)
-                knowledge_bases.append(
-                    KnowledgeUserModel.model_validate(
-                        {
-                            **KnowledgeModel.model_validate(knowledge).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return knowledge_bases
+            return Users.get_rows_with_users(
+                KnowledgeUserModel,
+                db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all(),
+            )
+
+    def get_knowledge_ids(self) -> list[str]:
+        with get_db() as db:
+            return [id for (id,) in db.query(Knowledge.id).all()]
 
     def get_knowledge_bases_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[KnowledgeUserModel]:
-        knowledge_bases = self.get_knowledge_bases()
-        return [
-            knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(user_id, permission, knowledge_base.access_control)
-        ]
+        with get_db() as db:
+            return Users.get_rows_with_users(
+                KnowledgeUserModel,
+                get_accessible(
+                    db.query(Knowledge).order_by(Knowledge.updated_at.desc()),
+                    Knowledge,
+                    user_id,
+                    permission,
+                ),
+            )
 
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
         try:
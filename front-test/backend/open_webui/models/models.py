@@ -15,7 +15,7 @@ from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
 
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_accessible
 
 
 log = logging.getLogger(__name__)
@@ -175,18 +175,10 @@ class ModelsTable:
 
     def get_models(self) -> list[ModelUserResponse]:
         with get_db() as db:
-            models = []
-            for model in db.query(Model).filter(Model.base_model_id != None).all():
-                user = Users.get_user_by_id(model.user_id)
-                models.append(
-                    ModelUserResponse.model_validate(
-                        {
-                            **ModelModel.model_validate(model).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return models
+            return Users.get_rows_with_users(
+                ModelUserResponse,
+                db.query(Model).filter(Model.base_model_id != None).all(),
+            )
 
     def get_base_models(self) -> list[ModelModel]:
         with get_db() as db:
@@ -198,13 +190,16 @@ class ModelsTable:
     def get_models_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ModelUserResponse]:
-        models = self.get_models()
-        return [
-            model
-            for model in models
-            if model.user_id == user_id
-            or has_access(user_id, permission, model.access_control)
-        ]
+        with get_db() as db:
+            return Users.get_rows_with_users(
+                ModelUserResponse,
+                get_accessible(
+                    db.query(Model).filter(Model.base_model_id != None),
+                    Model,
+                    user_id,
+                    permission,
+                ),
+            )
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
@@ -7,7 +7,7 @@ from open_webui.models.users import Users, UserResponse
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_accessible
 
 ####################
 # Prompts DB Schema
@@ -103,32 +103,24 @@ class PromptsTable:
 
     def get_prompts(self) -> list[PromptUserResponse]:
         with get_db() as db:
-            prompts = []
-
-            for prompt in db.query(Prompt).order_by(Prompt.timestamp.desc()).all():
-                user = Users.get_user_by_id(prompt.user_id)
-                prompts.append(
-                    PromptUserResponse.model_validate(
-                        {
-                            **PromptModel.model_validate(prompt).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-
-            return prompts
+            return Users.get_rows_with_users(
+                PromptUserResponse,
+                db.query(Prompt).order_by(Prompt.timestamp.desc()).all(),
+            )
 
     def get_prompts_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[PromptUserResponse]:
-        prompts = self.get_prompts()
-
-        return [
-            prompt
-            for prompt in prompts
-            if prompt.user_id == user_id
-            or has_access(user_id, permission, prompt.access_control)
-        ]
+        with get_db() as db:
+            return Users.get_rows_with_users(
+                PromptUserResponse,
+                get_accessible(
+                    db.query(Prompt).order_by(Prompt.timestamp.desc()),
+                    Prompt,
+                    user_id,
+                    permission,
+                ),
+            )
 
     def update_prompt_by_command(
         self, command: str, form_data: PromptForm
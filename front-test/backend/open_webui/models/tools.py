@@ -8,7 +8,7 @@ from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_accessible
 
 
 log = logging.getLogger(__name__)
@@ -144,30 +144,23 @@ class ToolsTable:
 
     def get_tools(self) -> list[ToolUserModel]:
         with get_db() as db:
-            tools = []
-            for tool in db.query(Tool).order_by(Tool.updated_at.desc()).all():
-                user = Users.get_user_by_id(tool.user_id)
-                tools.append(
-                    ToolUserModel.model_validate(
-                        {
-                            **ToolModel.model_validate(tool).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return tools
+            return Users.get_rows_with_users(
+                ToolUserModel, db.query(Tool).order_by(Tool.updated_at.desc()).all()
+            )
 
     def get_tools_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ToolUserModel]:
-        tools = self.get_tools()
-
-        return [
-            tool
-            for tool in tools
-            if tool.user_id == user_id
-            or has_access(user_id, permission, tool.access_control)
-        ]
+        with get_db() as db:
+            return Users.get_rows_with_users(
+                ToolUserModel,
+                get_accessible(
+                    db.query(Tool).order_by(Tool.updated_at.desc()),
+                    Tool,
+                    user_id,
+                    permission,
+                ),
+            )
 
     def get_tool_valves_by_id(self, id: str) -> Optional[dict]:
         try:
@@ -6,10 +6,11 @@ from open_webui.internal.db import Base, JSONField, get_db
 
 from open_webui.models.chats import Chats
 from open_webui.models.groups import Groups
+from open_webui.utils.user_cache import USER_CACHE
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text
+from sqlalchemy import BigInteger, Column, String, Text, case
 
 ####################
 # User DB Schema
@@ -143,6 +144,24 @@ class UsersTable:
         except Exception:
             return None
 
+    def get_cached_user_by_id(self, id: str) -> Optional[UserModel]:
+        user = USER_CACHE.get(id)
+        if user is None:
+            version = USER_CACHE.version
+            user = self.get_user_by_id(id)
+            if user is not None:
+                USER_CACHE.set(user, version)
+        return user
+
+    def get_cached_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        user = USER_CACHE.get_by_api_key(api_key)
+        if user is None:
+            version = USER_CACHE.version
+            user = self.get_user_by_api_key(api_key)
+            if user is not None:
+                USER_CACHE.set(user, version, api_key=api_key)
+        return user
+
     def get_user_by_email(self, email: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
@@ -180,6 +199,23 @@ class UsersTable:
             users = db.query(User).filter(User.id.in_(user_ids)).all()
             return [UserModel.model_validate(user) for user in users]
 
+    def get_rows_with_users(self, response_model: type[BaseModel], rows) -> list:
+        """
+        Validate rows that have a user_id into response_model, with their user as a
+        UserResponse: the users of every row are fetched in one query, instead of one
+        query per row.
+        """
+        users = {
+            user.id: UserResponse.model_validate(user.model_dump())
+            for user in self.get_users_by_user_ids(list({row.user_id for row in rows}))
+        }
+        return [
+            response_model.model_validate(row).model_copy(
+                update={"user": users.get(row.user_id)}
+            )
+            for row in rows
+        ]
+
     def get_num_users(self) -> Optional[int]:
         with get_db() as db:
             return db.query(User).count()
@@ -213,6 +249,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -227,6 +264,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -246,6 +284,22 @@ class UsersTable:
         except Exception:
             return None
 
+    def update_users_last_active_by_ids(self, last_active: dict[str, int]):
+        # One statement per batch, instead of one per user
+        user_ids = list(last_active)
+        with get_db() as db:
+            for start in range(0, len(user_ids), 500):
+                batch = user_ids[start : start + 500]
+                db.query(User).filter(User.id.in_(batch)).update(
+                    {
+                        "last_active_at": case(
+                            {id: last_active[id] for id in batch}, value=User.id
+                        )
+                    },
+                    synchronize_session=False,
+                )
+            db.commit()
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -253,6 +307,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -264,6 +319,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -283,6 +339,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                USER_CACHE.invalidate(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -301,6 +358,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                USER_CACHE.invalidate(id)
 
                 return True
             else:
@@ -313,6 +371,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                USER_CACHE.invalidate(id)
                 return True if result == 1 else False
         except Exception:
             return False
@@ -325,6 +384,10 @@ class UsersTable:
         except Exception:
             return None
 
+    def get_user_ids(self) -> list[str]:
+        with get_db() as db:
+            return [id for (id,) in db.query(User.id).all()]
+
     def get_valid_user_ids(self, user_ids: list[str]) -> list[str]:
         with get_db() as db:
             users = db.query(User).filter(User.id.in_(user_ids)).all()
@@ -2,6 +2,7 @@ import requests
 import logging
 import ftfy
 import sys
+from typing import Iterator
 
 from langchain_community.document_loaders import (
     AzureAIDocumentIntelligenceLoader,
@@ -22,6 +23,7 @@ from langchain_community.document_loaders import (
 from langchain_core.documents import Document
 
 from open_webui.retrieval.loaders.mistral import MistralLoader
+from open_webui.retrieval.loaders.pdf import ParallelPyPDFLoader
 
 from open_webui.env import SRC_LOG_LEVELS, GLOBAL_LOG_LEVEL
 
@@ -184,6 +186,18 @@ class Loader:
             for doc in docs
         ]
 
+    def lazy_load(
+        self, filename: str, file_content_type: str, file_path: str
+    ) -> Iterator[Document]:
+        # Yields the pages/sections as they are extracted, for loaders that support it
+        loader = self._get_loader(filename, file_content_type, file_path)
+        docs = loader.lazy_load() if hasattr(loader, "lazy_load") else loader.load()
+
+        for doc in docs:
+            yield Document(
+                page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
+            )
+
     def _is_text_file(self, file_ext: str, file_content_type: str) -> bool:
         return file_ext in known_source_ext or (
             file_content_type and file_content_type.find("text/") >= 0
@@ -242,9 +256,10 @@ class Loader:
             )
         else:
             if file_ext == "pdf":
-                loader = PyPDFLoader(
-                    file_path, extract_images=self.kwargs.get("PDF_EXTRACT_IMAGES")
-                )
+                if self.kwargs.get("PDF_EXTRACT_IMAGES"):
+                    loader = PyPDFLoader(file_path, extract_images=True)
+                else:
+                    loader = ParallelPyPDFLoader(file_path)
             elif file_ext == "csv":
                 loader = CSVLoader(file_path, autodetect_encoding=True)
             elif file_ext == "rst":
@@ -0,0 +1,106 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+log = logging.getLogger(__name__)
+
+# Pages extracted by a worker per task
+PDF_PAGE_BATCH_SIZE = 8
+PDF_EXTRACTION_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        # spawn instead of fork, the server process is multi-threaded
+        _executor = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def extract_pages(file_path: str, start: int, end: int) -> list[str]:
+    reader = PdfReader(file_path)
+    return [reader.pages[idx].extract_text() for idx in range(start, end)]
+
+
+class ParallelPyPDFLoader:
+    """
+    Extracts the text of a PDF page by page, with the pages split across a process
+    pool. Pages are yielded in order as soon as they are extracted, so consumers can
+    start working on the first pages while later ones are still being parsed.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def lazy_load(self) -> Iterator[Document]:
+        reader = PdfReader(self.file_path)
+        total_pages = len(reader.pages)
+        page_labels = reader.page_labels
+
+        def to_document(idx: int, text: str) -> Document:
+            return Document(
+                page_content=text,
+                metadata={
+                    "source": self.file_path,
+                    "total_pages": total_pages,
+                    "page": idx,
+                    "page_label": page_labels[idx],
+                },
+            )
+
+        if total_pages <= PDF_PAGE_BATCH_SIZE:
+            for idx, page in enumerate(reader.pages):
+                yield to_document(idx, page.extract_text())
+            return
+
+        executor = get_executor()
+        ranges = iter(
+            (start, min(start + PDF_PAGE_BATCH_SIZE, total_pages))
+            for start in range(0, total_pages, PDF_PAGE_BATCH_SIZE)
+        )
+
+        # Keep a bounded number of batches in flight so memory does not grow with the file
+        pending = deque()
+        for start, end in ranges:
+            pending.append(
+                (start, executor.submit(extract_pages, self.file_path, start, end))
+            )
+            if len(pending) >= PDF_EXTRACTION_WORKERS * 2:
+                break
+
+        try:
+            while pending:
+                start, future = pending.popleft()
+                texts = future.result()
+
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    pending.append(
+                        (
+                            next_range[0],
+                            executor.submit(extract_pages, self.file_path, *next_range),
+                        )
+                    )
+
+                for offset, text in enumerate(texts):
+                    yield to_document(start + offset, text)
+        finally:
+            # The consumer stopped early (closed the generator or failed): do not leave
+            # the batches in flight occupying the shared pool
+            for _, future in pending:
+                future.cancel()
+
+    def load(self) -> list[Document]:
+        return list(self.lazy_load())
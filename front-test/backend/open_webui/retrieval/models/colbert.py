@@ -1,17 +1,262 @@
 import os
+import hashlib
+import json
 import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
 import torch
 import numpy as np
 from colbert.infra import ColBERTConfig
 from colbert.modeling.checkpoint import Checkpoint
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes are only serialized within the process
+    fcntl = None
+
+from open_webui.config import CACHE_DIR, RAG_COLBERT_EMBEDDINGS_CACHE_MAX_SIZE
 from open_webui.env import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
 
+COLBERT_EMBEDDINGS_DIR = f"{CACHE_DIR}/colbert"
+
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "lock"
+
+
+class ColBERTDocumentStore:
+    """
+    Token embeddings of documents, keyed by the hash of their content. The embeddings
+    are appended to a float16 file that is memory-mapped for reading, and an index file
+    maps every key to its first row and number of tokens. The first record of the index
+    holds the generation of the embeddings file.
+
+    Once the embeddings outgrow max_size, the store is compacted to half of it: the
+    documents used last by this process are copied to the next generation of the
+    embeddings file, and a new index replaces the previous one.
+
+    Several processes may share a store: writes are serialized with a file lock, and a
+    process catches up with the index, appended to or replaced by the others, before
+    every read and write. A document embedded by two processes at once is only stored
+    once.
+    """
+
+    def __init__(self, path: str, dim: int, max_size: int):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.index_path = os.path.join(path, INDEX_FILE)
+        self.dim = dim
+        self.row_size = dim * np.dtype(np.float16).itemsize
+        self.max_rows = max_size // self.row_size
+
+        self.lock = threading.RLock()
+        # key -> when this process last read or added the document
+        self.used: dict[str, int] = {}
+        self.clock = 0
+        self._reset()
+
+        with self._write_lock():
+            if not self._is_valid():
+                # Missing, or written by a version without generations
+                self._create()
+            self._refresh()
+
+    def _reset(self):
+        self.generation = 0
+        self.index_inode = None
+        self.index_offset = 0
+        self.index: dict[str, tuple[int, int]] = {}
+        self._embeddings: Optional[np.memmap] = None
+
+    def _embeddings_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"embeddings.{generation}.f16")
+
+    @contextmanager
+    def _write_lock(self):
+        with self.lock, open(os.path.join(self.path, LOCK_FILE), "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _is_valid(self) -> bool:
+        try:
+            with open(self.index_path, "r") as f:
+                return "generation" in json.loads(f.readline())
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def _create(self):
+        for name in os.listdir(self.path):
+            if name != LOCK_FILE:
+                os.remove(os.path.join(self.path, name))
+        open(self._embeddings_path(0), "wb").close()
+        self._write_index(0, {})
+
+    def _write_index(self, generation: int, index: dict[str, tuple[int, int]]):
+        # Replaced at once, so that readers see either index in full
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"generation": generation}) + "\n")
+            f.write(
+                "".join(
+                    json.dumps({"key": key, "offset": offset, "length": length}) + "\n"
+                    for key, (offset, length) in index.items()
+                )
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def _refresh(self):
+        # Catch up with the index, which may have been written by another process
+        stat = os.stat(self.index_path)
+        if stat.st_ino != self.index_inode:
+            # First load, or compacted
+            self._reset()
+            self.index_inode = stat.st_ino
+
+        if stat.st_size > self.index_offset:
+            with open(self.index_path, "rb") as f:
+                f.seek(self.index_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partial record of an interrupted write
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+
+                    if "generation" in entry:
+                        self.generation = entry["generation"]
+                    else:
+                        self.index[entry["key"]] = (entry["offset"], entry["length"])
+                    self.index_offset += len(line)
+
+    def _get_embeddings(self) -> np.memmap:
+        rows = max(
+            (offset + length for offset, length in self.index.values()), default=0
+        )
+        if self._embeddings is None or len(self._embeddings) < rows:
+            self._embeddings = np.memmap(
+                self._embeddings_path(self.generation),
+                dtype=np.float16,
+                mode="r",
+                shape=(rows, self.dim),
+            )
+        return self._embeddings
+
+    def _use(self, keys):
+        for key in keys:
+            self.clock += 1
+            self.used[key] = self.clock
+
+    def get(self, keys: list[str]) -> list[Optional[np.ndarray]]:
+        with self.lock:
+            self._refresh()
+            if not any(key in self.index for key in keys):
+                return [None] * len(keys)
+
+            embeddings = self._get_embeddings()
+            results = []
+            for key in keys:
+                if key in self.index:
+                    offset, length = self.index[key]
+                    results.append(np.asarray(embeddings[offset : offset + length]))
+                else:
+                    results.append(None)
+            self._use(key for key in keys if key in self.index)
+            return results
+
+    def add(self, embeddings: dict[str, np.ndarray]):
+        with self._write_lock():
+            self._refresh()
+            self._use(embeddings)
+            # Embedded by another process in the meantime
+            embeddings = {
+                key: embedding
+                for key, embedding in embeddings.items()
+                if key not in self.index
+            }
+            if not embeddings:
+                return
+
+            entries = {}
+            with open(self._embeddings_path(self.generation), "r+b") as f:
+                # Rows past the index, or a torn row, were left by a crash
+                offset = max(
+                    (offset + length for offset, length in self.index.values()),
+                    default=0,
+                )
+                f.seek(offset * self.row_size)
+                for key, embedding in embeddings.items():
+                    f.write(embedding.astype(np.float16).tobytes())
+                    entries[key] = (offset, len(embedding))
+                    offset += len(embedding)
+                f.truncate()
+
+            # The index is written last, so it never points past the embeddings
+            with open(self.index_path, "a") as index_file:
+                index_file.write(
+                    "".join(
+                        json.dumps({"key": key, "offset": offset, "length": length})
+                        + "\n"
+                        for key, (offset, length) in entries.items()
+                    )
+                )
+            self._refresh()
+
+            if offset > self.max_rows:
+                self._compact()
+
+    def _compact(self):
+        # The documents used last first, then the ones added last
+        keys = sorted(
+            self.index,
+            key=lambda key: (self.used.get(key, 0), self.index[key][0]),
+            reverse=True,
+        )
+
+        embeddings = self._get_embeddings()
+        generation = self.generation + 1
+        index = {}
+        offset = 0
+        with open(self._embeddings_path(generation), "wb") as f:
+            for key in keys:
+                _, length = self.index[key]
+                if offset + length > self.max_rows // 2:
+                    break
+                start = self.index[key][0]
+                f.write(
+                    np.ascontiguousarray(embeddings[start : start + length]).tobytes()
+                )
+                index[key] = (offset, length)
+                offset += length
+
+        self._write_index(generation, index)
+        log.info(
+            f"Compacted ColBERT embeddings {self.path}: kept {len(index)} of {len(self.index)} documents"
+        )
+
+        # Files mapped by other processes stay readable until they remap
+        for name in os.listdir(self.path):
+            if name.startswith("embeddings.") and name != os.path.basename(
+                self._embeddings_path(generation)
+            ):
+                os.remove(os.path.join(self.path, name))
+        self.used = {key: used for key, used in self.used.items() if key in index}
+        self._refresh()
+
+
 class ColBERT:
+    # Scores are softmax-normalized over the documents of each query, so they depend on
+    # the whole candidate set and can not be cached per (query, document) pair
+    batch_dependent_scores = True
+
     def __init__(self, name, **kwargs) -> None:
         log.info("ColBERT: Loading model", name)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -33,7 +278,14 @@ class ColBERT:
             name,
             colbert_config=ColBERTConfig(model_name=name),
         ).to(self.device)
-        pass
+
+        self.store = ColBERTDocumentStore(
+            os.path.join(
+                COLBERT_EMBEDDINGS_DIR, hashlib.sha256(name.encode()).hexdigest()[:16]
+            ),
+            self.ckpt.colbert_config.dim,
+            RAG_COLBERT_EMBEDDINGS_CACHE_MAX_SIZE,
+        )
 
     def calculate_similarity_scores(self, query_embeddings, document_embeddings):
 
@@ -68,20 +320,72 @@ class ColBERT:
 
         return normalized_scores.detach().cpu().numpy().astype(np.float32)
 
-    def predict(self, sentences):
+    def get_document_embeddings(self, docs: list[str]) -> list[np.ndarray]:
+        """
+        Token embeddings of the documents, read from the store. Only the documents that
+        were never seen are encoded, and stored for the next searches.
+        """
+        keys = [hashlib.sha256(doc.encode()).hexdigest() for doc in docs]
+        embeddings = self.store.get(keys)
+
+        missing = {
+            key: doc
+            for key, doc, embedding in zip(keys, docs, embeddings)
+            if embedding is None
+        }
+        if missing:
+            # On the CPU, to be stored as numpy arrays
+            D, doclens = self.ckpt.docFromText(
+                list(missing.values()), bsize=32, keep_dims="flatten", to_cpu=True
+            )
+            computed = {
+                key: embedding.numpy()
+                for key, embedding in zip(missing, torch.split(D, doclens))
+            }
+            self.store.add(computed)
+            embeddings = [
+                computed[key] if embedding is None else embedding
+                for key, embedding in zip(keys, embeddings)
+            ]
+
+        return embeddings
 
-        query = sentences[0][0]
-        docs = [i[1] for i in sentences]
+    def index_documents(self, docs: list[str]):
+        """
+        Precompute the token embeddings of documents at ingestion, so that searches only
+        have to encode the query.
+        """
+        self.get_document_embeddings(docs)
+
+    def predict(self, sentences):
+        # Pairs of several queries are scored together, each query against its documents
+        query_indices = {}
+        for idx, (query, _) in enumerate(sentences):
+            query_indices.setdefault(query, []).append(idx)
 
-        # Embedding the documents
-        embedded_docs = self.ckpt.docFromText(docs, bsize=32)[0]
         # Embedding the queries
-        embedded_queries = self.ckpt.queryFromText([query], bsize=32)
-        embedded_query = embedded_queries[0]
+        embedded_queries = self.ckpt.queryFromText(list(query_indices), bsize=32)
+        # Embedding the documents, or reading them from the store
+        embedded_docs = self.get_document_embeddings([doc for _, doc in sentences])
 
-        # Calculate retrieval scores for the query against all documents
-        scores = self.calculate_similarity_scores(
-            embedded_query.unsqueeze(0), embedded_docs
-        )
+        scores = np.zeros(len(sentences), dtype=np.float32)
+        for embedded_query, indices in zip(embedded_queries, query_indices.values()):
+            # Padding rows are zero vectors, like the ones of docFromText
+            documents = torch.nn.utils.rnn.pad_sequence(
+                [
+                    torch.tensor(
+                        embedded_docs[idx],
+                        dtype=embedded_query.dtype,
+                        device=embedded_query.device,
+                    )
+                    for idx in indices
+                ],
+                batch_first=True,
+            )
+
+            # Calculate retrieval scores for the query against all documents
+            scores[indices] = self.calculate_similarity_scores(
+                embedded_query.unsqueeze(0), documents
+            )
 
         return scores
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Union
+
+import numpy as np
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Queued by close() after the last request
+STOP = object()
+
+
+class EmbeddingWorker:
+    """
+    Runs a local SentenceTransformers model on a dedicated thread, which holds the model
+    once for the whole process. Concurrent encode requests are queued and coalesced into
+    larger batches: everything queued while the previous batch was encoded, plus what
+    arrives within max_wait seconds, up to max_batch_size texts.
+
+    encode() blocks the calling thread, aencode() awaits without blocking the event loop.
+    The model releases the GIL during inference, so a thread is enough.
+    """
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.queue: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.thread = threading.Thread(
+            target=self._run, name="embedding-worker", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, sentences: list[str], prompt: Optional[str] = None) -> Future:
+        future = Future()
+        with self.lock:
+            if not self.closed and sentences:
+                self.queue.put((sentences, prompt, future))
+                return future
+
+        # Closed after a model change, or nothing to batch: encode in the caller
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(self._encode(sentences, prompt))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def encode(
+        self, sentences: Union[str, list[str]], prompt: Optional[str] = None
+    ) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences], prompt)[0]
+        return self.submit(sentences, prompt).result()
+
+    async def aencode(
+        self, sentences: Union[str, list[str]], prompt: Optional[str] = None
+    ) -> np.ndarray:
+        if isinstance(sentences, str):
+            return (await self.aencode([sentences], prompt))[0]
+        return await asyncio.wrap_future(self.submit(sentences, prompt))
+
+    def close(self):
+        # Requests already queued are still encoded
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.queue.put(STOP)
+
+    def _encode(self, sentences: list[str], prompt: Optional[str]) -> np.ndarray:
+        return self.model.encode(sentences, **({"prompt": prompt} if prompt else {}))
+
+    def _warm_up(self):
+        # The first call initializes the kernels and buffers of the model
+        try:
+            self._encode(["warm-up"], None)
+        except Exception as e:
+            log.warning(f"Error warming up the embedding model: {e}")
+
+    def _next_batch(self, request: tuple) -> tuple[list[tuple], Optional[tuple]]:
+        # Requests of the same prompt, and the first request left for the next batch
+        batch = [request]
+        size = len(request[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                next_request = self.queue.get(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                break
+
+            if (
+                next_request is STOP
+                or next_request[1] != request[1]
+                or size + len(next_request[0]) > self.max_batch_size
+            ):
+                return batch, next_request
+            batch.append(next_request)
+            size += len(next_request[0])
+
+        return batch, None
+
+    def _run(self):
+        self._warm_up()
+
+        pending = None
+        while True:
+            request = pending or self.queue.get()
+            if request is STOP:
+                return
+
+            batch, pending = self._next_batch(request)
+            batch = [
+                (sentences, future)
+                for sentences, _, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                embeddings = self._encode(
+                    [sentence for sentences, _ in batch for sentence in sentences],
+                    request[1],
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for sentences, future in batch:
+                future.set_result(embeddings[offset : offset + len(sentences)])
+                offset += len(sentences)
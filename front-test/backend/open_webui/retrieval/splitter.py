@@ -0,0 +1,183 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Iterable
+
+import tiktoken
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Boundaries tried in order by the markdown splitter: headings, code blocks, paragraphs,
+# lines, sentences and words
+MARKDOWN_SEPARATORS = [
+    r"\n(?=#{1,6} )",
+    r"\n(?=```)",
+    r"\n\n+",
+    r"\n",
+    r"(?<=[.!?。！？])\s+",
+    r"\s+",
+    "",
+]
+
+# Threads used by tiktoken to encode and decode batches of documents
+TOKENIZER_THREADS = min(8, os.cpu_count() or 1)
+
+
+@lru_cache
+def get_encoding(encoding_name: str) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+
+class TextSplitter:
+    """
+    Splits the documents of an upload into chunks. Chunks never span two documents, so
+    the pages of a PDF are never mixed: each chunk keeps the metadata of its document,
+    e.g. its page, plus its position in it (start_index and end_index, in characters).
+
+    - character: recursive splitting on paragraphs, lines and words, sized in characters
+    - token: windows of tokens, with all the documents tokenized in one batch
+    - markdown: recursive splitting on headings, paragraphs, lines and sentences, sized
+      in tokens
+    """
+
+    def __init__(
+        self, mode: str, chunk_size: int, chunk_overlap: int, encoding_name: str
+    ):
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        if mode in ["", "character"]:
+            self.splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+            )
+        elif mode == "token":
+            self.encoding = get_encoding(encoding_name)
+        elif mode == "markdown":
+            self.encoding = get_encoding(encoding_name)
+            self.splitter = RecursiveCharacterTextSplitter(
+                separators=MARKDOWN_SEPARATORS,
+                is_separator_regex=True,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=self.count_tokens,
+            )
+        else:
+            raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        docs = [doc for doc in docs if doc.page_content]
+        if self.mode == "token":
+            chunks = self._split_documents_on_tokens(docs)
+        else:
+            chunks = self._split_documents_on_separators(docs)
+
+        for chunk in chunks:
+            chunk.metadata["end_index"] = chunk.metadata["start_index"] + len(
+                chunk.page_content
+            )
+        return chunks
+
+    def _encode_batch(self, texts: list[str]) -> list[list[int]]:
+        # The thread pool of tiktoken only pays off with several cores
+        if TOKENIZER_THREADS > 1:
+            return self.encoding.encode_ordinary_batch(
+                texts, num_threads=TOKENIZER_THREADS
+            )
+        return [self.encoding.encode_ordinary(text) for text in texts]
+
+    def _decode_batch(self, batch: list[list[int]]) -> list[str]:
+        if TOKENIZER_THREADS > 1:
+            return self.encoding.decode_batch(batch, num_threads=TOKENIZER_THREADS)
+        return [self.encoding.decode(tokens) for tokens in batch]
+
+    def _split_documents_on_tokens(self, docs: list[Document]) -> list[Document]:
+        # Same windows as TokenTextSplitter, without encoding and decoding one by one
+        step = max(1, self.chunk_size - self.chunk_overlap)
+        tokens = self._encode_batch([doc.page_content for doc in docs])
+
+        starts = [
+            list(range(0, max(1, len(doc_tokens) - self.chunk_overlap), step))
+            for doc_tokens in tokens
+        ]
+        windows = [
+            doc_tokens[start : start + self.chunk_size]
+            for doc_tokens, doc_starts in zip(tokens, starts)
+            for start in doc_starts
+        ]
+        # The start of the next window is found from the length of the overlap between
+        # the two, which is much shorter to decode than the text between their starts
+        overlaps = [
+            doc_tokens[start + step : start + self.chunk_size]
+            for doc_tokens, doc_starts in zip(tokens, starts)
+            for start in doc_starts
+        ]
+
+        texts = iter(self._decode_batch(windows))
+        overlap_lengths = iter(len(text) for text in self._decode_batch(overlaps))
+
+        chunks = []
+        for doc, doc_starts in zip(docs, starts):
+            offset = 0
+            for _ in doc_starts:
+                text = next(texts)
+                chunks.append(
+                    Document(
+                        page_content=text,
+                        metadata={**doc.metadata, "start_index": offset},
+                    )
+                )
+                offset += len(text) - next(overlap_lengths)
+        return chunks
+
+    def _get_overlap_length(self, text: str) -> int:
+        # Longest overlap, in characters, that the next chunk can share with this one
+        if self.mode == "markdown":
+            tokens = self.encoding.encode_ordinary(text)
+            return len(self.encoding.decode(tokens[-self.chunk_overlap :]))
+        return self.chunk_overlap
+
+    def _split_documents_on_separators(self, docs: list[Document]) -> list[Document]:
+        chunks = []
+        for doc in docs:
+            # As add_start_index of langchain: a chunk starts at the earliest in the
+            # overlap of the previous one, so looking it up from there cannot match an
+            # earlier repeat of its text, nor skip to a later one
+            start_index = 0
+            previous = ""
+            for text in self.splitter.split_text(doc.page_content):
+                offset = start_index + len(previous)
+                if previous and self.chunk_overlap:
+                    offset -= self._get_overlap_length(previous)
+                index = doc.page_content.find(text, max(start_index, offset))
+                if index == -1:
+                    index = doc.page_content.find(text, start_index)
+                start_index = index
+                previous = text
+
+                chunks.append(
+                    Document(
+                        page_content=text,
+                        metadata={**doc.metadata, "start_index": start_index},
+                    )
+                )
+        return chunks
+
+
+@lru_cache(maxsize=8)
+def get_splitter(
+    mode: str, chunk_size: int, chunk_overlap: int, encoding_name: str
+) -> TextSplitter:
+    log.info(f"Using {mode or 'character'} text splitter")
+    return TextSplitter(mode, chunk_size, chunk_overlap, encoding_name)
@@ -4,10 +4,16 @@ from typing import Optional, Union
 
 import requests
 import hashlib
+import heapq
+import threading
+import uuid
+import tiktoken
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 
+from fastapi.concurrency import run_in_threadpool
 from huggingface_hub import snapshot_download
-from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
+from langchain.retrievers import EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
@@ -29,11 +35,17 @@ from open_webui.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_PREFIX_FIELD_NAME,
+    ENABLE_RAG_RECIPROCAL_RANK_FUSION,
+    RAG_FULL_CONTEXT_BATCH_SIZE,
+    RAG_RERANKING_SCORE_CACHE_SIZE,
 )
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
+# Rank offset of reciprocal rank fusion, 60 as in the original paper
+RRF_K = 60
+
 
 from typing import Any
 
@@ -93,6 +105,40 @@ def query_doc(
         raise e
 
 
+def query_doc_with_embeddings(
+    collection_name: str, query_embeddings: list[list[float]], k: int
+) -> list[dict]:
+    """
+    Search the collection with several query embeddings in one call to the vector DB,
+    returning one result per query embedding.
+    """
+    try:
+        log.debug(f"query_doc_with_embeddings:doc {collection_name}")
+        result = VECTOR_DB_CLIENT.search(
+            collection_name=collection_name,
+            vectors=query_embeddings,
+            limit=k,
+        )
+        if result is None:
+            return []
+
+        log.info(f"query_doc_with_embeddings:result {result.ids} {result.metadatas}")
+        return [
+            {
+                "ids": [ids],
+                "distances": [distances],
+                "documents": [documents],
+                "metadatas": [metadatas],
+            }
+            for ids, distances, documents, metadatas in zip(
+                result.ids, result.distances, result.documents, result.metadatas
+            )
+        ]
+    except Exception as e:
+        log.exception(f"Error querying doc {collection_name} with limit {k}: {e}")
+        raise e
+
+
 def get_doc(collection_name: str, user: UserModel = None):
     try:
         log.debug(f"get_doc:doc {collection_name}")
@@ -107,6 +153,44 @@ def get_doc(collection_name: str, user: UserModel = None):
         raise e
 
 
+def get_hybrid_search_candidates(
+    collection_name: str,
+    collection_result: GetResult,
+    query: str,
+    embedding_function,
+    k: int,
+) -> list[Document]:
+    """
+    Candidates of a hybrid search, from BM25 and vector search, before reranking.
+    """
+    bm25_retriever = BM25Retriever.from_texts(
+        texts=collection_result.documents[0],
+        metadatas=collection_result.metadatas[0],
+    )
+    bm25_retriever.k = k
+
+    vector_search_retriever = VectorSearchRetriever(
+        collection_name=collection_name,
+        embedding_function=embedding_function,
+        top_k=k,
+    )
+
+    ensemble_retriever = EnsembleRetriever(
+        retrievers=[bm25_retriever, vector_search_retriever], weights=[0.5, 0.5]
+    )
+    return ensemble_retriever.invoke(query)
+
+
+def get_hybrid_search_result(documents: list[Document], k: int) -> dict:
+    # The reranked documents are sorted by score, retrieve only min(k, k_reranker) items
+    documents = documents[:k]
+    return {
+        "distances": [[d.metadata.get("score") for d in documents]],
+        "documents": [[d.page_content for d in documents]],
+        "metadatas": [[d.metadata for d in documents]],
+    }
+
+
 def query_doc_with_hybrid_search(
     collection_name: str,
     collection_result: GetResult,
@@ -119,52 +203,24 @@ def query_doc_with_hybrid_search(
 ) -> dict:
     try:
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
-
-        vector_search_retriever = VectorSearchRetriever(
+        candidates = get_hybrid_search_candidates(
             collection_name=collection_name,
+            collection_result=collection_result,
+            query=query,
             embedding_function=embedding_function,
-            top_k=k,
+            k=k,
         )
 
-        ensemble_retriever = EnsembleRetriever(
-            retrievers=[bm25_retriever, vector_search_retriever], weights=[0.5, 0.5]
-        )
         compressor = RerankCompressor(
             embedding_function=embedding_function,
             top_n=k_reranker,
             reranking_function=reranking_function,
             r_score=r,
         )
-
-        compression_retriever = ContextualCompressionRetriever(
-            base_compressor=compressor, base_retriever=ensemble_retriever
+        result = get_hybrid_search_result(
+            compressor.compress_documents(candidates, query), k
         )
 
-        result = compression_retriever.invoke(query)
-
-        distances = [d.metadata.get("score") for d in result]
-        documents = [d.page_content for d in result]
-        metadatas = [d.metadata for d in result]
-
-        # retrieve only min(k, k_reranker) items, sort and cut by distance if k < k_reranker
-        if k < k_reranker:
-            sorted_items = sorted(
-                zip(distances, metadatas, documents), key=lambda x: x[0], reverse=True
-            )
-            sorted_items = sorted_items[:k]
-            distances, documents, metadatas = map(list, zip(*sorted_items))
-
-        result = {
-            "distances": [distances],
-            "documents": [documents],
-            "metadatas": [metadatas],
-        }
-
         log.info(
             "query_doc_with_hybrid_search:result "
             + f'{result["metadatas"]} {result["distances"]}'
@@ -175,6 +231,46 @@ def query_doc_with_hybrid_search(
         raise e
 
 
+def get_chunk_ids(
+    collection_name: str,
+    texts: list[str],
+    metadatas: list[dict],
+    occurrences: Optional[dict] = None,
+) -> list[str]:
+    """
+    Derive deterministic chunk ids from the chunk content, so that re-ingesting an
+    unchanged chunk yields the same id. The owning file and the embedding config are
+    part of the key (a model change must re-embed everything), and identical chunks
+    within the same file are disambiguated by their occurrence index.
+
+    Pass the same occurrences dict when a document is stored in several batches.
+    """
+    ids = []
+    if occurrences is None:
+        occurrences = {}
+
+    for text, metadata in zip(texts, metadatas):
+        key = (
+            str(metadata.get("file_id", "")),
+            str(metadata.get("embedding_config", "")),
+            hashlib.sha256(text.encode()).hexdigest(),
+        )
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+
+        # uuid5 keeps the ids valid for backends that only accept UUIDs (e.g. Qdrant)
+        ids.append(
+            str(
+                uuid.uuid5(
+                    uuid.NAMESPACE_URL,
+                    f"{collection_name}:{':'.join(key)}:{occurrence}",
+                )
+            )
+        )
+
+    return ids
+
+
 def merge_get_results(get_results: list[dict]) -> dict:
     # Initialize lists to store combined data
     combined_documents = []
@@ -196,61 +292,161 @@ def merge_get_results(get_results: list[dict]) -> dict:
     return result
 
 
-def merge_and_sort_query_results(query_results: list[dict], k: int) -> dict:
-    # Initialize lists to store combined data
-    combined = dict()  # To store documents with unique document hashes
+def merge_and_sort_query_results(
+    query_results: list[dict], k: int, reciprocal_rank_fusion: bool = False
+) -> dict:
+    """
+    Merge the results of several queries and collections into the top k documents.
+
+    Duplicate documents are collapsed, keeping their best distance. With
+    reciprocal_rank_fusion, documents are ranked by the sum of 1 / (RRF_K + rank) over
+    the result lists they appear in, instead of by their best distance.
+    """
+    # document -> [distance, document, metadata, fused score]
+    combined = {}
 
     for data in query_results:
         distances = data["distances"][0]
         documents = data["documents"][0]
         metadatas = data["metadatas"][0]
 
-        for distance, document, metadata in zip(distances, documents, metadatas):
-            if isinstance(document, str):
-                doc_hash = hashlib.md5(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
-
-                if doc_hash not in combined.keys():
-                    combined[doc_hash] = (distance, document, metadata)
-                    continue  # if doc is new, no further comparison is needed
-
-                # if doc is alredy in, but new distance is better, update
-                if distance > combined[doc_hash][0]:
-                    combined[doc_hash] = (distance, document, metadata)
-
-    combined = list(combined.values())
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=True)
+        for rank, (distance, document, metadata) in enumerate(
+            zip(distances, documents, metadatas), start=1
+        ):
+            if not isinstance(document, str):
+                continue
 
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
+            # The document itself is the key: str hashing is much cheaper than md5
+            entry = combined.get(document)
+            if entry is None:
+                entry = [distance, document, metadata, 0.0]
+                combined[document] = entry
+            elif distance > entry[0]:
+                # if doc is already in, but new distance is better, update
+                entry[0] = distance
+                entry[2] = metadata
+
+            if reciprocal_rank_fusion:
+                entry[3] += 1.0 / (RRF_K + rank)
+
+    # Bounded heap instead of sorting every candidate
+    top_k = heapq.nlargest(
+        k, combined.values(), key=lambda x: x[3] if reciprocal_rank_fusion else x[0]
     )
 
     # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [[entry[0] for entry in top_k]],
+        "documents": [[entry[1] for entry in top_k]],
+        "metadatas": [[entry[2] for entry in top_k]],
     }
 
 
 def get_all_items_from_collections(collection_names: list[str]) -> dict:
-    results = []
+    return FullContextAssembler().add_collections(collection_names)
+
+
+def get_chunk_position(metadata: Optional[dict]) -> tuple:
+    # Files, then pages, then the position of the chunk in the page
+    metadata = metadata or {}
+    return (
+        str(metadata.get("file_id") or metadata.get("source") or ""),
+        metadata.get("page") if isinstance(metadata.get("page"), int) else 0,
+        (
+            metadata.get("start_index")
+            if isinstance(metadata.get("start_index"), int)
+            else 0
+        ),
+    )
 
-    for collection_name in collection_names:
-        if collection_name:
+
+class FullContextAssembler:
+    """
+    Gathers whole collections for full context mode.
+
+    The chunks of a collection are put back in document order, as the vector databases
+    return them in the order of their ids, then kept until max_tokens worth of chunks
+    has been gathered. The budget is shared by every call to add_collections, e.g.
+    across the files of a chat, and collections after it is reached are not read.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        encoding_name: str = "cl100k_base",
+        batch_size: int = RAG_FULL_CONTEXT_BATCH_SIZE,
+    ):
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.batch_size = batch_size
+        self.encoding = None
+        if max_tokens:
             try:
-                result = get_doc(collection_name=collection_name)
-                if result is not None:
-                    results.append(result.model_dump())
+                self.encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                log.warning(f"Counting context tokens by characters: {e}")
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            # Roughly four characters per token
+            return len(text) // 4 + 1
+        return len(self.encoding.encode_ordinary(text))
+
+    def is_full(self) -> bool:
+        return self.max_tokens is not None and self.tokens >= self.max_tokens
+
+    def _add_collection(
+        self,
+        collection_name: str,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ):
+        chunks = []
+        for result in VECTOR_DB_CLIENT.get_batches(
+            collection_name=collection_name, batch_size=self.batch_size
+        ):
+            chunks.extend(zip(result.ids[0], result.documents[0], result.metadatas[0]))
+        chunks.sort(key=lambda chunk: get_chunk_position(chunk[2]))
+
+        for id, document, metadata in chunks:
+            if self.max_tokens:
+                tokens = self.count_tokens(document or "")
+                if self.tokens + tokens > self.max_tokens:
+                    # The rest of the collection does not fit
+                    self.tokens = self.max_tokens
+                    log.info(
+                        f"Full context budget of {self.max_tokens} tokens reached in {collection_name}"
+                    )
+                    return
+                self.tokens += tokens
+
+            ids.append(id)
+            documents.append(document)
+            metadatas.append(metadata)
+
+    def add_collections(self, collection_names: list[str]) -> dict:
+        ids = []
+        documents = []
+        metadatas = []
+
+        for collection_name in collection_names:
+            if not collection_name:
+                continue
+
+            try:
+                self._add_collection(collection_name, ids, documents, metadatas)
             except Exception as e:
                 log.exception(f"Error when querying the collection: {e}")
-        else:
-            pass
 
-    return merge_get_results(results)
+            if self.is_full():
+                break
+
+        return {
+            "documents": [documents],
+            "metadatas": [metadatas],
+            "ids": [ids],
+        }
 
 
 def query_collection(
@@ -260,25 +456,30 @@ def query_collection(
     k: int,
 ) -> dict:
     results = []
-    for query in queries:
-        log.debug(f"query_collection:query {query}")
-        query_embedding = embedding_function(query, prefix=RAG_EMBEDDING_QUERY_PREFIX)
-        for collection_name in collection_names:
-            if collection_name:
-                try:
-                    result = query_doc(
+    log.debug(f"query_collection:queries {queries}")
+
+    # Embed all the queries at once, then search each collection with all of them
+    query_embeddings = (
+        embedding_function(queries, prefix=RAG_EMBEDDING_QUERY_PREFIX)
+        if queries
+        else []
+    )
+    for collection_name in collection_names:
+        if collection_name and query_embeddings:
+            try:
+                results.extend(
+                    query_doc_with_embeddings(
                         collection_name=collection_name,
+                        query_embeddings=query_embeddings,
                         k=k,
-                        query_embedding=query_embedding,
                     )
-                    if result is not None:
-                        results.append(result.model_dump())
-                except Exception as e:
-                    log.exception(f"Error when querying the collection: {e}")
-            else:
-                pass
+                )
+            except Exception as e:
+                log.exception(f"Error when querying the collection: {e}")
 
-    return merge_and_sort_query_results(results, k=k)
+    return merge_and_sort_query_results(
+        results, k=k, reciprocal_rank_fusion=ENABLE_RAG_RECIPROCAL_RANK_FUSION
+    )
 
 
 def query_collection_with_hybrid_search(
@@ -313,17 +514,14 @@ def query_collection_with_hybrid_search(
 
     def process_query(collection_name, query):
         try:
-            result = query_doc_with_hybrid_search(
+            candidates = get_hybrid_search_candidates(
                 collection_name=collection_name,
                 collection_result=collection_results[collection_name],
                 query=query,
                 embedding_function=embedding_function,
                 k=k,
-                reranking_function=reranking_function,
-                k_reranker=k_reranker,
-                r=r,
             )
-            return result, None
+            return candidates, None
         except Exception as e:
             log.exception(f"Error when querying the collection with hybrid_search: {e}")
             return None, e
@@ -341,18 +539,31 @@ def query_collection_with_hybrid_search(
         future_results = [executor.submit(process_query, cn, q) for cn, q in tasks]
         task_results = [future.result() for future in future_results]
 
-    for result, err in task_results:
+    batch = []
+    for (_, query), (candidates, err) in zip(tasks, task_results):
         if err is not None:
             error = True
-        elif result is not None:
-            results.append(result)
+        elif candidates is not None:
+            batch.append((query, candidates))
 
-    if error and not results:
+    if error and not batch:
         raise Exception(
             "Hybrid search failed for all collections. Using Non-hybrid search as fallback."
         )
 
-    return merge_and_sort_query_results(results, k=k)
+    # The candidates of all queries and collections are reranked together
+    compressor = RerankCompressor(
+        embedding_function=embedding_function,
+        top_n=k_reranker,
+        reranking_function=reranking_function,
+        r_score=r,
+    )
+    for documents in compressor.compress_documents_batch(batch):
+        results.append(get_hybrid_search_result(documents, k))
+
+    return merge_and_sort_query_results(
+        results, k=k, reciprocal_rank_fusion=ENABLE_RAG_RECIPROCAL_RANK_FUSION
+    )
 
 
 def get_embedding_function(
@@ -400,6 +611,19 @@ def get_embedding_function(
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
 
+async def generate_embeddings_async(request, query, prefix=None, user=None):
+    """
+    Embed from async code without blocking the event loop: local models are awaited on
+    their worker, the other engines run in the threadpool.
+    """
+    if request.app.state.config.RAG_EMBEDDING_ENGINE == "":
+        embeddings = await request.app.state.ef.aencode(query, prompt=prefix)
+        return embeddings.tolist()
+    return await run_in_threadpool(
+        request.app.state.EMBEDDING_FUNCTION, query, prefix=prefix, user=user
+    )
+
+
 def get_sources_from_files(
     request,
     files,
@@ -411,6 +635,7 @@ def get_sources_from_files(
     r,
     hybrid_search,
     full_context=False,
+    max_context_tokens: Optional[int] = None,
 ):
     log.debug(
         f"files: {files} {queries} {embedding_function} {reranking_function} {full_context}"
@@ -419,6 +644,13 @@ def get_sources_from_files(
     extracted_collections = []
     relevant_contexts = []
 
+    full_context_assembler = None
+    if full_context:
+        full_context_assembler = FullContextAssembler(
+            max_tokens=max_context_tokens,
+            encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+        )
+
     for file in files:
 
         context = None
@@ -505,8 +737,12 @@ def get_sources_from_files(
                 continue
 
             if full_context:
+                if full_context_assembler.is_full():
+                    log.debug(f"skipping {file} as the context budget is used up")
+                    continue
+
                 try:
-                    context = get_all_items_from_collections(collection_names)
+                    context = full_context_assembler.add_collections(collection_names)
                 except Exception as e:
                     log.exception(e)
 
@@ -763,6 +999,75 @@ from langchain_core.callbacks import Callbacks
 from langchain_core.documents import BaseDocumentCompressor, Document
 
 
+class RerankScoreCache:
+    """
+    LRU cache of reranker scores, keyed by (model, query hash, chunk hash). Chunks are
+    identified by the hash of their content, which is what their ids derive from.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.scores = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[float]:
+        with self.lock:
+            score = self.scores.get(key)
+            if score is not None:
+                self.scores.move_to_end(key)
+            return score
+
+    def set(self, key: tuple, score: float):
+        with self.lock:
+            self.scores[key] = score
+            self.scores.move_to_end(key)
+            while len(self.scores) > self.max_size:
+                self.scores.popitem(last=False)
+
+
+RERANK_SCORE_CACHE = RerankScoreCache(RAG_RERANKING_SCORE_CACHE_SIZE)
+
+
+def predict_reranking_scores(
+    reranking_function, pairs: list[tuple[str, str]]
+) -> list[float]:
+    """
+    Score (query, document) pairs with a single predict call of the reranker. Pairs
+    that are cached or repeated are not scored again.
+    """
+    if not pairs:
+        return []
+
+    # Cross-encoders score each pair on its own, others (ColBERT) over the whole batch
+    model = getattr(getattr(reranking_function, "config", None), "_name_or_path", None)
+    if (
+        RAG_RERANKING_SCORE_CACHE_SIZE <= 0
+        or model is None
+        or getattr(reranking_function, "batch_dependent_scores", False)
+    ):
+        return reranking_function.predict(pairs).tolist()
+
+    keys = [
+        (
+            model,
+            hashlib.sha256(query.encode()).hexdigest(),
+            hashlib.sha256(document.encode()).hexdigest(),
+        )
+        for query, document in pairs
+    ]
+    scores = {key: RERANK_SCORE_CACHE.get(key) for key in keys}
+
+    missing = {key: pair for key, pair in zip(keys, pairs) if scores[key] is None}
+    if missing:
+        predicted = reranking_function.predict(list(missing.values())).tolist()
+        for key, score in zip(missing, predicted):
+            scores[key] = score
+            RERANK_SCORE_CACHE.set(key, score)
+
+    log.debug(f"reranked {len(missing)} pairs, {len(keys) - len(missing)} cached")
+    return [scores[key] for key in keys]
+
+
 class RerankCompressor(BaseDocumentCompressor):
     embedding_function: Any
     top_n: int
@@ -779,22 +1084,53 @@ class RerankCompressor(BaseDocumentCompressor):
         query: str,
         callbacks: Optional[Callbacks] = None,
     ) -> Sequence[Document]:
+        return self.compress_documents_batch([(query, documents)])[0]
+
+    def compress_documents_batch(
+        self, batch: list[tuple[str, Sequence[Document]]]
+    ) -> list[list[Document]]:
+        """
+        Rerank the documents of several queries, with one call to the reranker for all.
+        """
         reranking = self.reranking_function is not None
 
         if reranking:
-            scores = self.reranking_function.predict(
-                [(query, doc.page_content) for doc in documents]
+            scores = iter(
+                predict_reranking_scores(
+                    self.reranking_function,
+                    [
+                        (query, doc.page_content)
+                        for query, documents in batch
+                        for doc in documents
+                    ],
+                )
             )
+            batch_scores = [[next(scores) for _ in documents] for _, documents in batch]
         else:
             from sentence_transformers import util
 
-            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents], RAG_EMBEDDING_CONTENT_PREFIX
-            )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
+            batch_scores = []
+            for query, documents in batch:
+                query_embedding = self.embedding_function(
+                    query, RAG_EMBEDDING_QUERY_PREFIX
+                )
+                document_embedding = self.embedding_function(
+                    [doc.page_content for doc in documents],
+                    RAG_EMBEDDING_CONTENT_PREFIX,
+                )
+                batch_scores.append(
+                    util.cos_sim(query_embedding, document_embedding)[0].tolist()
+                )
 
-        docs_with_scores = list(zip(documents, scores.tolist()))
+        return [
+            self._select_documents(documents, scores)
+            for (_, documents), scores in zip(batch, batch_scores)
+        ]
+
+    def _select_documents(
+        self, documents: Sequence[Document], scores: list[float]
+    ) -> list[Document]:
+        docs_with_scores = list(zip(documents, scores))
         if self.r_score:
             docs_with_scores = [
                 (d, s) for d, s in docs_with_scores if s >= self.r_score
@@ -803,8 +1139,8 @@ class RerankCompressor(BaseDocumentCompressor):
         result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
         final_results = []
         for doc, doc_score in result[: self.top_n]:
-            metadata = doc.metadata
-            metadata["score"] = doc_score
+            # The metadata may be shared by the candidates of several queries
+            metadata = {**doc.metadata, "score": doc_score}
             doc = Document(
                 page_content=doc.page_content,
                 metadata=metadata,
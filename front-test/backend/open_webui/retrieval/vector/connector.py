@@ -20,6 +20,10 @@ elif VECTOR_DB == "elasticsearch":
     from open_webui.retrieval.vector.dbs.elasticsearch import ElasticsearchClient
 
     VECTOR_DB_CLIENT = ElasticsearchClient()
+elif VECTOR_DB == "local":
+    from open_webui.retrieval.vector.dbs.local import LocalClient
+
+    VECTOR_DB_CLIENT = LocalClient()
 else:
     from open_webui.retrieval.vector.dbs.chroma import ChromaClient
 
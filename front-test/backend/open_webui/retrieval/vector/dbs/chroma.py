@@ -1,9 +1,10 @@
 import chromadb
 import logging
+import os
 from chromadb import Settings
 from chromadb.utils.batch_utils import create_batches
 
-from typing import Optional
+from typing import Iterator, Optional
 
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
 from open_webui.config import (
@@ -54,6 +55,20 @@ class ChromaClient:
                 database=CHROMA_DATABASE,
             )
 
+    def list_collections(self) -> list[str]:
+        # List the names of all the collections.
+        return list(self.client.list_collections())
+
+    def get_size(self) -> Optional[int]:
+        # Bytes used on disk by the embedded database, unknown for a server.
+        if CHROMA_HTTP_HOST != "":
+            return None
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(CHROMA_DATA_PATH)
+            for name in names
+        )
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
         collection_names = self.client.list_collections()
@@ -63,6 +78,27 @@ class ChromaClient:
         # Delete the collection based on the collection name.
         return self.client.delete_collection(name=collection_name)
 
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Rename the collection, replacing any collection already named new_collection_name.
+        # Chroma has no aliases: the collection replaced is renamed out of the way and only
+        # dropped once the source took its name, which leaves two metadata updates, and no
+        # copy, between the two.
+        retired_collection_name = f"{new_collection_name}-retired"
+        if self.has_collection(collection_name=retired_collection_name):
+            self.client.delete_collection(name=retired_collection_name)
+
+        retired = self.has_collection(collection_name=new_collection_name)
+        if retired:
+            self.client.get_collection(name=new_collection_name).modify(
+                name=retired_collection_name
+            )
+
+        self.client.get_collection(name=collection_name).modify(
+            name=new_collection_name
+        )
+        if retired:
+            self.client.delete_collection(name=retired_collection_name)
+
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
     ) -> Optional[SearchResult]:
@@ -77,9 +113,9 @@ class ChromaClient:
 
                 # chromadb has cosine distance, 2 (worst) -> 0 (best). Re-odering to 0 -> 1
                 # https://docs.trychroma.com/docs/collections/configure cosine equation
-                distances: list = result["distances"][0]
-                distances = [2 - dist for dist in distances]
-                distances = [[dist / 2 for dist in distances]]
+                distances = [
+                    [(2 - dist) / 2 for dist in dists] for dists in result["distances"]
+                ]
 
                 return SearchResult(
                     **{
@@ -130,6 +166,26 @@ class ChromaClient:
             )
         return None
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        collection = self.client.get_collection(name=collection_name)
+        offset = 0
+        while True:
+            result = collection.get(limit=batch_size, offset=offset)
+            if not result["ids"]:
+                return
+
+            yield GetResult(
+                **{
+                    "ids": [result["ids"]],
+                    "documents": [result["documents"]],
+                    "metadatas": [result["metadatas"]],
+                }
+            )
+            offset += len(result["ids"])
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection = self.client.get_or_create_collection(
@@ -165,6 +221,14 @@ class ChromaClient:
             ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
         )
 
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the items, keeping their vectors and documents.
+        collection = self.client.get_collection(name=collection_name)
+        for batch in create_batches(api=self.client, ids=ids, metadatas=metadatas):
+            collection.update(*batch)
+
     def delete(
         self,
         collection_name: str,
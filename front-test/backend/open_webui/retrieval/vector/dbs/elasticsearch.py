@@ -1,5 +1,7 @@
+import logging
 from elasticsearch import Elasticsearch, BadRequestError
-from typing import Optional
+from itertools import islice
+from typing import Iterator, Optional
 import ssl
 from elasticsearch.helpers import bulk, scan
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
@@ -13,6 +15,10 @@ from open_webui.config import (
     ELASTICSEARCH_INDEX_PREFIX,
     SSL_ASSERT_FINGERPRINT,
 )
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
 
 
 class ElasticsearchClient:
@@ -92,6 +98,32 @@ class ElasticsearchClient:
             metadatas=[metadatas],
         )
 
+    def _responses_to_search_result(self, responses) -> SearchResult:
+        # One result list per query of a multi search
+        ids = []
+        distances = []
+        documents = []
+        metadatas = []
+
+        for response in responses:
+            # A failed query of the batch comes back as an error instead of hits: fail
+            # the search as a single search would, rather than return no results
+            if response.get("error"):
+                log.error(f"Multi search query failed: {response['error']}")
+                raise Exception(f"Multi search query failed: {response['error']}")
+            hits = response["hits"]["hits"]
+            ids.append([hit["_id"] for hit in hits])
+            distances.append([hit["_score"] for hit in hits])
+            documents.append([hit["_source"].get("text") for hit in hits])
+            metadatas.append([hit["_source"].get("metadata") for hit in hits])
+
+        return SearchResult(
+            ids=ids,
+            distances=distances,
+            documents=documents,
+            metadatas=metadatas,
+        )
+
     # Status: works
     def _create_index(self, dimension: int):
         body = {
@@ -126,6 +158,37 @@ class ElasticsearchClient:
         for i in range(0, len(items), batch_size):
             yield items[i : min(i + batch_size, len(items))]
 
+    def list_collections(self) -> list[str]:
+        # Collections are a field of the shared indices: page through its distinct values
+        collection_names = []
+        after = None
+        while True:
+            aggregation = {
+                "size": 1000,
+                "sources": [{"collection": {"terms": {"field": "collection"}}}],
+            }
+            if after:
+                aggregation["after"] = after
+
+            result = self.client.search(
+                index=f"{self.index_prefix}*",
+                body={"size": 0, "aggs": {"collections": {"composite": aggregation}}},
+            )
+            aggregation_result = result["aggregations"]["collections"]
+            collection_names.extend(
+                bucket["key"]["collection"] for bucket in aggregation_result["buckets"]
+            )
+
+            after = aggregation_result.get("after_key")
+            if not aggregation_result["buckets"] or not after:
+                return collection_names
+
+    def compact(self):
+        # Collections are deleted by query: merge away the deleted documents
+        self.client.indices.forcemerge(
+            index=f"{self.index_prefix}*", only_expunge_deletes=True
+        )
+
     # Status: works
     def has_collection(self, collection_name) -> bool:
         query_body = {"query": {"bool": {"filter": []}}}
@@ -144,33 +207,66 @@ class ElasticsearchClient:
         query = {"query": {"term": {"collection": collection_name}}}
         self.client.delete_by_query(index=f"{self.index_prefix}*", body=query)
 
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Collections are a field of the shared indices, which index aliases cannot
+        # swap: relabel the source first, then delete the documents it replaces, so
+        # that searches see both for the length of the swap but never neither.
+        hits = scan(
+            self.client,
+            index=f"{self.index_prefix}*",
+            query={"query": {"term": {"collection": new_collection_name}}},
+            _source=False,
+        )
+        replaced_ids = [hit["_id"] for hit in hits]
+
+        self.client.update_by_query(
+            index=f"{self.index_prefix}*",
+            body={
+                "query": {"term": {"collection": collection_name}},
+                "script": {
+                    "source": "ctx._source.collection = params.collection",
+                    "params": {"collection": new_collection_name},
+                },
+            },
+            refresh=True,
+        )
+
+        for start in range(0, len(replaced_ids), 10000):
+            self.delete(new_collection_name, ids=replaced_ids[start : start + 10000])
+
     # Status: works
     def search(
         self, collection_name: str, vectors: list[list[float]], limit: int
     ) -> Optional[SearchResult]:
-        query = {
-            "size": limit,
-            "_source": ["text", "metadata"],
-            "query": {
-                "script_score": {
+        # One query per vector, sent together through the multi search API
+        searches = []
+        for vector in vectors:
+            searches.append({"index": self._get_index_name(len(vector))})
+            searches.append(
+                {
+                    "size": limit,
+                    "_source": ["text", "metadata"],
                     "query": {
-                        "bool": {"filter": [{"term": {"collection": collection_name}}]}
-                    },
-                    "script": {
-                        "source": "cosineSimilarity(params.vector, 'vector') + 1.0",
-                        "params": {
-                            "vector": vectors[0]
-                        },  # Assuming single query vector
+                        "script_score": {
+                            "query": {
+                                "bool": {
+                                    "filter": [
+                                        {"term": {"collection": collection_name}}
+                                    ]
+                                }
+                            },
+                            "script": {
+                                "source": "cosineSimilarity(params.vector, 'vector') + 1.0",
+                                "params": {"vector": vector},
+                            },
+                        }
                     },
                 }
-            },
-        }
+            )
 
-        result = self.client.search(
-            index=self._get_index_name(len(vectors[0])), body=query
-        )
+        result = self.client.msearch(searches=searches)
 
-        return self._result_to_search_result(result)
+        return self._responses_to_search_result(result["responses"])
 
     # Status: only tested halfwat
     def query(
@@ -224,6 +320,20 @@ class ElasticsearchClient:
 
         return self._scan_result_to_get_result(results)
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        query = {
+            "query": {"bool": {"filter": [{"term": {"collection": collection_name}}]}},
+            "_source": ["text", "metadata"],
+        }
+        hits = scan(
+            self.client, index=f"{self.index_prefix}*", query=query, size=batch_size
+        )
+        while batch := list(islice(hits, batch_size)):
+            yield self._scan_result_to_get_result(batch)
+
     # Status: works
     def insert(self, collection_name: str, items: list[VectorItem]):
         if not self._has_index(dimension=len(items[0]["vector"])):
@@ -267,6 +377,43 @@ class ElasticsearchClient:
             ]
             bulk(self.client, actions)
 
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the documents, keeping their vectors and texts. A
+        # partial document would be merged into the metadata object instead.
+        metadata_by_id = dict(zip(ids, metadatas))
+        for start in range(0, len(ids), 10000):
+            # Found first: the index of a document depends on its dimension
+            hits = scan(
+                self.client,
+                index=f"{self.index_prefix}*",
+                query={
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {"term": {"collection": collection_name}},
+                                {"terms": {"_id": ids[start : start + 10000]}},
+                            ]
+                        }
+                    }
+                },
+                _source=False,
+            )
+            actions = (
+                {
+                    "_op_type": "update",
+                    "_index": hit["_index"],
+                    "_id": hit["_id"],
+                    "script": {
+                        "source": "ctx._source.metadata = params.metadata",
+                        "params": {"metadata": metadata_by_id[hit["_id"]]},
+                    },
+                }
+                for hit in hits
+            )
+            bulk(self.client, actions)
+
     # Delete specific documents from a collection by filtering on both collection and document IDs.
     def delete(
         self,
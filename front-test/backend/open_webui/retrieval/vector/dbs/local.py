@@ -0,0 +1,745 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import hnswlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes are only serialized within the process
+    fcntl = None
+
+from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.config import (
+    LOCAL_VECTOR_DB_PATH,
+    LOCAL_VECTOR_DB_HNSW_M,
+    LOCAL_VECTOR_DB_HNSW_EF_CONSTRUCTION,
+    LOCAL_VECTOR_DB_HNSW_EF_SEARCH,
+    VECTOR_DB_QUANTIZATION,
+    VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+LOG_FILE = "log.jsonl"
+LOCK_FILE = "lock"
+
+# Compact a collection once its deleted rows outnumber the live ones, past this many
+COMPACTION_MIN_DELETED_ROWS = 1000
+# Save the HNSW graph once this many rows were indexed since the last save
+INDEX_SNAPSHOT_INTERVAL = 10000
+
+# Set bits of every byte, for Hamming distances between binary codes
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+# Rows scored at once on int8 codes
+QUANTIZED_SCORING_CHUNK_SIZE = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class QuantizedIndex:
+    """
+    Exhaustive search on compact codes of the vectors, followed by rescoring of the best
+    candidates on the full float32 vectors, read from the memory map. Only the codes are
+    kept in memory: int8 codes with a scale per row (about 4x smaller than float32), or
+    binary codes of the signs (32x smaller).
+
+    Takes the place of the HNSW graph, with the same methods.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        quantization: str,
+        oversampling: float,
+        get_vectors,
+    ):
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self.get_vectors = get_vectors
+
+        if quantization == "binary":
+            self.codes = np.empty((0, (dimension + 7) // 8), dtype=np.uint8)
+        else:
+            self.codes = np.empty((0, dimension), dtype=np.int8)
+        self.scales = np.empty(0, dtype=np.float32)
+        self.live = np.empty(0, dtype=bool)
+
+    def add_items(self, vectors: np.ndarray, labels: np.ndarray):
+        # Labels are the next rows, in order
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        if self.quantization == "binary":
+            codes = np.packbits(vectors > 0, axis=1)
+            scales = np.ones(len(vectors), dtype=np.float32)
+        else:
+            scales = 127 / np.maximum(np.abs(vectors).max(axis=1), 1e-12)
+            codes = np.rint(vectors * scales[:, None]).astype(np.int8)
+
+        self.codes = np.concatenate([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales.astype(np.float32)])
+        self.live = np.concatenate([self.live, np.ones(len(vectors), dtype=bool)])
+
+    def mark_deleted(self, label: int):
+        self.live[label] = False
+
+    def set_ef(self, ef: int):
+        pass
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        # Approximate similarities, higher is better
+        if self.quantization == "binary":
+            distances = POPCOUNT[np.bitwise_xor(self.codes, np.packbits(query > 0))]
+            scores = -distances.sum(axis=1, dtype=np.float32)
+        else:
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), QUANTIZED_SCORING_CHUNK_SIZE):
+                end = start + QUANTIZED_SCORING_CHUNK_SIZE
+                scores[start:end] = self.codes[start:end].astype(np.float32) @ query
+            scores /= self.scales
+
+        scores[~self.live] = -np.inf
+        return scores
+
+    def knn_query(self, vectors: np.ndarray, k: int):
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        candidates_count = min(
+            max(k, math.ceil(k * self.oversampling)), int(self.live.sum())
+        )
+
+        labels = []
+        distances = []
+        for query in vectors:
+            scores = self._scores(query)
+            candidates = np.sort(
+                np.argpartition(-scores, candidates_count - 1)[:candidates_count]
+            )
+
+            # Rescore the candidates on the full vectors
+            full_distances = (
+                1 - normalize(np.asarray(self.get_vectors(candidates))) @ query
+            )
+            order = np.argsort(full_distances)[:k]
+            labels.append(candidates[order])
+            distances.append(full_distances[order])
+
+        return np.array(labels), np.array(distances)
+
+
+class LocalCollection:
+    """
+    A collection stored in its own directory:
+
+    - vectors.<generation>.f32: float32 vectors, one row per item, memory-mapped for reads
+    - log.jsonl: append-only log of the ids, texts and metadata of the added rows and of
+      deletions. Its first record holds the dimension and the generation of the vector file.
+    - hnsw.<generation>.bin: snapshot of the HNSW graph, labelled by row. With
+      VECTOR_DB_QUANTIZATION, a QuantizedIndex replaces the graph.
+
+    Writes append the vectors, then the log records, each fsynced. Only the log defines what
+    exists: vector rows or a partial log line left by a crash are ignored and overwritten by
+    the next write. Compaction writes the next generation of the vector file and swaps in a
+    new log with os.replace.
+
+    The HNSW graph is brought up to date with the log on the next search rather than on
+    every write, so ingest only appends to files. Other processes sharing the directory
+    catch up by replaying the tail of the log.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.dimension = None
+        self.generation = 0
+        self.log_inode = None
+        self.log_offset = 0
+
+        # Per row, None once the row is deleted
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.id_to_row = {}
+        self.deleted_rows = 0
+
+        # metadata key -> value -> rows, for the filters of query and delete
+        self.filter_index = {}
+
+        self.index = None
+        self.indexed_rows = 0
+        self.snapshot_rows = 0
+        self._vectors = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        return self.rows - self.deleted_rows
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _vectors_file(self) -> str:
+        return self._file(f"vectors.{self.generation}.f32")
+
+    def _snapshot_file(self, extension: str) -> str:
+        return self._file(f"hnsw.{self.generation}.{extension}")
+
+    def exists(self) -> bool:
+        return os.path.exists(self._file(LOG_FILE))
+
+    @contextmanager
+    def _write_lock(self):
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file(LOCK_FILE), "a") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    ####################################
+    # Reads
+    ####################################
+
+    def refresh(self):
+        # Catch up with the log, which may have been written by another process
+        try:
+            stat = os.stat(self._file(LOG_FILE))
+        except FileNotFoundError:
+            if self.log_inode is not None:
+                self._reset()
+            return
+
+        if stat.st_ino != self.log_inode:
+            # First load, or the collection was compacted or recreated
+            self._reset()
+            self.log_inode = stat.st_ino
+
+        if stat.st_size > self.log_offset:
+            with open(self._file(LOG_FILE), "rb") as f:
+                f.seek(self.log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partial record of an interrupted write
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+
+                    self._apply(record)
+                    self.log_offset += len(line)
+
+    def _apply(self, record: dict):
+        op = record["op"]
+        if op == "init":
+            self.dimension = record["dimension"]
+            self.generation = record["generation"]
+        elif op == "add":
+            # Re-adding an id replaces the previous row
+            if record["id"] in self.id_to_row:
+                self._delete_row(self.id_to_row[record["id"]])
+
+            row = self.rows
+            self.ids.append(record["id"])
+            self.texts.append(record["text"])
+            self.metadatas.append(record["metadata"])
+            self.id_to_row[record["id"]] = row
+
+            for key, value in (record["metadata"] or {}).items():
+                if isinstance(value, (str, int, float, bool)):
+                    self.filter_index.setdefault(key, {}).setdefault(value, set()).add(
+                        row
+                    )
+        elif op == "delete":
+            for id in record["ids"]:
+                if id in self.id_to_row:
+                    self._delete_row(self.id_to_row[id])
+
+    def _delete_row(self, row: int):
+        for key, value in (self.metadatas[row] or {}).items():
+            if isinstance(value, (str, int, float, bool)):
+                self.filter_index[key][value].discard(row)
+
+        del self.id_to_row[self.ids[row]]
+        self.ids[row] = None
+        self.texts[row] = None
+        self.metadatas[row] = None
+        self.deleted_rows += 1
+
+        if self.index is not None and row < self.indexed_rows:
+            self.index.mark_deleted(row)
+
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != self.rows:
+            if self.rows == 0:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            self._vectors = np.memmap(
+                self._vectors_file(),
+                dtype=np.float32,
+                mode="r",
+                shape=(self.rows, self.dimension),
+            )
+        return self._vectors
+
+    def _load_index(self):
+        self.indexed_rows = 0
+        if VECTOR_DB_QUANTIZATION in ["int8", "binary"]:
+            # Codes are rebuilt from the vector file, which is quick
+            self.index = QuantizedIndex(
+                self.dimension,
+                VECTOR_DB_QUANTIZATION,
+                VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+                lambda rows: self.vectors()[rows],
+            )
+            return
+
+        self.index = hnswlib.Index(space="cosine", dim=self.dimension)
+
+        try:
+            with open(self._snapshot_file("json"), "r") as f:
+                snapshot_rows = json.load(f)["rows"]
+            if snapshot_rows <= self.rows:
+                self.index.load_index(
+                    self._snapshot_file("bin"), max_elements=max(self.rows, 1)
+                )
+                self.indexed_rows = self.snapshot_rows = snapshot_rows
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Rebuilding HNSW index of {self.path}: {e}")
+            self.index = hnswlib.Index(space="cosine", dim=self.dimension)
+
+        if self.indexed_rows == 0:
+            self.index.init_index(
+                max_elements=max(self.rows, 1024),
+                M=LOCAL_VECTOR_DB_HNSW_M,
+                ef_construction=LOCAL_VECTOR_DB_HNSW_EF_CONSTRUCTION,
+            )
+        else:
+            # Rows deleted since the snapshot was saved
+            for row in range(self.indexed_rows):
+                if self.ids[row] is None:
+                    try:
+                        self.index.mark_deleted(row)
+                    except RuntimeError:
+                        pass
+
+        self.index.set_ef(LOCAL_VECTOR_DB_HNSW_EF_SEARCH)
+
+    def _sync_index(self):
+        if self.dimension is None:
+            return
+        if self.index is None:
+            self._load_index()
+        if self.indexed_rows == self.rows:
+            return
+
+        quantized = isinstance(self.index, QuantizedIndex)
+        if not quantized and self.rows > self.index.get_max_elements():
+            self.index.resize_index(max(self.rows, 2 * self.index.get_max_elements()))
+
+        rows = np.arange(self.indexed_rows, self.rows)
+        self.index.add_items(self.vectors()[self.indexed_rows : self.rows], rows)
+        for row in rows:
+            if self.ids[row] is None:
+                self.index.mark_deleted(row)
+        self.indexed_rows = self.rows
+
+        if (
+            not quantized
+            and self.indexed_rows - self.snapshot_rows >= INDEX_SNAPSHOT_INTERVAL
+        ):
+            self._save_index()
+
+    def _brute_force_search(self, vectors: np.ndarray, k: int):
+        live = np.array([row for row, id in enumerate(self.ids) if id is not None])
+        distances = 1 - normalize(vectors) @ normalize(self.vectors()[live]).T
+        top = np.argsort(distances, axis=1)[:, :k]
+        return live[top], np.take_along_axis(distances, top, axis=1)
+
+    def search(self, vectors: list[list[float | int]], limit: int) -> SearchResult:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._sync_index()
+        k = min(limit, self.count)
+        if k == 0:
+            return SearchResult(
+                ids=[[] for _ in vectors],
+                distances=[[] for _ in vectors],
+                documents=[[] for _ in vectors],
+                metadatas=[[] for _ in vectors],
+            )
+
+        try:
+            self.index.set_ef(max(LOCAL_VECTOR_DB_HNSW_EF_SEARCH, k))
+            labels, distances = self.index.knn_query(vectors, k=k)
+        except RuntimeError:
+            # The graph can come short of k results when many rows are deleted
+            labels, distances = self._brute_force_search(vectors, k)
+
+        return SearchResult(
+            ids=[[self.ids[row] for row in rows] for rows in labels.tolist()],
+            # cosine distance, 2 (worst) -> 0 (best), normalized to 0 -> 1 as for chromadb
+            distances=[
+                [(2 - dist) / 2 for dist in dists] for dists in distances.tolist()
+            ],
+            documents=[[self.texts[row] for row in rows] for rows in labels.tolist()],
+            metadatas=[
+                [self.metadatas[row] for row in rows] for rows in labels.tolist()
+            ],
+        )
+
+    def filter_rows(self, filter: Optional[dict]) -> list[int]:
+        rows = None
+        for key, value in (filter or {}).items():
+            if isinstance(value, (str, int, float, bool)):
+                matches = self.filter_index.get(key, {}).get(value, set())
+            else:
+                matches = {
+                    row
+                    for row, metadata in enumerate(self.metadatas)
+                    if metadata is not None and metadata.get(key) == value
+                }
+            rows = matches if rows is None else rows & matches
+
+        if rows is None:
+            return [row for row, id in enumerate(self.ids) if id is not None]
+        return sorted(rows)
+
+    def to_get_result(self, rows: list[int]) -> GetResult:
+        return GetResult(
+            ids=[[self.ids[row] for row in rows]],
+            documents=[[self.texts[row] for row in rows]],
+            metadatas=[[self.metadatas[row] for row in rows]],
+        )
+
+    ####################################
+    # Writes
+    ####################################
+
+    def _append_log(self, records: list[dict]):
+        with open(self._file(LOG_FILE), "r+b") as f:
+            # Drop a partial record left by an interrupted write
+            f.seek(self.log_offset)
+            f.truncate()
+            f.write(b"".join(json.dumps(record).encode() + b"\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _create(self, dimension: int):
+        open(self._file("vectors.0.f32"), "wb").close()
+
+        tmp_path = self._file(f"{LOG_FILE}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(
+                json.dumps(
+                    {"op": "init", "dimension": dimension, "generation": 0}
+                ).encode()
+                + b"\n"
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file(LOG_FILE))
+
+    def add(self, items: list[VectorItem]):
+        with self._write_lock():
+            self.refresh()
+            if self.dimension is None:
+                self._create(len(items[0]["vector"]))
+                self.refresh()
+            self._add(items)
+
+    def update_metadata(self, ids: list[str], metadatas: list[dict]):
+        # Rows are immutable: the items are added again, with the vectors of their rows
+        with self._write_lock():
+            self.refresh()
+            vectors = self.vectors()
+            items = [
+                {
+                    "id": id,
+                    "text": self.texts[self.id_to_row[id]],
+                    "vector": vectors[self.id_to_row[id]],
+                    "metadata": metadata,
+                }
+                for id, metadata in zip(ids, metadatas)
+                if id in self.id_to_row
+            ]
+            if items:
+                self._add(items)
+
+    def _add(self, items: list[VectorItem]):
+        vectors = np.asarray([item["vector"] for item in items], dtype=np.float32)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match the collection dimension {self.dimension}"
+            )
+
+        with open(self._vectors_file(), "r+b") as f:
+            f.seek(self.rows * self.dimension * vectors.itemsize)
+            f.write(vectors.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._append_log(
+            [
+                {
+                    "op": "add",
+                    "id": item["id"],
+                    "text": item["text"],
+                    "metadata": item["metadata"],
+                }
+                for item in items
+            ]
+        )
+        self.refresh()
+        self._maybe_compact()
+
+    def delete(self, ids: Optional[list[str]] = None, filter: Optional[dict] = None):
+        with self._write_lock():
+            self.refresh()
+            if not ids and filter:
+                ids = [self.ids[row] for row in self.filter_rows(filter)]
+            ids = [id for id in (ids or []) if id in self.id_to_row]
+            if not ids:
+                return
+
+            self._append_log([{"op": "delete", "ids": ids}])
+            self.refresh()
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if (
+            self.deleted_rows >= COMPACTION_MIN_DELETED_ROWS
+            and self.deleted_rows > self.count
+        ):
+            self._compact()
+
+    def _save_index(self):
+        # Searches save snapshots without the write lock, keep temporary files per process
+        tmp_path = self._snapshot_file(f"bin.{os.getpid()}.tmp")
+        self.index.save_index(tmp_path)
+        os.replace(tmp_path, self._snapshot_file("bin"))
+
+        tmp_path = self._snapshot_file(f"json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"rows": self.indexed_rows}, f)
+        os.replace(tmp_path, self._snapshot_file("json"))
+        self.snapshot_rows = self.indexed_rows
+
+    def _compact(self):
+        log.info(f"Compacting {self.path}: {self.deleted_rows} deleted rows")
+        live = [row for row, id in enumerate(self.ids) if id is not None]
+        generation = self.generation + 1
+
+        vectors = self.vectors()
+        with open(self._file(f"vectors.{generation}.f32"), "wb") as f:
+            for start in range(0, len(live), INDEX_SNAPSHOT_INTERVAL):
+                f.write(
+                    np.ascontiguousarray(
+                        vectors[live[start : start + INDEX_SNAPSHOT_INTERVAL]]
+                    ).tobytes()
+                )
+            f.flush()
+            os.fsync(f.fileno())
+
+        tmp_path = self._file(f"{LOG_FILE}.tmp")
+        with open(tmp_path, "wb") as f:
+            records = [
+                {"op": "init", "dimension": self.dimension, "generation": generation}
+            ] + [
+                {
+                    "op": "add",
+                    "id": self.ids[row],
+                    "text": self.texts[row],
+                    "metadata": self.metadatas[row],
+                }
+                for row in live
+            ]
+            f.write(b"".join(json.dumps(record).encode() + b"\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The new log is the commit point, the previous generation is garbage after it
+        os.replace(tmp_path, self._file(LOG_FILE))
+        for name in os.listdir(self.path):
+            if name.startswith(("vectors.", "hnsw.")) and not name.startswith(
+                (f"vectors.{generation}.", f"hnsw.{generation}.")
+            ):
+                os.remove(self._file(name))
+
+        self._reset()
+        self.refresh()
+        self._sync_index()
+        if not isinstance(self.index, QuantizedIndex):
+            self._save_index()
+
+
+class LocalClient:
+    """
+    Embedded vector store for single-node deployments, with one directory per collection
+    under LOCAL_VECTOR_DB_PATH. See LocalCollection for the storage layout.
+    """
+
+    def __init__(self):
+        self.path = LOCAL_VECTOR_DB_PATH
+        self.collections: dict[str, LocalCollection] = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _get_collection(self, collection_name: str) -> LocalCollection:
+        # Collection names become directory names
+        name = re.sub(r"[^\w\-]", "_", collection_name)
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = LocalCollection(os.path.join(self.path, name))
+            return self.collections[name]
+
+    def list_collections(self) -> list[str]:
+        # List the names of all the collections, as directory names.
+        return [
+            entry.name
+            for entry in os.scandir(self.path)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, LOG_FILE))
+        ]
+
+    def get_size(self) -> int:
+        # Bytes used on disk by all the collections.
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(self.path)
+            for name in names
+        )
+
+    def compact(self):
+        # Rewrite the collections with deleted rows, which compaction on writes only does
+        # once they outnumber the live ones.
+        for collection_name in self.list_collections():
+            collection = self._get_collection(collection_name)
+            with collection._write_lock():
+                collection.refresh()
+                if collection.deleted_rows > 0:
+                    collection._compact()
+
+    def has_collection(self, collection_name: str) -> bool:
+        # Check if the collection exists based on the collection name.
+        return self._get_collection(collection_name).exists()
+
+    def delete_collection(self, collection_name: str):
+        # Delete the collection based on the collection name.
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            shutil.rmtree(collection.path, ignore_errors=True)
+            collection.refresh()
+
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Rename the collection, replacing any collection already named new_collection_name.
+        collection = self._get_collection(collection_name)
+        new_collection = self._get_collection(new_collection_name)
+        with collection.lock, new_collection.lock:
+            shutil.rmtree(new_collection.path, ignore_errors=True)
+            os.replace(collection.path, new_collection.path)
+            collection.refresh()
+            new_collection.refresh()
+
+    def search(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[SearchResult]:
+        # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            collection.refresh()
+            if collection.dimension is None:
+                return None
+            return collection.search(vectors, limit)
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        # Query the items from the collection based on the filter.
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            collection.refresh()
+            if collection.dimension is None:
+                return None
+            return collection.to_get_result(collection.filter_rows(filter)[:limit])
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        # Get all the items in the collection.
+        return self.query(collection_name, filter={})
+
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        collection = self._get_collection(collection_name)
+        with collection.lock:
+            collection.refresh()
+            # Compaction swaps these lists for new ones, deletions only clear entries
+            ids, texts, metadatas = (
+                collection.ids,
+                collection.texts,
+                collection.metadatas,
+            )
+
+        for start in range(0, len(ids), batch_size):
+            rows = [
+                row
+                for row in range(start, min(start + batch_size, len(ids)))
+                if ids[row] is not None
+            ]
+            if rows:
+                yield GetResult(
+                    ids=[[ids[row] for row in rows]],
+                    documents=[[texts[row] for row in rows]],
+                    metadatas=[[metadatas[row] for row in rows]],
+                )
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        # Insert the items into the collection, if the collection does not exist, it will be created.
+        self._get_collection(collection_name).add(items)
+
+    def upsert(self, collection_name: str, items: list[VectorItem]):
+        # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
+        self._get_collection(collection_name).add(items)
+
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the items, keeping their vectors and texts.
+        collection = self._get_collection(collection_name)
+        if collection.exists():
+            collection.update_metadata(ids, metadatas)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        # Delete the items from the collection based on the ids.
+        collection = self._get_collection(collection_name)
+        if collection.exists():
+            collection.delete(ids=ids, filter=filter)
+
+    def reset(self):
+        # Resets the database. This will delete all collections and item entries.
+        with self.lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            self.collections = {}
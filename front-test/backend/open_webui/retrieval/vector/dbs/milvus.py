@@ -2,7 +2,7 @@ from pymilvus import MilvusClient as Client
 from pymilvus import FieldSchema, DataType
 import json
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
 from open_webui.config import (
@@ -121,6 +121,14 @@ class MilvusClient:
             index_params=index_params,
         )
 
+    def list_collections(self) -> list[str]:
+        # List the names of all the collections, with "_" in place of "-" as stored.
+        return [
+            collection_name[len(self.collection_prefix) + 1 :]
+            for collection_name in self.client.list_collections()
+            if collection_name.startswith(f"{self.collection_prefix}_")
+        ]
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
         collection_name = collection_name.replace("-", "_")
@@ -135,6 +143,30 @@ class MilvusClient:
             collection_name=f"{self.collection_prefix}_{collection_name}"
         )
 
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Rename the collection, replacing any collection already named new_collection_name.
+        # The collection replaced is renamed out of the way and only dropped once the
+        # source took its name, which leaves two metadata updates between the two.
+        collection_name = collection_name.replace("-", "_")
+        new_collection_name = new_collection_name.replace("-", "_")
+        retired_collection_name = f"{new_collection_name}_retired"
+        if self.has_collection(retired_collection_name):
+            self.delete_collection(retired_collection_name)
+
+        retired = self.has_collection(new_collection_name)
+        if retired:
+            self.client.rename_collection(
+                old_name=f"{self.collection_prefix}_{new_collection_name}",
+                new_name=f"{self.collection_prefix}_{retired_collection_name}",
+            )
+
+        self.client.rename_collection(
+            old_name=f"{self.collection_prefix}_{collection_name}",
+            new_name=f"{self.collection_prefix}_{new_collection_name}",
+        )
+        if retired:
+            self.delete_collection(retired_collection_name)
+
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
     ) -> Optional[SearchResult]:
@@ -219,6 +251,27 @@ class MilvusClient:
         )
         return self._result_to_get_result([result])
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        # Pages are keyed on the primary key, as offsets are capped by Milvus.
+        collection_name = collection_name.replace("-", "_")
+        last_id = ""
+        while True:
+            result = self.client.query(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                filter=f"id > {json.dumps(last_id)}",
+                output_fields=["data", "metadata"],
+                limit=batch_size,
+            )
+            if not result:
+                return
+
+            result = sorted(result, key=lambda item: item["id"])
+            yield self._result_to_get_result([result])
+            last_id = result[-1]["id"]
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection_name = collection_name.replace("-", "_")
@@ -265,6 +318,32 @@ class MilvusClient:
             ],
         )
 
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the items, keeping their vectors and texts. Milvus
+        # has no partial updates: the items are read back and upserted.
+        collection_name = collection_name.replace("-", "_")
+        metadata_by_id = dict(zip(ids, metadatas))
+        for start in range(0, len(ids), 1000):
+            result = self.client.get(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                ids=ids[start : start + 1000],
+                output_fields=["vector", "data"],
+            )
+            self.client.upsert(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                data=[
+                    {
+                        "id": item["id"],
+                        "vector": item["vector"],
+                        "data": item["data"],
+                        "metadata": metadata_by_id[item["id"]],
+                    }
+                    for item in result
+                ],
+            )
+
     def delete(
         self,
         collection_name: str,
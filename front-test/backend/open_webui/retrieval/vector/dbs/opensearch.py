@@ -1,6 +1,8 @@
+import logging
 from opensearchpy import OpenSearch
-from opensearchpy.helpers import bulk
-from typing import Optional
+from opensearchpy.helpers import bulk, scan
+from itertools import islice
+from typing import Iterator, Optional
 
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
 from open_webui.config import (
@@ -10,6 +12,10 @@ from open_webui.config import (
     OPENSEARCH_USERNAME,
     OPENSEARCH_PASSWORD,
 )
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
 
 
 class OpenSearchClient:
@@ -62,6 +68,32 @@ class OpenSearchClient:
             metadatas=[metadatas],
         )
 
+    def _responses_to_search_result(self, responses) -> SearchResult:
+        # One result list per query of a multi search
+        ids = []
+        distances = []
+        documents = []
+        metadatas = []
+
+        for response in responses:
+            # A failed query of the batch comes back as an error instead of hits: fail
+            # the search as a single search would, rather than return no results
+            if response.get("error"):
+                log.error(f"Multi search query failed: {response['error']}")
+                raise Exception(f"Multi search query failed: {response['error']}")
+            hits = response["hits"]["hits"]
+            ids.append([hit["_id"] for hit in hits])
+            distances.append([hit["_score"] for hit in hits])
+            documents.append([hit["_source"].get("text") for hit in hits])
+            metadatas.append([hit["_source"].get("metadata") for hit in hits])
+
+        return SearchResult(
+            ids=ids,
+            distances=distances,
+            documents=documents,
+            metadatas=metadatas,
+        )
+
     def _create_index(self, collection_name: str, dimension: int):
         body = {
             "settings": {"index": {"knn": True}},
@@ -96,6 +128,28 @@ class OpenSearchClient:
         for i in range(0, len(items), batch_size):
             yield items[i : i + batch_size]
 
+    def _get_aliases(self) -> dict[str, str]:
+        # Alias -> index. A reindexed collection is an alias of the index it was built
+        # in, so that it can be swapped atomically.
+        return {
+            alias: index
+            for index, info in self.client.indices.get_alias(
+                index=f"{self.index_prefix}_*"
+            ).items()
+            for alias in info.get("aliases", {})
+        }
+
+    def list_collections(self) -> list[str]:
+        # One index per collection, listed under its alias if it has one
+        aliased = {}
+        for alias, index in self._get_aliases().items():
+            aliased.setdefault(index, []).append(alias)
+
+        names = []
+        for index in self.client.indices.get(index=f"{self.index_prefix}_*"):
+            names += aliased.get(index, [index])
+        return [name[len(self.index_prefix) + 1 :] for name in names]
+
     def has_collection(self, collection_name: str) -> bool:
         # has_collection here means has index.
         # We are simply adapting to the norms of the other DBs.
@@ -104,7 +158,28 @@ class OpenSearchClient:
     def delete_collection(self, collection_name: str):
         # delete_collection here means delete index.
         # We are simply adapting to the norms of the other DBs.
-        self.client.indices.delete(index=self._get_index_name(collection_name))
+        index = self._get_index_name(collection_name)
+        # An alias cannot be deleted as an index: delete the index behind it
+        self.client.indices.delete(index=self._get_aliases().get(index, index))
+
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Indices cannot be renamed: point an alias with the new name to the index, and
+        # remove the index it replaces, in one atomic aliases update.
+        aliases = self._get_aliases()
+        source = self._get_index_name(collection_name)
+        target = self._get_index_name(new_collection_name)
+        source = aliases.get(source, source)
+
+        actions = []
+        previous = aliases.get(target)
+        if previous is not None:
+            if previous != source:
+                actions.append({"remove_index": {"index": previous}})
+        elif self.client.indices.exists(index=target):
+            actions.append({"remove_index": {"index": target}})
+        actions.append({"add": {"index": source, "alias": target}})
+
+        self.client.indices.update_aliases(body={"actions": actions})
 
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
@@ -113,28 +188,32 @@ class OpenSearchClient:
             if not self.has_collection(collection_name):
                 return None
 
-            query = {
-                "size": limit,
-                "_source": ["text", "metadata"],
-                "query": {
-                    "script_score": {
-                        "query": {"match_all": {}},
-                        "script": {
-                            "source": "(cosineSimilarity(params.query_value, doc[params.field]) + 1.0) / 2.0",
-                            "params": {
-                                "field": "vector",
-                                "query_value": vectors[0],
-                            },  # Assuming single query vector
+            # One query per vector, sent together through the multi search API
+            body = []
+            for vector in vectors:
+                body.append({"index": self._get_index_name(collection_name)})
+                body.append(
+                    {
+                        "size": limit,
+                        "_source": ["text", "metadata"],
+                        "query": {
+                            "script_score": {
+                                "query": {"match_all": {}},
+                                "script": {
+                                    "source": "(cosineSimilarity(params.query_value, doc[params.field]) + 1.0) / 2.0",
+                                    "params": {
+                                        "field": "vector",
+                                        "query_value": vector,
+                                    },
+                                },
+                            }
                         },
                     }
-                },
-            }
+                )
 
-            result = self.client.search(
-                index=self._get_index_name(collection_name), body=query
-            )
+            result = self.client.msearch(body=body)
 
-            return self._result_to_search_result(result)
+            return self._responses_to_search_result(result["responses"])
 
         except Exception as e:
             return None
@@ -181,6 +260,19 @@ class OpenSearchClient:
         )
         return self._result_to_get_result(result)
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        hits = scan(
+            self.client,
+            index=self._get_index_name(collection_name),
+            query={"query": {"match_all": {}}, "_source": ["text", "metadata"]},
+            size=batch_size,
+        )
+        while batch := list(islice(hits, batch_size)):
+            yield self._result_to_get_result({"hits": {"hits": batch}})
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         self._create_index_if_not_exists(
             collection_name=collection_name, dimension=len(items[0]["vector"])
@@ -224,6 +316,28 @@ class OpenSearchClient:
             ]
             bulk(self.client, actions)
 
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the documents, keeping their vectors and texts. A
+        # partial document would be merged into the metadata object instead.
+        for start in range(0, len(ids), 100):
+            actions = [
+                {
+                    "_op_type": "update",
+                    "_index": self._get_index_name(collection_name),
+                    "_id": id,
+                    "script": {
+                        "source": "ctx._source.metadata = params.metadata",
+                        "params": {"metadata": metadata},
+                    },
+                }
+                for id, metadata in zip(
+                    ids[start : start + 100], metadatas[start : start + 100]
+                )
+            ]
+            bulk(self.client, actions)
+
     def delete(
         self,
         collection_name: str,
@@ -1,5 +1,7 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
+import hashlib
 import logging
+import threading
 from sqlalchemy import (
     cast,
     column,
@@ -11,19 +13,31 @@ from sqlalchemy import (
     text,
     Text,
     Table,
+    update,
     values,
 )
 from sqlalchemy.sql import true
 from sqlalchemy.pool import NullPool
 
 from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
-from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.dialects.postgresql import JSONB, array, insert
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.exc import NoSuchTableError
 
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
-from open_webui.config import PGVECTOR_DB_URL, PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+from open_webui.config import (
+    PGVECTOR_DB_URL,
+    PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH,
+    PGVECTOR_INDEX_METHOD,
+    PGVECTOR_IVFFLAT_LISTS,
+    PGVECTOR_IVFFLAT_PROBES,
+    PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION,
+    PGVECTOR_HNSW_EF_SEARCH,
+    PGVECTOR_ENABLE_COLLECTION_INDEXES,
+    PGVECTOR_COLLECTION_INDEX_MIN_ROWS,
+)
 
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -46,6 +60,11 @@ class DocumentChunk(Base):
 
 class PgvectorClient:
     def __init__(self) -> None:
+        # Collections known to have their own partial index, or to have it built
+        self.collection_indexes = set()
+        # Rows of the collections below PGVECTOR_COLLECTION_INDEX_MIN_ROWS, counted on
+        # their first write and estimated from the items written since
+        self.collection_counts = {}
 
         # if no pgvector uri, use the existing database connection
         if not PGVECTOR_DB_URL:
@@ -75,12 +94,7 @@ class PgvectorClient:
             Base.metadata.create_all(bind=connection)
 
             # Create an index on the vector column if it doesn't exist
-            self.session.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_vector "
-                    "ON document_chunk USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);"
-                )
-            )
+            self.create_vector_index()
             self.session.execute(
                 text(
                     "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name "
@@ -94,6 +108,153 @@ class PgvectorClient:
             log.exception(f"Error during initialization: {e}")
             raise
 
+    def create_vector_index(self) -> None:
+        # Index of the whole table, replacing the one of another method
+        indexes = {
+            "ivfflat": (
+                "idx_document_chunk_vector",
+                f"ivfflat (vector vector_cosine_ops) WITH (lists = {PGVECTOR_IVFFLAT_LISTS})",
+            ),
+            "hnsw": (
+                "idx_document_chunk_vector_hnsw",
+                f"hnsw (vector vector_cosine_ops) WITH (m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION})",
+            ),
+        }
+
+        for method, (index_name, index) in indexes.items():
+            if method == PGVECTOR_INDEX_METHOD:
+                self.session.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {index_name} "
+                        f"ON document_chunk USING {index};"
+                    )
+                )
+            else:
+                self.session.execute(text(f"DROP INDEX IF EXISTS {index_name};"))
+
+    def get_collection_index_name(self, collection_name: str) -> str:
+        return f"idx_document_chunk_vector_{hashlib.md5(collection_name.encode()).hexdigest()[:16]}"
+
+    def ensure_collection_index(self, collection_name: str, num_items: int = 0) -> None:
+        """
+        Build a partial HNSW index over the rows of the collection once it holds
+        PGVECTOR_COLLECTION_INDEX_MIN_ROWS rows, so that its searches only walk its own
+        graph. Smaller collections are scanned exactly through the collection_name index.
+
+        Called after num_items were written: the rows are only counted on the first
+        write of the collection, and once the estimate reaches the threshold.
+        """
+        if (
+            not PGVECTOR_ENABLE_COLLECTION_INDEXES
+            or collection_name in self.collection_indexes
+        ):
+            return
+
+        count = self.collection_counts.get(collection_name)
+        if count is not None and count + num_items < PGVECTOR_COLLECTION_INDEX_MIN_ROWS:
+            self.collection_counts[collection_name] = count + num_items
+            return
+
+        index_name = self.get_collection_index_name(collection_name)
+        try:
+            exists = self.session.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = :index_name"),
+                {"index_name": index_name},
+            ).first()
+            if not exists:
+                count = (
+                    self.session.query(DocumentChunk)
+                    .filter(DocumentChunk.collection_name == collection_name)
+                    .count()
+                )
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            log.warning(f"Error counting collection '{collection_name}': {e}")
+            return
+
+        if not exists and count < PGVECTOR_COLLECTION_INDEX_MIN_ROWS:
+            self.collection_counts[collection_name] = count
+            return
+
+        self.collection_counts.pop(collection_name, None)
+        self.collection_indexes.add(collection_name)
+        if not exists:
+            threading.Thread(
+                target=self.create_collection_index,
+                args=(collection_name, count),
+                daemon=True,
+            ).start()
+
+    def create_collection_index(self, collection_name: str, count: int) -> None:
+        # Built concurrently, which takes no lock blocking the writes of the shared table,
+        # and cannot run in a transaction: use an autocommit connection of its own
+        index_name = self.get_collection_index_name(collection_name)
+        # DDL takes no bind parameters
+        literal = collection_name.replace("'", "''")
+        try:
+            with self.session.get_bind().connect() as connection:
+                connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                    text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                        f"ON document_chunk USING hnsw (vector vector_cosine_ops) "
+                        f"WITH (m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION}) "
+                        f"WHERE collection_name = '{literal}';"
+                    )
+                )
+            log.info(
+                f"Created vector index {index_name} for collection '{collection_name}' ({count} items)."
+            )
+        except Exception as e:
+            self.collection_indexes.discard(collection_name)
+            log.warning(f"Error creating index for collection '{collection_name}': {e}")
+            try:
+                # A failed concurrent build leaves an invalid index behind
+                with self.session.get_bind().connect() as connection:
+                    connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                        text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};")
+                    )
+            except Exception as e:
+                log.warning(f"Error dropping invalid index {index_name}: {e}")
+
+    def drop_collection_index(
+        self, collection_name: str, rebuild: bool = False
+    ) -> None:
+        """
+        Drop the partial index of the collection in the background. With rebuild=True,
+        it is built again afterwards if the collection is large enough, e.g. once its
+        rows were renamed into the predicate of the index.
+        """
+        if not PGVECTOR_ENABLE_COLLECTION_INDEXES:
+            return
+
+        self.collection_indexes.discard(collection_name)
+        self.collection_counts.pop(collection_name, None)
+        threading.Thread(
+            target=self.drop_collection_index_concurrently,
+            args=(collection_name, rebuild),
+            daemon=True,
+        ).start()
+
+    def drop_collection_index_concurrently(
+        self, collection_name: str, rebuild: bool = False
+    ) -> None:
+        # A plain DROP INDEX locks the shared table, and every collection with it
+        index_name = self.get_collection_index_name(collection_name)
+        try:
+            with self.session.get_bind().connect() as connection:
+                connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                    text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};")
+                )
+        except Exception as e:
+            log.warning(f"Error dropping index for collection '{collection_name}': {e}")
+
+        # Writes in the meantime may have seen the index before it was dropped
+        self.collection_indexes.discard(collection_name)
+        self.collection_counts.pop(collection_name, None)
+        if rebuild:
+            self.ensure_collection_index(collection_name)
+
     def check_vector_length(self) -> None:
         """
         Check if the VECTOR_LENGTH matches the existing vector column dimension in the database.
@@ -134,61 +295,60 @@ class PgvectorClient:
         current_length = len(vector)
         if current_length < VECTOR_LENGTH:
             # Pad the vector with zeros
-            vector += [0.0] * (VECTOR_LENGTH - current_length)
+            vector = list(vector) + [0.0] * (VECTOR_LENGTH - current_length)
         elif current_length > VECTOR_LENGTH:
             raise Exception(
                 f"Vector length {current_length} not supported. Max length must be <= {VECTOR_LENGTH}"
             )
         return vector
 
+    def write_items(
+        self, collection_name: str, items: List[VectorItem], upsert: bool = False
+    ) -> None:
+        # One multi-row INSERT per batch (executemany with insertmanyvalues)
+        stmt = insert(DocumentChunk)
+        if upsert:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DocumentChunk.id],
+                set_={
+                    "vector": stmt.excluded.vector,
+                    "collection_name": stmt.excluded.collection_name,
+                    "text": stmt.excluded.text,
+                    "vmetadata": stmt.excluded.vmetadata,
+                },
+            )
+
+        self.session.execute(
+            stmt,
+            [
+                {
+                    "id": item["id"],
+                    "vector": self.adjust_vector_length(item["vector"]),
+                    "collection_name": collection_name,
+                    "text": item["text"],
+                    "vmetadata": item["metadata"],
+                }
+                for item in items
+            ],
+        )
+
     def insert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
-            new_items = []
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                new_chunk = DocumentChunk(
-                    id=item["id"],
-                    vector=vector,
-                    collection_name=collection_name,
-                    text=item["text"],
-                    vmetadata=item["metadata"],
-                )
-                new_items.append(new_chunk)
-            self.session.bulk_save_objects(new_items)
+            self.write_items(collection_name, items)
             self.session.commit()
             log.info(
-                f"Inserted {len(new_items)} items into collection '{collection_name}'."
+                f"Inserted {len(items)} items into collection '{collection_name}'."
             )
         except Exception as e:
             self.session.rollback()
             log.exception(f"Error during insert: {e}")
             raise
 
+        self.ensure_collection_index(collection_name, len(items))
+
     def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                existing = (
-                    self.session.query(DocumentChunk)
-                    .filter(DocumentChunk.id == item["id"])
-                    .first()
-                )
-                if existing:
-                    existing.vector = vector
-                    existing.text = item["text"]
-                    existing.vmetadata = item["metadata"]
-                    existing.collection_name = (
-                        collection_name  # Update collection_name if necessary
-                    )
-                else:
-                    new_chunk = DocumentChunk(
-                        id=item["id"],
-                        vector=vector,
-                        collection_name=collection_name,
-                        text=item["text"],
-                        vmetadata=item["metadata"],
-                    )
-                    self.session.add(new_chunk)
+            self.write_items(collection_name, items, upsert=True)
             self.session.commit()
             log.info(
                 f"Upserted {len(items)} items into collection '{collection_name}'."
@@ -198,6 +358,29 @@ class PgvectorClient:
             log.exception(f"Error during upsert: {e}")
             raise
 
+        self.ensure_collection_index(collection_name, len(items))
+
+    def update_metadata(
+        self, collection_name: str, ids: List[str], metadatas: List[Dict[str, Any]]
+    ) -> None:
+        # Replace the metadata of the items, keeping their vectors and texts.
+        try:
+            self.session.execute(
+                update(DocumentChunk),
+                [
+                    {"id": id, "vmetadata": metadata}
+                    for id, metadata in zip(ids, metadatas)
+                ],
+            )
+            self.session.commit()
+            log.info(
+                f"Updated the metadata of {len(ids)} items in collection '{collection_name}'."
+            )
+        except Exception as e:
+            self.session.rollback()
+            log.exception(f"Error during metadata update: {e}")
+            raise
+
     def search(
         self,
         collection_name: str,
@@ -212,6 +395,15 @@ class PgvectorClient:
             vectors = [self.adjust_vector_length(vector) for vector in vectors]
             num_queries = len(vectors)
 
+            # Search settings only last for this transaction, which ends with the search
+            if PGVECTOR_HNSW_EF_SEARCH is not None:
+                ef_search = max(PGVECTOR_HNSW_EF_SEARCH, limit or 0)
+                self.session.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search};"))
+            if PGVECTOR_IVFFLAT_PROBES is not None:
+                self.session.execute(
+                    text(f"SET LOCAL ivfflat.probes = {PGVECTOR_IVFFLAT_PROBES};")
+                )
+
             def vector_expr(vector):
                 return cast(array(vector), Vector(VECTOR_LENGTH))
 
@@ -261,6 +453,7 @@ class PgvectorClient:
 
             result_proxy = self.session.execute(stmt)
             results = result_proxy.all()
+            self.session.commit()
 
             ids = [[] for _ in range(num_queries)]
             distances = [[] for _ in range(num_queries)]
@@ -288,6 +481,7 @@ class PgvectorClient:
                 ids=ids, distances=distances, documents=documents, metadatas=metadatas
             )
         except Exception as e:
+            self.session.rollback()
             log.exception(f"Error during search: {e}")
             return None
 
@@ -347,6 +541,29 @@ class PgvectorClient:
             log.exception(f"Error during get: {e}")
             return None
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Keyset pagination on the primary key, so later pages stay as cheap as the first
+        last_id = None
+        while True:
+            query = self.session.query(DocumentChunk).filter(
+                DocumentChunk.collection_name == collection_name
+            )
+            if last_id is not None:
+                query = query.filter(DocumentChunk.id > last_id)
+
+            results = query.order_by(DocumentChunk.id).limit(batch_size).all()
+            if not results:
+                return
+
+            yield GetResult(
+                ids=[[result.id for result in results]],
+                documents=[[result.text for result in results]],
+                metadatas=[[result.vmetadata for result in results]],
+            )
+            last_id = results[-1].id
+
     def delete(
         self,
         collection_name: str,
@@ -366,6 +583,8 @@ class PgvectorClient:
                     )
             deleted = query.delete(synchronize_session=False)
             self.session.commit()
+            # Counted again on the next write
+            self.collection_counts.pop(collection_name, None)
             log.info(f"Deleted {deleted} items from collection '{collection_name}'.")
         except Exception as e:
             self.session.rollback()
@@ -387,6 +606,36 @@ class PgvectorClient:
     def close(self) -> None:
         pass
 
+    def list_collections(self) -> List[str]:
+        try:
+            return [
+                row[0]
+                for row in self.session.query(DocumentChunk.collection_name).distinct()
+            ]
+        except Exception as e:
+            self.session.rollback()
+            log.exception(f"Error listing collections: {e}")
+            raise
+
+    def get_size(self) -> Optional[int]:
+        # Bytes used by the table, its indexes and TOAST data
+        try:
+            return self.session.execute(
+                text("SELECT pg_total_relation_size('document_chunk');")
+            ).scalar()
+        except Exception as e:
+            self.session.rollback()
+            log.exception(f"Error getting the size of document_chunk: {e}")
+            return None
+
+    def compact(self) -> None:
+        # VACUUM cannot run in a transaction: use an autocommit connection of its own
+        with self.session.get_bind().connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("VACUUM (ANALYZE) document_chunk;")
+            )
+        log.info("Vacuumed 'document_chunk'.")
+
     def has_collection(self, collection_name: str) -> bool:
         try:
             exists = (
@@ -402,4 +651,32 @@ class PgvectorClient:
 
     def delete_collection(self, collection_name: str) -> None:
         self.delete(collection_name)
+        self.drop_collection_index(collection_name)
         log.info(f"Collection '{collection_name}' deleted.")
+
+    def rename_collection(self, collection_name: str, new_collection_name: str) -> None:
+        # Both statements run in one transaction, so readers never see an empty collection.
+        try:
+            self.session.query(DocumentChunk).filter(
+                DocumentChunk.collection_name == new_collection_name
+            ).delete(synchronize_session=False)
+            renamed = (
+                self.session.query(DocumentChunk)
+                .filter(DocumentChunk.collection_name == collection_name)
+                .update(
+                    {DocumentChunk.collection_name: new_collection_name},
+                    synchronize_session=False,
+                )
+            )
+            self.session.commit()
+            log.info(
+                f"Renamed collection '{collection_name}' to '{new_collection_name}' ({renamed} items)."
+            )
+        except Exception as e:
+            self.session.rollback()
+            log.exception(f"Error during rename: {e}")
+            raise
+
+        # Partial indexes are tied to the name in their predicate
+        self.drop_collection_index(collection_name)
+        self.drop_collection_index(new_collection_name, rebuild=True)
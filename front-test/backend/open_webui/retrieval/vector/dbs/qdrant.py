@@ -1,12 +1,18 @@
-from typing import Optional
+from typing import Iterator, Optional
 import logging
 
+import numpy as np
 from qdrant_client import QdrantClient as Qclient
 from qdrant_client.http.models import PointStruct
 from qdrant_client.models import models
 
 from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
-from open_webui.config import QDRANT_URI, QDRANT_API_KEY
+from open_webui.config import (
+    QDRANT_URI,
+    QDRANT_API_KEY,
+    VECTOR_DB_QUANTIZATION,
+    VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+)
 from open_webui.env import SRC_LOG_LEVELS
 
 NO_LIMIT = 999999999
@@ -45,6 +51,20 @@ class QdrantClient:
             }
         )
 
+    def _get_quantization_config(self):
+        # Quantized codes are kept in RAM, the full vectors are only read for rescoring
+        if VECTOR_DB_QUANTIZATION == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8, always_ram=True
+                )
+            )
+        elif VECTOR_DB_QUANTIZATION == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+        return None
+
     def _create_collection(self, collection_name: str, dimension: int):
         collection_name_with_prefix = f"{self.collection_prefix}_{collection_name}"
         self.client.create_collection(
@@ -52,6 +72,7 @@ class QdrantClient:
             vectors_config=models.VectorParams(
                 size=dimension, distance=models.Distance.COSINE
             ),
+            quantization_config=self._get_quantization_config(),
         )
 
         log.info(f"collection {collection_name_with_prefix} successfully created!")
@@ -66,22 +87,82 @@ class QdrantClient:
         return [
             PointStruct(
                 id=item["id"],
-                vector=item["vector"],
+                vector=(
+                    item["vector"].tolist()
+                    if isinstance(item["vector"], np.ndarray)
+                    else item["vector"]
+                ),
                 payload={"text": item["text"], "metadata": item["metadata"]},
             )
             for item in items
         ]
 
+    def _get_aliases(self) -> dict[str, str]:
+        # Alias -> collection. A reindexed collection is an alias of the collection it
+        # was built in, so that it can be swapped atomically.
+        return {
+            alias.alias_name: alias.collection_name
+            for alias in self.client.get_aliases().aliases
+            if alias.alias_name.startswith(f"{self.collection_prefix}_")
+        }
+
+    def list_collections(self) -> list[str]:
+        # Collections behind an alias are listed under the alias name
+        aliased = {}
+        for alias_name, collection_name in self._get_aliases().items():
+            aliased.setdefault(collection_name, []).append(alias_name)
+
+        names = []
+        for collection in self.client.get_collections().collections:
+            if collection.name.startswith(f"{self.collection_prefix}_"):
+                names += aliased.get(collection.name, [collection.name])
+        return [name[len(self.collection_prefix) + 1 :] for name in names]
+
     def has_collection(self, collection_name: str) -> bool:
         return self.client.collection_exists(
             f"{self.collection_prefix}_{collection_name}"
         )
 
     def delete_collection(self, collection_name: str):
+        # Dropping the collection behind an alias drops the alias too
+        name = f"{self.collection_prefix}_{collection_name}"
         return self.client.delete_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
+            collection_name=self._get_aliases().get(name, name)
         )
 
+    def rename_collection(self, collection_name: str, new_collection_name: str):
+        # Qdrant cannot rename collections: point an alias with the new name to the
+        # collection, then drop the collection the alias pointed to before.
+        aliases = self._get_aliases()
+        source = f"{self.collection_prefix}_{collection_name}"
+        target = f"{self.collection_prefix}_{new_collection_name}"
+        source = aliases.get(source, source)
+
+        operations = []
+        previous = aliases.get(target)
+        if previous is not None:
+            operations.append(
+                models.DeleteAliasOperation(
+                    delete_alias=models.DeleteAlias(alias_name=target)
+                )
+            )
+        elif self.client.collection_exists(target):
+            # An alias cannot shadow a collection: the first swap of a collection
+            # created under its own name drops it before the alias is created
+            self.client.delete_collection(collection_name=target)
+
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(
+                    collection_name=source, alias_name=target
+                )
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+
+        if previous is not None and previous != source:
+            self.client.delete_collection(collection_name=previous)
+
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
     ) -> Optional[SearchResult]:
@@ -89,18 +170,45 @@ class QdrantClient:
         if limit is None:
             limit = NO_LIMIT  # otherwise qdrant would set limit to 10!
 
-        query_response = self.client.query_points(
+        # All the query vectors in one request
+        query_responses = self.client.query_batch_points(
             collection_name=f"{self.collection_prefix}_{collection_name}",
-            query=vectors[0],
-            limit=limit,
+            requests=[
+                models.QueryRequest(
+                    query=vector,
+                    limit=limit,
+                    with_payload=True,
+                    params=(
+                        models.SearchParams(
+                            quantization=models.QuantizationSearchParams(
+                                rescore=True,
+                                oversampling=VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+                            )
+                        )
+                        if VECTOR_DB_QUANTIZATION
+                        else None
+                    ),
+                )
+                for vector in vectors
+            ],
         )
-        get_result = self._result_to_get_result(query_response.points)
-        return SearchResult(
-            ids=get_result.ids,
-            documents=get_result.documents,
-            metadatas=get_result.metadatas,
+
+        ids = []
+        distances = []
+        documents = []
+        metadatas = []
+        for query_response in query_responses:
+            get_result = self._result_to_get_result(query_response.points)
+            ids.extend(get_result.ids)
+            documents.extend(get_result.documents)
+            metadatas.extend(get_result.metadatas)
             # qdrant distance is [-1, 1], normalize to [0, 1]
-            distances=[[(point.score + 1.0) / 2.0 for point in query_response.points]],
+            distances.append(
+                [(point.score + 1.0) / 2.0 for point in query_response.points]
+            )
+
+        return SearchResult(
+            ids=ids, distances=distances, documents=documents, metadatas=metadatas
         )
 
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
@@ -137,6 +245,22 @@ class QdrantClient:
         )
         return self._result_to_get_result(points.points)
 
+    def get_batches(
+        self, collection_name: str, batch_size: int = 1000
+    ) -> Iterator[GetResult]:
+        # Get all the items in the collection, batch_size items at a time.
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                limit=batch_size,
+                offset=offset,
+            )
+            if points:
+                yield self._result_to_get_result(points)
+            if offset is None:
+                return
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
@@ -149,6 +273,22 @@ class QdrantClient:
         points = self._create_points(items)
         return self.client.upsert(f"{self.collection_prefix}_{collection_name}", points)
 
+    def update_metadata(
+        self, collection_name: str, ids: list[str], metadatas: list[dict]
+    ):
+        # Replace the metadata of the items, keeping their vectors and texts.
+        return self.client.batch_update_points(
+            collection_name=f"{self.collection_prefix}_{collection_name}",
+            update_operations=[
+                models.SetPayloadOperation(
+                    set_payload=models.SetPayload(
+                        payload={"metadata": metadata}, points=[id]
+                    )
+                )
+                for id, metadata in zip(ids, metadatas)
+            ],
+        )
+
     def delete(
         self,
         collection_name: str,
@@ -156,17 +296,15 @@ class QdrantClient:
         filter: Optional[dict] = None,
     ):
         # Delete the items from the collection based on the ids.
+        if ids:
+            return self.client.delete(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                points_selector=models.PointIdsList(points=ids),
+            )
+
         field_conditions = []
 
-        if ids:
-            for id_value in ids:
-                field_conditions.append(
-                    models.FieldCondition(
-                        key="metadata.id",
-                        match=models.MatchValue(value=id_value),
-                    ),
-                ),
-        elif filter:
+        if filter:
             for key, value in filter.items():
                 field_conditions.append(
                     models.FieldCondition(
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+from open_webui.config import WEB_LOADER_CACHE_DIR, WEB_LOADER_CACHE_MAX_SIZE
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Once over the maximum size, the least recently used pages are evicted down to this ratio
+CACHE_EVICTION_RATIO = 0.9
+
+
+def parse_cache_control(headers: Mapping[str, str]) -> dict[str, Optional[str]]:
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def get_freshness_lifetime(headers: Mapping[str, str]) -> float:
+    """
+    Seconds during which a response can be served from the cache without revalidation,
+    from Cache-Control or Expires (RFC 9111). Without either, cached pages are always
+    revalidated.
+    """
+    cache_control = parse_cache_control(headers)
+    if "no-cache" in cache_control:
+        return 0
+
+    for directive in ["s-maxage", "max-age"]:
+        if (cache_control.get(directive) or "").isdigit():
+            age = headers.get("Age", "0")
+            return int(cache_control[directive]) - (int(age) if age.isdigit() else 0)
+
+    if "Expires" in headers:
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class WebPageCache:
+    """
+    Cache of fetched web pages on disk, shared by all the web loaders (and processes).
+    Every page is stored as two files named after the hash of its URL: the text and
+    its metadata (validators and expiry). The metadata is written last and marks the
+    entry as complete.
+
+    Pages are revalidated with If-None-Match / If-Modified-Since once expired, and the
+    total size of the cache is bounded by evicting the least recently used pages.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self.size: Optional[int] = None
+        os.makedirs(path, exist_ok=True)
+
+    def _get_paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return (
+            os.path.join(self.path, f"{key}.json"),
+            os.path.join(self.path, f"{key}.body"),
+        )
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, url: str) -> Optional[tuple[dict, str]]:
+        meta_path, body_path = self._get_paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                text = f.read().decode()
+            # The modification time of the body orders the pages for eviction
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("url") != url:
+            return None
+        return meta, text
+
+    def is_fresh(self, meta: dict) -> bool:
+        return time.time() < meta["expires_at"]
+
+    def get_validators(self, meta: dict) -> dict[str, str]:
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def set(self, url: str, text: str, headers: Mapping[str, str]):
+        cache_control = parse_cache_control(headers)
+        if "no-store" in cache_control or "private" in cache_control:
+            return
+
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "expires_at": time.time() + get_freshness_lifetime(headers),
+        }
+        if not (meta["etag"] or meta["last_modified"] or self.is_fresh(meta)):
+            # Could neither be served nor revalidated
+            return
+
+        body = text.encode()
+        if len(body) > self.max_size:
+            return
+
+        meta_path, body_path = self._get_paths(url)
+        try:
+            self._write(body_path, body)
+            self._write(meta_path, json.dumps(meta).encode())
+        except OSError as e:
+            log.warning(f"Error caching {url}: {e}")
+            return
+
+        if self.size is not None:
+            self.size += len(body)
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+
+    def refresh(self, url: str, meta: dict, headers: Mapping[str, str]):
+        """
+        Extend the freshness of a cached page after a 304 Not Modified response.
+        """
+        meta = {
+            **meta,
+            "etag": headers.get("ETag", meta.get("etag")),
+            "last_modified": headers.get("Last-Modified", meta.get("last_modified")),
+            "expires_at": time.time() + get_freshness_lifetime(headers),
+        }
+        meta_path, _ = self._get_paths(url)
+        try:
+            self._write(meta_path, json.dumps(meta).encode())
+        except OSError as e:
+            log.warning(f"Error caching {url}: {e}")
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".body"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        if size > self.max_size:
+            for _, entry_size, body_path in sorted(entries):
+                if size <= self.max_size * CACHE_EVICTION_RATIO:
+                    break
+                for path in [body_path[: -len(".body")] + ".json", body_path]:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                size -= entry_size
+        self.size = size
+
+
+web_page_cache = (
+    WebPageCache(WEB_LOADER_CACHE_DIR, WEB_LOADER_CACHE_MAX_SIZE)
+    if WEB_LOADER_CACHE_MAX_SIZE > 0
+    else None
+)
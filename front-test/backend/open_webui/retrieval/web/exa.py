@@ -2,9 +2,8 @@ import logging
 from dataclasses import dataclass
 from typing import Optional
 
-import requests
 from open_webui.env import SRC_LOG_LEVELS
-from open_webui.retrieval.web.main import SearchResult
+from open_webui.retrieval.web.main import SearchResult, http_session
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
@@ -46,7 +45,7 @@ def search_exa(
     }
 
     try:
-        response = requests.post(
+        response = http_session.post(
             f"{EXA_API_BASE}/search", headers=headers, json=payload
         )
         response.raise_for_status()
@@ -1,7 +1,6 @@
 import logging
 
-import requests
-from open_webui.retrieval.web.main import SearchResult
+from open_webui.retrieval.web.main import SearchResult, http_session
 from open_webui.env import SRC_LOG_LEVELS
 from yarl import URL
 
@@ -31,7 +30,7 @@ def search_jina(api_key: str, query: str, count: int) -> list[SearchResult]:
     payload = {"q": query, "count": count if count <= 10 else 10}
 
     url = str(URL(jina_search_endpoint))
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_session.post(url, headers=headers, json=payload)
     response.raise_for_status()
     data = response.json()
 
@@ -3,7 +3,21 @@ import validators
 from typing import Optional
 from urllib.parse import urlparse
 
+import requests
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from open_webui.config import WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS
+
+# Keep-alive connections shared by the search engine clients, so that concurrent
+# searches do not each open a new connection (and TLS handshake)
+http_session = requests.Session()
+http_session.mount(
+    "https://", HTTPAdapter(pool_maxsize=WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS)
+)
+http_session.mount(
+    "http://", HTTPAdapter(pool_maxsize=WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS)
+)
 
 
 def get_filtered_results(results, filter_list):
@@ -1,8 +1,11 @@
 import logging
 from typing import Optional, List
-import requests
 
-from open_webui.retrieval.web.main import SearchResult, get_filtered_results
+from open_webui.retrieval.web.main import (
+    SearchResult,
+    get_filtered_results,
+    http_session,
+)
 from open_webui.env import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
@@ -51,7 +54,7 @@ def search_perplexity(
         }
 
         # Make the API request
-        response = requests.request("POST", url, json=payload, headers=headers)
+        response = http_session.request("POST", url, json=payload, headers=headers)
 
         # Parse the JSON response
         json_response = response.json()
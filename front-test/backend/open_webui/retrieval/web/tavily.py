@@ -1,8 +1,7 @@
 import logging
 from typing import Optional
 
-import requests
-from open_webui.retrieval.web.main import SearchResult
+from open_webui.retrieval.web.main import SearchResult, http_session
 from open_webui.env import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
@@ -27,7 +26,7 @@ def search_tavily(
     """
     url = "https://api.tavily.com/search"
     data = {"query": query, "api_key": api_key}
-    response = requests.post(url, json=data)
+    response = http_session.post(url, json=data)
     response.raise_for_status()
 
     json_response = response.json()
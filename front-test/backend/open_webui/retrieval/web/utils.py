@@ -25,6 +25,7 @@ from langchain_community.document_loaders.firecrawl import FireCrawlLoader
 from langchain_community.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
 from open_webui.retrieval.loaders.tavily import TavilyLoader
+from open_webui.retrieval.web.cache import web_page_cache
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.config import (
     ENABLE_RAG_LOCAL_WEB_FETCH,
@@ -137,6 +138,30 @@ class RateLimitMixin:
         self.last_request_time = datetime.now()
 
 
+class AsyncRateLimiter:
+    """
+    Rate limit shared by concurrent tasks: at most max_concurrent calls in flight, started
+    at most requests_per_second. Each caller reserves the next free slot before sleeping,
+    so tasks arriving together are spread out instead of all firing at once.
+    """
+
+    def __init__(self, requests_per_second: float, max_concurrent: int):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self.next_request_time = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        now = asyncio.get_running_loop().time()
+        request_time = max(now, self.next_request_time)
+        self.next_request_time = request_time + self.min_interval
+        if request_time > now:
+            await asyncio.sleep(request_time - now)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
 class URLProcessingMixin:
     def _verify_ssl_cert(self, url: str) -> bool:
         """Verify SSL certificate for a URL."""
@@ -481,6 +506,31 @@ class SafePlaywrightURLLoader(PlaywrightURLLoader, RateLimitMixin, URLProcessing
             await browser.close()
 
 
+_http_sessions: dict[bool, aiohttp.ClientSession] = {}
+
+
+def get_http_session(trust_env: bool = False) -> aiohttp.ClientSession:
+    """
+    Session shared by all the web loaders, so that connections to the same hosts are
+    pooled and kept alive between loads.
+    """
+    session = _http_sessions.get(trust_env)
+    if (
+        session is None
+        or session.closed
+        or session._loop is not asyncio.get_running_loop()
+    ):
+        session = aiohttp.ClientSession(trust_env=trust_env)
+        _http_sessions[trust_env] = session
+    return session
+
+
+async def close_http_sessions():
+    for session in _http_sessions.values():
+        await session.close()
+    _http_sessions.clear()
+
+
 class SafeWebBaseLoader(WebBaseLoader):
     """WebBaseLoader with enhanced error handling for URLs."""
 
@@ -496,31 +546,52 @@ class SafeWebBaseLoader(WebBaseLoader):
     async def _fetch(
         self, url: str, retries: int = 3, cooldown: int = 2, backoff: float = 1.5
     ) -> str:
-        async with aiohttp.ClientSession(trust_env=self.trust_env) as session:
-            for i in range(retries):
-                try:
-                    kwargs: Dict = dict(
-                        headers=self.session.headers,
-                        cookies=self.session.cookies.get_dict(),
-                    )
-                    if not self.session.verify:
-                        kwargs["ssl"] = False
-
-                    async with session.get(
-                        url, **(self.requests_kwargs | kwargs)
-                    ) as response:
-                        if self.raise_for_status:
-                            response.raise_for_status()
-                        return await response.text()
-                except aiohttp.ClientConnectionError as e:
-                    if i == retries - 1:
-                        raise
-                    else:
-                        log.warning(
-                            f"Error fetching {url} with attempt "
-                            f"{i + 1}/{retries}: {e}. Retrying..."
+        # The cache reads and writes files: off the event loop
+        cached = (
+            await asyncio.to_thread(web_page_cache.get, url) if web_page_cache else None
+        )
+        if cached and web_page_cache.is_fresh(cached[0]):
+            return cached[1]
+
+        session = get_http_session(self.trust_env)
+        for i in range(retries):
+            try:
+                kwargs: Dict = dict(
+                    headers={
+                        **self.session.headers,
+                        **(web_page_cache.get_validators(cached[0]) if cached else {}),
+                    },
+                    cookies=self.session.cookies.get_dict(),
+                )
+                if not self.session.verify:
+                    kwargs["ssl"] = False
+
+                async with session.get(
+                    url, **(self.requests_kwargs | kwargs)
+                ) as response:
+                    if response.status == 304 and cached:
+                        await asyncio.to_thread(
+                            web_page_cache.refresh, url, cached[0], response.headers
                         )
-                        await asyncio.sleep(cooldown * backoff**i)
+                        return cached[1]
+
+                    if self.raise_for_status:
+                        response.raise_for_status()
+                    text = await response.text()
+                    if web_page_cache and response.status == 200:
+                        await asyncio.to_thread(
+                            web_page_cache.set, url, text, response.headers
+                        )
+                    return text
+            except aiohttp.ClientConnectionError as e:
+                if i == retries - 1:
+                    raise
+                else:
+                    log.warning(
+                        f"Error fetching {url} with attempt "
+                        f"{i + 1}/{retries}: {e}. Retrying..."
+                    )
+                    await asyncio.sleep(cooldown * backoff**i)
         raise ValueError("retry count exceeded")
 
     def _unpack_fetch_results(
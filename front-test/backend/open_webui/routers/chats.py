@@ -23,6 +23,7 @@ from pydantic import BaseModel
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_permission
+from open_webui.utils.chat_save import CHAT_EVENT_WRITER
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -260,6 +261,17 @@ async def get_all_user_chats_in_db(user=Depends(get_admin_user)):
     return [ChatResponse(**chat.model_dump()) for chat in Chats.get_chats()]
 
 
+############################
+# GetChatEventMetrics
+############################
+
+
+@router.get("/events/metrics", response_model=dict)
+async def get_chat_event_metrics(user=Depends(get_admin_user)):
+    # Counters of the background writer of the event emitters, since the start
+    return CHAT_EVENT_WRITER.get_metrics()
+
+
 ############################
 # GetArchivedChats
 ############################
@@ -399,13 +411,14 @@ async def update_chat_message_by_id(
             detail=ERROR_MESSAGES.ACCESS_PROHIBITED,
         )
 
-    chat = Chats.upsert_message_to_chat_by_id_and_message_id(
+    Chats.upsert_message_to_chat_by_id_and_message_id(
         id,
         message_id,
         {
             "content": form_data.content,
         },
     )
+    chat = Chats.get_chat_by_id(id)
 
     event_emitter = get_event_emitter(
         {
@@ -1,11 +1,12 @@
+import asyncio
 import json
 import logging
 import mimetypes
 import os
 import shutil
 
-import uuid
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 from typing import Iterator, List, Optional, Sequence, Union
 
@@ -23,10 +24,9 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import tiktoken
+import numpy as np
 
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
 from langchain_core.documents import Document
 
 from open_webui.models.files import FileModel, Files
@@ -40,9 +40,15 @@ from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
 from open_webui.retrieval.loaders.main import Loader
 from open_webui.retrieval.loaders.youtube import YoutubeLoader
 
+# Text splitters
+from open_webui.retrieval.splitter import TextSplitter, get_splitter
+
+# Embedding models
+from open_webui.retrieval.models.embedding_worker import EmbeddingWorker
+
 # Web search engines
 from open_webui.retrieval.web.main import SearchResult
-from open_webui.retrieval.web.utils import get_web_loader
+from open_webui.retrieval.web.utils import AsyncRateLimiter, get_web_loader
 from open_webui.retrieval.web.brave import search_brave
 from open_webui.retrieval.web.kagi import search_kagi
 from open_webui.retrieval.web.mojeek import search_mojeek
@@ -63,7 +69,9 @@ from open_webui.retrieval.web.perplexity import search_perplexity
 from open_webui.retrieval.web.sougou import search_sougou
 
 from open_webui.retrieval.utils import (
+    get_chunk_ids,
     get_embedding_function,
+    generate_embeddings_async,
     get_model_path,
     query_collection,
     query_collection_with_hybrid_search,
@@ -85,6 +93,10 @@ from open_webui.config import (
     DEFAULT_LOCALE,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_QUERY_PREFIX,
+    RAG_EMBEDDING_WORKER_BATCH_SIZE,
+    RAG_EMBEDDING_WORKER_MAX_WAIT_MS,
+    WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS,
+    WEB_SEARCH_ENGINE_REQUESTS_PER_SECOND,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -96,6 +108,14 @@ from open_webui.constants import ERROR_MESSAGES
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
+# Number of extracted pages that are split and embedded together when streaming
+STREAMING_PAGE_BATCH_SIZE = 16
+
+# Shared by all the web searches of the process
+web_search_rate_limiter = AsyncRateLimiter(
+    WEB_SEARCH_ENGINE_REQUESTS_PER_SECOND, WEB_SEARCH_ENGINE_CONCURRENT_REQUESTS
+)
+
 ##########################################
 #
 # Utility functions
@@ -113,10 +133,14 @@ def get_ef(
         from sentence_transformers import SentenceTransformer
 
         try:
-            ef = SentenceTransformer(
-                get_model_path(embedding_model, auto_update),
-                device=DEVICE_TYPE,
-                trust_remote_code=RAG_EMBEDDING_MODEL_TRUST_REMOTE_CODE,
+            ef = EmbeddingWorker(
+                SentenceTransformer(
+                    get_model_path(embedding_model, auto_update),
+                    device=DEVICE_TYPE,
+                    trust_remote_code=RAG_EMBEDDING_MODEL_TRUST_REMOTE_CODE,
+                ),
+                max_batch_size=RAG_EMBEDDING_WORKER_BATCH_SIZE,
+                max_wait=RAG_EMBEDDING_WORKER_MAX_WAIT_MS / 1000,
             )
         except Exception as e:
             log.debug(f"Error loading SentenceTransformer: {e}")
@@ -269,6 +293,10 @@ async def update_embedding_config(
                 form_data.embedding_batch_size
             )
 
+        # Stop the worker thread of the previous model
+        if request.app.state.ef is not None:
+            request.app.state.ef.close()
+
         request.app.state.ef = get_ef(
             request.app.state.config.RAG_EMBEDDING_ENGINE,
             request.app.state.config.RAG_EMBEDDING_MODEL,
@@ -792,6 +820,142 @@ async def update_rag_config(
 ####################################
 
 
+def get_text_splitter(request: Request) -> TextSplitter:
+    # Splitters are reused across uploads while the config does not change
+    return get_splitter(
+        request.app.state.config.TEXT_SPLITTER,
+        request.app.state.config.CHUNK_SIZE,
+        request.app.state.config.CHUNK_OVERLAP,
+        str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+    )
+
+
+def get_chunk_texts_and_metadatas(
+    request: Request, docs: list[Document], metadata: Optional[dict] = None
+) -> tuple[list[str], list[dict]]:
+    texts = [doc.page_content for doc in docs]
+    metadatas = [
+        {
+            **doc.metadata,
+            **(metadata if metadata else {}),
+            "embedding_config": json.dumps(
+                {
+                    "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+                    "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+                }
+            ),
+        }
+        for doc in docs
+    ]
+
+    # ChromaDB does not like datetime formats
+    # for meta-data so convert them to string.
+    for metadata in metadatas:
+        for key, value in metadata.items():
+            if (
+                isinstance(value, datetime)
+                or isinstance(value, list)
+                or isinstance(value, dict)
+            ):
+                metadata[key] = str(value)
+
+    return texts, metadatas
+
+
+def embed_chunks(request: Request, texts: list[str], user=None) -> np.ndarray:
+    embedding_function = get_embedding_function(
+        request.app.state.config.RAG_EMBEDDING_ENGINE,
+        request.app.state.config.RAG_EMBEDDING_MODEL,
+        request.app.state.ef,
+        (
+            request.app.state.config.RAG_OPENAI_API_BASE_URL
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else request.app.state.config.RAG_OLLAMA_BASE_URL
+        ),
+        (
+            request.app.state.config.RAG_OPENAI_API_KEY
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else request.app.state.config.RAG_OLLAMA_API_KEY
+        ),
+        request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+    )
+
+    # One float32 array instead of lists of Python floats, about 8x smaller
+    return np.asarray(
+        embedding_function(
+            list(map(lambda x: x.replace("\n", " "), texts)),
+            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+            user=user,
+        ),
+        dtype=np.float32,
+    )
+
+
+def store_chunks(
+    request: Request,
+    collection_name: str,
+    ids: list[str],
+    texts: list[str],
+    metadatas: list[dict],
+    embeddings: np.ndarray,
+    upsert: bool = False,
+):
+    items = [
+        {
+            "id": ids[idx],
+            "text": text,
+            "vector": embeddings[idx],
+            "metadata": metadatas[idx],
+        }
+        for idx, text in enumerate(texts)
+    ]
+
+    if upsert:
+        VECTOR_DB_CLIENT.upsert(
+            collection_name=collection_name,
+            items=items,
+        )
+    else:
+        VECTOR_DB_CLIENT.insert(
+            collection_name=collection_name,
+            items=items,
+        )
+
+    # Late-interaction rerankers (ColBERT) keep per-token embeddings of the chunks, which
+    # are computed once here instead of on every search
+    if hasattr(request.app.state.rf, "index_documents"):
+        try:
+            request.app.state.rf.index_documents(texts)
+        except Exception as e:
+            log.warning(f"Error precomputing reranker embeddings: {e}")
+
+
+def embed_and_store_chunks(
+    request: Request,
+    collection_name: str,
+    ids: list[str],
+    texts: list[str],
+    metadatas: list[dict],
+    upsert: bool = False,
+    user=None,
+):
+    embeddings = embed_chunks(request, texts, user=user)
+    store_chunks(
+        request, collection_name, ids, texts, metadatas, embeddings, upsert=upsert
+    )
+
+
+def get_chunk_metadatas(collection_name: str, file_id: Optional[str] = None) -> dict:
+    # Every chunk of the file, by id. query and get return at most 10 results on
+    # some backends when there is no limit, so the whole collection is paged instead.
+    chunk_metadatas = {}
+    for result in VECTOR_DB_CLIENT.get_batches(collection_name=collection_name):
+        for id, metadata in zip(result.ids[0], result.metadatas[0]):
+            if file_id is None or (metadata or {}).get("file_id") == file_id:
+                chunk_metadatas[id] = metadata
+    return chunk_metadatas
+
+
 def save_docs_to_vector_db(
     request: Request,
     docs,
@@ -800,8 +964,17 @@ def save_docs_to_vector_db(
     overwrite: bool = False,
     split: bool = True,
     add: bool = False,
+    incremental: bool = False,
     user=None,
 ) -> bool:
+    """
+    Split, embed and store the docs in the collection.
+
+    With incremental=True, the chunks are diffed against the chunks already stored
+    for the same file (or the whole collection when there is no file_id): only new or
+    changed chunks are embedded and inserted, and chunks that disappeared are deleted.
+    """
+
     def _get_docs_info(docs: list[Document]) -> str:
         docs_info = set()
 
@@ -823,7 +996,7 @@ def save_docs_to_vector_db(
     )
 
     # Check if entries with the same hash (metadata.hash) already exist
-    if metadata and "hash" in metadata:
+    if metadata and "hash" in metadata and not incremental:
         result = VECTOR_DB_CLIENT.query(
             collection_name=collection_name,
             filter={"hash": metadata["hash"]},
@@ -836,108 +1009,75 @@ def save_docs_to_vector_db(
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
     if split:
-        if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-        elif request.app.state.config.TEXT_SPLITTER == "token":
-            log.info(
-                f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
-            )
-
-            tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
-            text_splitter = TokenTextSplitter(
-                encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-        else:
-            raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
-
+        text_splitter = get_text_splitter(request)
         docs = text_splitter.split_documents(docs)
 
     if len(docs) == 0:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
-        {
-            **doc.metadata,
-            **(metadata if metadata else {}),
-            "embedding_config": json.dumps(
-                {
-                    "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                    "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-                }
-            ),
-        }
-        for doc in docs
-    ]
+    texts, metadatas = get_chunk_texts_and_metadatas(request, docs, metadata)
 
-    # ChromaDB does not like datetime formats
-    # for meta-data so convert them to string.
-    for metadata in metadatas:
-        for key, value in metadata.items():
-            if (
-                isinstance(value, datetime)
-                or isinstance(value, list)
-                or isinstance(value, dict)
-            ):
-                metadata[key] = str(value)
+    ids = get_chunk_ids(collection_name, texts, metadatas)
 
     try:
+        existing_metadatas = {}
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
             if overwrite:
                 VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
                 log.info(f"deleting existing collection {collection_name}")
+            elif incremental:
+                existing_metadatas = get_chunk_metadatas(
+                    collection_name, metadatas[0].get("file_id")
+                )
             elif add is False:
                 log.info(
                     f"collection {collection_name} already exists, overwrite is False and add is False"
                 )
                 return True
 
-        log.info(f"adding to collection {collection_name}")
-        embedding_function = get_embedding_function(
-            request.app.state.config.RAG_EMBEDDING_ENGINE,
-            request.app.state.config.RAG_EMBEDDING_MODEL,
-            request.app.state.ef,
-            (
-                request.app.state.config.RAG_OPENAI_API_BASE_URL
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else request.app.state.config.RAG_OLLAMA_BASE_URL
-            ),
-            (
-                request.app.state.config.RAG_OPENAI_API_KEY
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else request.app.state.config.RAG_OLLAMA_API_KEY
-            ),
-            request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
-        )
+        if incremental:
+            # Unchanged chunks keep their id and vector; only the diff is embedded
+            stale_ids = set(existing_metadatas).difference(ids)
+            if stale_ids:
+                VECTOR_DB_CLIENT.delete(
+                    collection_name=collection_name, ids=list(stale_ids)
+                )
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts)),
-            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
-            user=user,
-        )
+            # The metadata of unchanged chunks still follows the new file: its hash, and
+            # the position of chunks that moved
+            updated_indices = [
+                idx
+                for idx, id in enumerate(ids)
+                if id in existing_metadatas and existing_metadatas[id] != metadatas[idx]
+            ]
+            if updated_indices:
+                VECTOR_DB_CLIENT.update_metadata(
+                    collection_name=collection_name,
+                    ids=[ids[idx] for idx in updated_indices],
+                    metadatas=[metadatas[idx] for idx in updated_indices],
+                )
 
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
+            new_indices = [
+                idx for idx, id in enumerate(ids) if id not in existing_metadatas
+            ]
+            log.info(
+                f"incremental update of {collection_name}: {len(new_indices)} new, "
+                f"{len(stale_ids)} removed, {len(updated_indices)} updated, "
+                f"{len(ids) - len(new_indices) - len(updated_indices)} unchanged chunks"
+            )
+            if not new_indices:
+                return True
 
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
+            ids = [ids[idx] for idx in new_indices]
+            texts = [texts[idx] for idx in new_indices]
+            metadatas = [metadatas[idx] for idx in new_indices]
+
+        log.info(f"adding to collection {collection_name}")
+        # Chunk ids are content-derived, re-adding a chunk must not fail
+        embed_and_store_chunks(
+            request, collection_name, ids, texts, metadatas, upsert=add, user=user
         )
 
         return True
@@ -946,18 +1086,126 @@ def save_docs_to_vector_db(
         raise e
 
 
+def stream_docs_to_vector_db(
+    request: Request,
+    docs: Iterator[Document],
+    collection_name: str,
+    metadata: Optional[dict] = None,
+    user=None,
+) -> bool:
+    """
+    Split, embed and store the docs while they are being produced by the loader, a
+    batch of pages at a time: the first chunks are embedded while later pages are
+    still being extracted, and memory is bounded by the batch instead of the document.
+    """
+    if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
+        log.info(f"collection {collection_name} already exists")
+        return True
+
+    log.info(f"streaming documents to collection {collection_name}")
+    text_splitter = get_text_splitter(request)
+
+    occurrences = {}
+    chunk_count = 0
+    try:
+        while batch := list(islice(docs, STREAMING_PAGE_BATCH_SIZE)):
+            chunks = text_splitter.split_documents(batch)
+            if not chunks:
+                continue
+
+            texts, metadatas = get_chunk_texts_and_metadatas(request, chunks, metadata)
+            ids = get_chunk_ids(collection_name, texts, metadatas, occurrences)
+            # Upserted, as in save_docs_to_vector_db: a concurrent request for the same
+            # file may have stored some of these ids already
+            embed_and_store_chunks(
+                request, collection_name, ids, texts, metadatas, upsert=True, user=user
+            )
+            chunk_count += len(texts)
+    except Exception as e:
+        log.exception(e)
+        # Do not leave a partially indexed collection behind
+        if chunk_count:
+            VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+        raise e
+
+    if chunk_count == 0:
+        raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+
+    log.info(f"streamed {chunk_count} chunks to collection {collection_name}")
+    return True
+
+
+def save_web_docs_to_vector_db(
+    request: Request, docs: dict[str, Document], user=None
+) -> list[str]:
+    """
+    Store each web page in its own collection. The chunks of all the pages are embedded
+    together, in as few calls to the embedding engine as possible. Collections are named
+    after the content of their page, and existing ones are reused as they are.
+
+    Returns the names of the collections holding the pages, pages without text are
+    skipped.
+    """
+    text_splitter = get_text_splitter(request)
+
+    existing_collection_names = []
+    collections = {}
+    for collection_name, doc in docs.items():
+        if not (doc and doc.page_content):
+            continue
+        if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
+            existing_collection_names.append(collection_name)
+            continue
+
+        chunks = text_splitter.split_documents([doc])
+        texts, metadatas = get_chunk_texts_and_metadatas(request, chunks)
+        if texts:
+            ids = get_chunk_ids(collection_name, texts, metadatas)
+            collections[collection_name] = (ids, texts, metadatas)
+
+    if not collections:
+        return existing_collection_names
+
+    embeddings = embed_chunks(
+        request,
+        [text for _, texts, _ in collections.values() for text in texts],
+        user=user,
+    )
+
+    offset = 0
+    for collection_name, (ids, texts, metadatas) in collections.items():
+        # Chunk ids are content-derived, a concurrent search may store the same page
+        store_chunks(
+            request,
+            collection_name,
+            ids,
+            texts,
+            metadatas,
+            embeddings[offset : offset + len(texts)],
+            upsert=True,
+        )
+        offset += len(texts)
+
+    return existing_collection_names + list(collections)
+
+
 class ProcessFileForm(BaseModel):
     file_id: str
     content: Optional[str] = None
     collection_name: Optional[str] = None
 
 
-@router.post("/process/file")
-def process_file(
+def index_file(
     request: Request,
     form_data: ProcessFileForm,
-    user=Depends(get_verified_user),
+    user=None,
+    save_collection_name: bool = True,
 ):
+    """
+    Extract, split, embed and store a file in form_data.collection_name, or in its own
+    collection. With save_collection_name=False, the collection is not recorded in
+    the file metadata, e.g. for the temporary collections of a reindex.
+    """
     try:
         file = Files.get_file_by_id(form_data.file_id)
 
@@ -966,17 +1214,12 @@ def process_file(
         if collection_name is None:
             collection_name = f"file-{file.id}"
 
+        streamed = False
         if form_data.content:
             # Update the content in the file
             # Usage: /files/{file_id}/data/content/update, /files/ (audio file upload pipeline)
 
-            try:
-                # /files/{file_id}/data/content/update
-                VECTOR_DB_CLIENT.delete_collection(collection_name=f"file-{file.id}")
-            except:
-                # Audio file upload pipeline
-                pass
-
+            # The existing chunks are kept, save_docs_to_vector_db only applies the diff
             docs = [
                 Document(
                     page_content=form_data.content.replace("<br/>", "\n"),
@@ -1037,23 +1280,39 @@ def process_file(
                     DOCUMENT_INTELLIGENCE_KEY=request.app.state.config.DOCUMENT_INTELLIGENCE_KEY,
                     MISTRAL_OCR_API_KEY=request.app.state.config.MISTRAL_OCR_API_KEY,
                 )
-                docs = loader.load(
-                    file.filename, file.meta.get("content_type"), file_path
-                )
-
-                docs = [
-                    Document(
-                        page_content=doc.page_content,
-                        metadata={
-                            **doc.metadata,
-                            "name": file.filename,
-                            "created_by": file.user_id,
-                            "file_id": file.id,
-                            "source": file.filename,
-                        },
+                page_contents = []
+
+                def stream_docs():
+                    for doc in loader.lazy_load(
+                        file.filename, file.meta.get("content_type"), file_path
+                    ):
+                        page_contents.append(doc.page_content)
+                        yield Document(
+                            page_content=doc.page_content,
+                            metadata={
+                                **doc.metadata,
+                                "name": file.filename,
+                                "created_by": file.user_id,
+                                "file_id": file.id,
+                                "source": file.filename,
+                            },
+                        )
+
+                docs = stream_docs()
+                if not request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL:
+                    # Pages are embedded while the rest of the file is still being extracted
+                    streamed = stream_docs_to_vector_db(
+                        request,
+                        docs,
+                        collection_name=collection_name,
+                        metadata={"file_id": file.id, "name": file.filename},
+                        user=user,
                     )
-                    for doc in docs
-                ]
+
+                # Extract whatever was not consumed (e.g. the collection already existed)
+                for _ in docs:
+                    pass
+                text_content = " ".join(page_contents)
             else:
                 docs = [
                     Document(
@@ -1067,7 +1326,7 @@ def process_file(
                         },
                     )
                 ]
-            text_content = " ".join([doc.page_content for doc in docs])
+                text_content = " ".join([doc.page_content for doc in docs])
 
         log.debug(f"text_content: {text_content}")
         Files.update_file_data_by_id(
@@ -1080,27 +1339,33 @@ def process_file(
 
         if not request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL:
             try:
-                result = save_docs_to_vector_db(
-                    request,
-                    docs=docs,
-                    collection_name=collection_name,
-                    metadata={
-                        "file_id": file.id,
-                        "name": file.filename,
-                        "hash": hash,
-                    },
-                    add=(True if form_data.collection_name else False),
-                    user=user,
-                )
-
-                if result:
-                    Files.update_file_metadata_by_id(
-                        file.id,
-                        {
-                            "collection_name": collection_name,
+                if streamed:
+                    # Already embedded and stored while the file was being extracted
+                    result = True
+                else:
+                    result = save_docs_to_vector_db(
+                        request,
+                        docs=docs,
+                        collection_name=collection_name,
+                        metadata={
+                            "file_id": file.id,
+                            "name": file.filename,
+                            "hash": hash,
                         },
+                        add=(True if form_data.collection_name else False),
+                        incremental=(True if form_data.content else False),
+                        user=user,
                     )
 
+                if result:
+                    if save_collection_name:
+                        Files.update_file_metadata_by_id(
+                            file.id,
+                            {
+                                "collection_name": collection_name,
+                            },
+                        )
+
                     return {
                         "status": True,
                         "collection_name": collection_name,
@@ -1131,6 +1396,15 @@ def process_file(
             )
 
 
+@router.post("/process/file")
+def process_file(
+    request: Request,
+    form_data: ProcessFileForm,
+    user=Depends(get_verified_user),
+):
+    return index_file(request, form_data, user=user)
+
+
 class ProcessTextForm(BaseModel):
     name: str
     content: str
@@ -1469,78 +1743,146 @@ def search_web(request: Request, engine: str, query: str) -> list[SearchResult]:
         raise Exception("No search engine API key found in environment variables")
 
 
-@router.post("/process/web/search")
-async def process_web_search(
-    request: Request, form_data: SearchForm, user=Depends(get_verified_user)
-):
-    try:
-        logging.info(
-            f"trying to web search with {request.app.state.config.WEB_SEARCH_ENGINE, form_data.query}"
-        )
-        web_results = search_web(
-            request, request.app.state.config.WEB_SEARCH_ENGINE, form_data.query
-        )
-    except Exception as e:
-        log.exception(e)
+async def search_web_async(
+    request: Request, engine: str, query: str
+) -> list[SearchResult]:
+    # Engines are synchronous clients; searches share the rate limit of the engine API
+    async with web_search_rate_limiter:
+        return await run_in_threadpool(search_web, request, engine, query)
 
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=ERROR_MESSAGES.WEB_SEARCH_ERROR(e),
-        )
 
-    log.debug(f"web_results: {web_results}")
+async def process_web_searches(
+    request: Request, queries: list[str], user=None
+) -> list[Union[dict, Exception]]:
+    """
+    Search the web for several queries concurrently. A URL found by several queries
+    is loaded and indexed once, and the pages of all queries are embedded together.
 
-    try:
-        urls = [result.link for result in web_results]
+    Returns for every query the result of process_web_search, or the exception its
+    search raised. Errors while loading or indexing the pages are raised.
+    """
+    engine = request.app.state.config.WEB_SEARCH_ENGINE
+    log.info(f"trying to web search with {engine, queries}")
+
+    search_results = await asyncio.gather(
+        *[search_web_async(request, engine, query) for query in queries],
+        return_exceptions=True,
+    )
+    for query, web_results in zip(queries, search_results):
+        if isinstance(web_results, Exception):
+            log.error(f"Error searching {query}: {web_results}")
+        else:
+            log.debug(f"web_results: {web_results}")
+
+    urls = list(
+        dict.fromkeys(
+            result.link
+            for web_results in search_results
+            if not isinstance(web_results, Exception)
+            for result in web_results
+        )
+    )
+
+    loaded_docs = {}
+    if urls:
         loader = get_web_loader(
             urls,
             verify_ssl=request.app.state.config.ENABLE_WEB_LOADER_SSL_VERIFICATION,
             requests_per_second=request.app.state.config.WEB_SEARCH_CONCURRENT_REQUESTS,
             trust_env=request.app.state.config.WEB_SEARCH_TRUST_ENV,
         )
-        docs = await loader.aload()
-        urls = [
-            doc.metadata["source"] for doc in docs
-        ]  # only keep URLs which could be retrieved
+        # Only keep URLs which could be retrieved
+        loaded_docs = {doc.metadata["source"]: doc for doc in await loader.aload()}
 
-        if request.app.state.config.BYPASS_WEB_SEARCH_EMBEDDING_AND_RETRIEVAL:
-            return {
-                "status": True,
-                "collection_name": None,
-                "filenames": urls,
-                "docs": [
-                    {
-                        "content": doc.page_content,
-                        "metadata": doc.metadata,
-                    }
-                    for doc in docs
-                ],
-                "loaded_count": len(docs),
-            }
-        else:
-            collection_names = []
-            for doc_idx, doc in enumerate(docs):
-                if doc and doc.page_content:
-                    collection_name = f"web-search-{calculate_sha256_string(form_data.query + '-' + urls[doc_idx])}"[
-                        :63
-                    ]
-
-                    collection_names.append(collection_name)
-                    await run_in_threadpool(
-                        save_docs_to_vector_db,
-                        request,
-                        [doc],
-                        collection_name,
-                        overwrite=True,
-                        user=user,
-                    )
+    def get_query_urls(web_results: list[SearchResult]) -> list[str]:
+        return list(
+            dict.fromkeys(
+                result.link for result in web_results if result.link in loaded_docs
+            )
+        )
 
-            return {
+    if request.app.state.config.BYPASS_WEB_SEARCH_EMBEDDING_AND_RETRIEVAL:
+        results = []
+        for web_results in search_results:
+            if isinstance(web_results, Exception):
+                results.append(web_results)
+                continue
+
+            query_urls = get_query_urls(web_results)
+            results.append(
+                {
+                    "status": True,
+                    "collection_name": None,
+                    "filenames": query_urls,
+                    "docs": [
+                        {
+                            "content": loaded_docs[url].page_content,
+                            "metadata": loaded_docs[url].metadata,
+                        }
+                        for url in query_urls
+                    ],
+                    "loaded_count": len(query_urls),
+                }
+            )
+        return results
+
+    # One collection per page, named after its content, the embedding model and the
+    # chunking, so that a page already indexed for another search reuses its embeddings
+    collection_names = {
+        url: "web-search-"
+        + calculate_sha256_string(
+            json.dumps(
+                [
+                    request.app.state.config.RAG_EMBEDDING_ENGINE,
+                    request.app.state.config.RAG_EMBEDDING_MODEL,
+                    request.app.state.config.TEXT_SPLITTER,
+                    request.app.state.config.CHUNK_SIZE,
+                    request.app.state.config.CHUNK_OVERLAP,
+                    str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+                    url,
+                    doc.page_content,
+                ]
+            )
+        )[:52]
+        for url, doc in loaded_docs.items()
+    }
+    indexed_collection_names = set(
+        await run_in_threadpool(
+            save_web_docs_to_vector_db,
+            request,
+            {collection_names[url]: doc for url, doc in loaded_docs.items()},
+            user=user,
+        )
+    )
+
+    results = []
+    for web_results in search_results:
+        if isinstance(web_results, Exception):
+            results.append(web_results)
+            continue
+
+        query_urls = [
+            url
+            for url in get_query_urls(web_results)
+            if collection_names[url] in indexed_collection_names
+        ]
+        results.append(
+            {
                 "status": True,
-                "collection_names": collection_names,
-                "filenames": urls,
-                "loaded_count": len(docs),
+                "collection_names": [collection_names[url] for url in query_urls],
+                "filenames": query_urls,
+                "loaded_count": len(query_urls),
             }
+        )
+    return results
+
+
+@router.post("/process/web/search")
+async def process_web_search(
+    request: Request, form_data: SearchForm, user=Depends(get_verified_user)
+):
+    try:
+        results = await process_web_searches(request, [form_data.query], user=user)
     except Exception as e:
         log.exception(e)
         raise HTTPException(
@@ -1548,6 +1890,13 @@ async def process_web_search(
             detail=ERROR_MESSAGES.DEFAULT(e),
         )
 
+    if isinstance(results[0], Exception):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.WEB_SEARCH_ERROR(results[0]),
+        )
+    return results[0]
+
 
 class QueryDocForm(BaseModel):
     collection_name: str
@@ -1721,8 +2070,8 @@ if ENV == "dev":
     @router.get("/ef/{text}")
     async def get_embeddings(request: Request, text: Optional[str] = "Hello World!"):
         return {
-            "result": request.app.state.EMBEDDING_FUNCTION(
-                text, prefix=RAG_EMBEDDING_QUERY_PREFIX
+            "result": await generate_embeddings_async(
+                request, text, prefix=RAG_EMBEDDING_QUERY_PREFIX
             )
         }
 
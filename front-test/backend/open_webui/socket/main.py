@@ -3,26 +3,36 @@ import socketio
 import logging
 import sys
 import time
+from typing import Callable
 from redis import asyncio as aioredis
 
 from open_webui.models.users import Users, UserNameResponse
 from open_webui.models.channels import Channels
-from open_webui.models.chats import Chats
 from open_webui.utils.redis import (
     get_sentinels_from_env,
     get_sentinel_url_from_env,
 )
 
 from open_webui.env import (
+    CHAT_STREAM_FRAME_INTERVAL_MS,
+    CHAT_STREAM_SNAPSHOT_FRAMES,
     ENABLE_WEBSOCKET_SUPPORT,
     WEBSOCKET_MANAGER,
+    WEBSOCKET_PRESENCE_INTERVAL,
     WEBSOCKET_REDIS_URL,
     WEBSOCKET_REDIS_LOCK_TIMEOUT,
     WEBSOCKET_SENTINEL_PORT,
     WEBSOCKET_SENTINEL_HOSTS,
 )
 from open_webui.utils.auth import decode_token
-from open_webui.socket.utils import RedisDict, RedisLock
+from open_webui.utils.chat_save import CHAT_EVENT_WRITER
+from open_webui.socket.utils import (
+    RedisLock,
+    RedisSessionPool,
+    RedisUsagePool,
+    SessionPool,
+    UsagePool,
+)
 
 from open_webui.env import (
     GLOBAL_LOG_LEVEL,
@@ -72,17 +82,12 @@ if WEBSOCKET_MANAGER == "redis":
     redis_sentinels = get_sentinels_from_env(
         WEBSOCKET_SENTINEL_HOSTS, WEBSOCKET_SENTINEL_PORT
     )
-    SESSION_POOL = RedisDict(
+    SESSION_POOL = RedisSessionPool(
         "open-webui:session_pool",
         redis_url=WEBSOCKET_REDIS_URL,
         redis_sentinels=redis_sentinels,
     )
-    USER_POOL = RedisDict(
-        "open-webui:user_pool",
-        redis_url=WEBSOCKET_REDIS_URL,
-        redis_sentinels=redis_sentinels,
-    )
-    USAGE_POOL = RedisDict(
+    USAGE_POOL = RedisUsagePool(
         "open-webui:usage_pool",
         redis_url=WEBSOCKET_REDIS_URL,
         redis_sentinels=redis_sentinels,
@@ -98,9 +103,8 @@ if WEBSOCKET_MANAGER == "redis":
     renew_func = clean_up_lock.renew_lock
     release_func = clean_up_lock.release_lock
 else:
-    SESSION_POOL = {}
-    USER_POOL = {}
-    USAGE_POOL = {}
+    SESSION_POOL = SessionPool()
+    USAGE_POOL = UsagePool()
     aquire_func = release_func = renew_func = lambda: True
 
 
@@ -116,27 +120,14 @@ async def periodic_usage_pool_cleanup():
                 raise Exception("Unable to renew usage pool cleanup lock.")
 
             now = int(time.time())
-            send_usage = False
-            for model_id, connections in list(USAGE_POOL.items()):
-                # Creating a list of sids to remove if they have timed out
-                expired_sids = [
-                    sid
-                    for sid, details in connections.items()
-                    if now - details["updated_at"] > TIMEOUT_DURATION
-                ]
-
-                for sid in expired_sids:
-                    del connections[sid]
-
-                if not connections:
-                    log.debug(f"Cleaning up model {model_id} from usage pool")
-                    del USAGE_POOL[model_id]
-                else:
-                    USAGE_POOL[model_id] = connections
-
-                send_usage = True
-
-            if send_usage:
+            # Remove the sessions that have timed out
+            removed_model_ids = USAGE_POOL.remove_expired_sessions(
+                now - TIMEOUT_DURATION
+            )
+            for model_id in removed_model_ids:
+                log.debug(f"Cleaning up model {model_id} from usage pool")
+
+            if removed_model_ids:
                 # Emit updated usage information after cleaning
                 await sio.emit("usage", {"models": get_models_in_use()})
 
@@ -151,9 +142,54 @@ app = socketio.ASGIApp(
 )
 
 
+class PresenceBroadcaster:
+    """
+    Sends the users coming online and going offline as user-list:diff events with the
+    added and removed user ids, debounced: the changes of an interval are sent at once,
+    with the state of each user at that time. A user who reconnected within the
+    interval is not sent at all, so reconnect storms do not flood every client.
+    """
+
+    def __init__(self, emit, session_pool, interval: float):
+        self.emit = emit
+        self.session_pool = session_pool
+        self.interval = interval
+
+        # user id -> whether the user was online before the changes of the interval
+        self.changes: dict[str, bool] = {}
+        self.flush_task = None
+
+    def update(self, user_id: str, online: bool):
+        self.changes.setdefault(user_id, not online)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        changes, self.changes = self.changes, {}
+        if not changes:
+            return
+
+        user_ids = list(changes)
+        added, removed = [], []
+        for user_id, online in zip(user_ids, self.session_pool.are_online(user_ids)):
+            if online != changes[user_id]:
+                (added if online else removed).append(user_id)
+
+        if added or removed:
+            await self.emit("user-list:diff", {"added": added, "removed": removed})
+
+
+PRESENCE = PresenceBroadcaster(sio.emit, SESSION_POOL, WEBSOCKET_PRESENCE_INTERVAL)
+
+
 def get_models_in_use():
     # List models that are currently in use
-    models_in_use = list(USAGE_POOL.keys())
+    models_in_use = USAGE_POOL.get_model_ids()
     return models_in_use
 
 
@@ -163,14 +199,19 @@ async def usage(sid, data):
     # Record the timestamp for the last update
     current_time = int(time.time())
 
-    # Store the new usage data and task
-    USAGE_POOL[model_id] = {
-        **(USAGE_POOL[model_id] if model_id in USAGE_POOL else {}),
-        sid: {"updated_at": current_time},
-    }
+    # Broadcast the usage data to all clients when the model was not in use
+    if USAGE_POOL.update(model_id, sid, current_time):
+        await sio.emit("usage", {"models": get_models_in_use()})
+
 
-    # Broadcast the usage data to all clients
-    await sio.emit("usage", {"models": get_models_in_use()})
+async def add_session(sid, user):
+    if SESSION_POOL.add(sid, user.model_dump()):
+        PRESENCE.update(user.id, True)
+
+    # The other clients are sent the changes
+    await sio.emit(
+        "user-list", {"user_ids": SESSION_POOL.get_online_user_ids()}, to=sid
+    )
 
 
 @sio.event
@@ -183,15 +224,9 @@ async def connect(sid, environ, auth):
             user = Users.get_user_by_id(data["id"])
 
         if user:
-            SESSION_POOL[sid] = user.model_dump()
-            if user.id in USER_POOL:
-                USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-            else:
-                USER_POOL[user.id] = [sid]
-
             # print(f"user {user.name}({user.id}) connected with session ID {sid}")
-            await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
-            await sio.emit("usage", {"models": get_models_in_use()})
+            await add_session(sid, user)
+            await sio.emit("usage", {"models": get_models_in_use()}, to=sid)
 
 
 @sio.on("user-join")
@@ -209,11 +244,7 @@ async def user_join(sid, data):
     if not user:
         return
 
-    SESSION_POOL[sid] = user.model_dump()
-    if user.id in USER_POOL:
-        USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-    else:
-        USER_POOL[user.id] = [sid]
+    await add_session(sid, user)
 
     # Join all the channels
     channels = Channels.get_channels_by_user_id(user.id)
@@ -223,7 +254,6 @@ async def user_join(sid, data):
 
     # print(f"user {user.name}({user.id}) connected with session ID {sid}")
 
-    await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
     return {"id": user.id, "name": user.name}
 
 
@@ -270,7 +300,7 @@ async def channel_events(sid, data):
                 "channel_id": data["channel_id"],
                 "message_id": data.get("message_id", None),
                 "data": event_data,
-                "user": UserNameResponse(**SESSION_POOL[sid]).model_dump(),
+                "user": UserNameResponse(**SESSION_POOL.get(sid)).model_dump(),
             },
             room=room,
         )
@@ -278,25 +308,17 @@ async def channel_events(sid, data):
 
 @sio.on("user-list")
 async def user_list(sid):
-    await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
+    await sio.emit(
+        "user-list", {"user_ids": SESSION_POOL.get_online_user_ids()}, to=sid
+    )
 
 
 @sio.event
 async def disconnect(sid):
-    if sid in SESSION_POOL:
-        user = SESSION_POOL[sid]
-        del SESSION_POOL[sid]
-
-        user_id = user["id"]
-        USER_POOL[user_id] = [_sid for _sid in USER_POOL[user_id] if _sid != sid]
-
-        if len(USER_POOL[user_id]) == 0:
-            del USER_POOL[user_id]
-
-        await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
-    else:
-        pass
-        # print(f"Unknown session ID {sid} disconnected")
+    user_id, went_offline = SESSION_POOL.remove(sid)
+    if went_offline:
+        PRESENCE.update(user_id, False)
+    # Unknown session IDs are ignored
 
 
 def get_event_emitter(request_info, update_db=True):
@@ -305,7 +327,7 @@ def get_event_emitter(request_info, update_db=True):
 
         session_ids = list(
             set(
-                USER_POOL.get(user_id, [])
+                SESSION_POOL.get_session_ids(user_id)
                 + (
                     [request_info.get("session_id")]
                     if request_info.get("session_id")
@@ -325,44 +347,133 @@ def get_event_emitter(request_info, update_db=True):
                 to=session_id,
             )
 
-        if update_db:
-            if "type" in event_data and event_data["type"] == "status":
-                Chats.add_message_status_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                    event_data.get("data", {}),
-                )
+        # Written to the database in the background, coalesced per message
+        if update_db and event_data.get("type") in ("status", "message", "replace"):
+            await CHAT_EVENT_WRITER.put(
+                request_info["chat_id"], request_info["message_id"], event_data
+            )
 
-            if "type" in event_data and event_data["type"] == "message":
-                message = Chats.get_message_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                )
+    return __event_emitter__
 
-                if message:
-                    content = message.get("content", "")
-                    content += event_data.get("data", {}).get("content", "")
-
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
-                        {
-                            "content": content,
-                        },
-                    )
-
-            if "type" in event_data and event_data["type"] == "replace":
-                content = event_data.get("data", {}).get("content", "")
-
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    request_info["chat_id"],
-                    request_info["message_id"],
-                    {
-                        "content": content,
-                    },
-                )
 
-    return __event_emitter__
+def get_utf16_length(text: str) -> int:
+    # Length of the string in JavaScript
+    return len(text.encode("utf-16-le")) // 2
+
+
+def get_common_prefix_length(a: str, b: str) -> int:
+    # Binary search on slice comparisons, which run in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class ChatCompletionStream:
+    """
+    Sends the content of a message being generated as append-only deltas rather than as
+    the whole content on every token: chat:completion events with
+    content_delta = {"offset", "content"}, for which clients keep the first offset
+    characters (UTF-16 code units) of the content they have and append the rest.
+
+    Updates are coalesced into one frame per interval: the content is only computed
+    when a frame is sent. Every snapshot_frames frames the whole content is sent
+    instead, which resyncs the clients that joined late.
+    """
+
+    def __init__(
+        self,
+        event_emitter,
+        interval: float = CHAT_STREAM_FRAME_INTERVAL_MS / 1000,
+        snapshot_frames: int = CHAT_STREAM_SNAPSHOT_FRAMES,
+    ):
+        self.event_emitter = event_emitter
+        self.interval = interval
+        self.snapshot_frames = max(1, snapshot_frames)
+        self.lock = asyncio.Lock()
+
+        # Content the clients have, and its length in UTF-16 code units
+        self.content = None
+        self.content_length = 0
+
+        self.pending = None
+        self.frames = 0
+        self.last_frame_at = 0
+        self.flush_task = None
+
+    async def update(self, get_content: Callable[[], str]):
+        self.pending = get_content
+        delay = self.last_frame_at + self.interval - time.monotonic()
+        if delay <= 0:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush()
+
+    def _set_content(self, content: str):
+        self.content = content
+        self.content_length = get_utf16_length(content)
+
+    def _get_delta(self, content: str) -> dict:
+        if self.content is not None and content.startswith(self.content):
+            offset = len(self.content)
+            offset_length = self.content_length
+        else:
+            # The end changed, e.g. a block was closed
+            offset = get_common_prefix_length(self.content or "", content)
+            offset_length = get_utf16_length(content[:offset])
+
+        delta = content[offset:]
+        self.content = content
+        self.content_length = offset_length + get_utf16_length(delta)
+        return {"offset": offset_length, "content": delta}
+
+    async def flush(self):
+        async with self.lock:
+            if self.pending is None:
+                return
+            content = self.pending()
+            self.pending = None
+
+            if self.content is None or self.frames % self.snapshot_frames == 0:
+                self._set_content(content)
+                data = {"content": content}
+            else:
+                data = {"content_delta": self._get_delta(content)}
+
+            self.frames += 1
+            self.last_frame_at = time.monotonic()
+            await self.event_emitter({"type": "chat:completion", "data": data})
+
+    async def emit(self, data: dict):
+        """
+        Send a chat:completion event as is, after the pending update unless the event
+        replaces the content.
+        """
+        replaces_content = isinstance(data.get("content"), str)
+        if replaces_content:
+            self.cancel()
+        else:
+            await self.flush()
+
+        async with self.lock:
+            if replaces_content:
+                self._set_content(data["content"])
+            await self.event_emitter({"type": "chat:completion", "data": data})
+
+    def cancel(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self.pending = None
 
 
 def get_event_call(request_info):
@@ -385,10 +496,7 @@ get_event_caller = get_event_call
 
 
 def get_user_id_from_session_pool(sid):
-    user = SESSION_POOL.get(sid)
-    if user:
-        return user["id"]
-    return None
+    return SESSION_POOL.get_user_ids([sid])[0]
 
 
 def get_user_ids_from_room(room):
@@ -399,13 +507,14 @@ def get_user_ids_from_room(room):
 
     active_user_ids = list(
         set(
-            [SESSION_POOL.get(session_id[0])["id"] for session_id in active_session_ids]
+            SESSION_POOL.get_user_ids(
+                [session_id[0] for session_id in active_session_ids]
+            )
         )
+        - {None}
     )
     return active_user_ids
 
 
 def get_active_status_by_user_id(user_id):
-    if user_id in USER_POOL:
-        return True
-    return False
+    return SESSION_POOL.is_online(user_id)
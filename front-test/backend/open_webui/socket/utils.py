@@ -89,3 +89,220 @@ class RedisDict:
         if key not in self:
             self[key] = default
         return self[key]
+
+
+# Removes a session from the sessions of its user, and the user from the online users
+# when it was their last session. Returns 1 when the user went offline.
+REMOVE_SESSION_SCRIPT = """
+redis.call('SREM', KEYS[1], ARGV[1])
+if redis.call('SCARD', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[2])
+end
+return 0
+"""
+
+# Removes the timed out sessions of a model, and the model from the models in use when
+# no session is left. Returns 1 when the model was removed.
+REMOVE_EXPIRED_USAGE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisSessionPool:
+    """
+    Sessions of the connected users: a hash per session with the user, a set of session
+    ids per user and a set of the online users. Adding and removing a session are
+    atomic, and tell whether the user came online or went offline.
+    """
+
+    def __init__(self, name, redis_url, redis_sentinels=[]):
+        self.name = name
+        self.redis = get_redis_connection(
+            redis_url, redis_sentinels, decode_responses=True
+        )
+        self.remove_session = self.redis.register_script(REMOVE_SESSION_SCRIPT)
+
+    def _session_key(self, sid):
+        return f"{self.name}:session:{sid}"
+
+    def _user_key(self, user_id):
+        return f"{self.name}:user:{user_id}"
+
+    def _online_key(self):
+        return f"{self.name}:online"
+
+    def add(self, sid, user: dict) -> bool:
+        pipe = self.redis.pipeline()
+        pipe.hset(
+            self._session_key(sid),
+            mapping={key: json.dumps(value) for key, value in user.items()},
+        )
+        pipe.sadd(self._user_key(user["id"]), sid)
+        pipe.sadd(self._online_key(), user["id"])
+        return pipe.execute()[-1] == 1
+
+    def remove(self, sid):
+        """Remove a session, returning its user id and whether the user went offline."""
+        pipe = self.redis.pipeline()
+        pipe.hget(self._session_key(sid), "id")
+        pipe.delete(self._session_key(sid))
+        user_id, deleted = pipe.execute()
+        if user_id is None or not deleted:
+            return None, False
+
+        user_id = json.loads(user_id)
+        went_offline = self.remove_session(
+            keys=[self._user_key(user_id), self._online_key()], args=[sid, user_id]
+        )
+        return user_id, went_offline == 1
+
+    def get(self, sid):
+        user = self.redis.hgetall(self._session_key(sid))
+        if not user:
+            return None
+        return {key: json.loads(value) for key, value in user.items()}
+
+    def __contains__(self, sid):
+        return self.redis.exists(self._session_key(sid)) == 1
+
+    def get_user_ids(self, sids) -> list:
+        pipe = self.redis.pipeline(transaction=False)
+        for sid in sids:
+            pipe.hget(self._session_key(sid), "id")
+        return [json.loads(user_id) if user_id else None for user_id in pipe.execute()]
+
+    def get_session_ids(self, user_id) -> list:
+        return list(self.redis.smembers(self._user_key(user_id)))
+
+    def get_online_user_ids(self) -> list:
+        return list(self.redis.smembers(self._online_key()))
+
+    def is_online(self, user_id) -> bool:
+        return self.redis.sismember(self._online_key(), user_id) == 1
+
+    def are_online(self, user_ids) -> list:
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.sismember(self._online_key(), user_id)
+        return [result == 1 for result in pipe.execute()]
+
+
+class SessionPool:
+    """In-memory RedisSessionPool, for a single worker."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.users = {}
+
+    def add(self, sid, user: dict) -> bool:
+        self.sessions[sid] = user
+        came_online = user["id"] not in self.users
+        self.users.setdefault(user["id"], set()).add(sid)
+        return came_online
+
+    def remove(self, sid):
+        user = self.sessions.pop(sid, None)
+        if user is None:
+            return None, False
+
+        sids = self.users.get(user["id"], set())
+        sids.discard(sid)
+        if not sids:
+            self.users.pop(user["id"], None)
+            return user["id"], True
+        return user["id"], False
+
+    def get(self, sid):
+        return self.sessions.get(sid)
+
+    def __contains__(self, sid):
+        return sid in self.sessions
+
+    def get_user_ids(self, sids) -> list:
+        return [
+            self.sessions[sid]["id"] if sid in self.sessions else None for sid in sids
+        ]
+
+    def get_session_ids(self, user_id) -> list:
+        return list(self.users.get(user_id, ()))
+
+    def get_online_user_ids(self) -> list:
+        return list(self.users)
+
+    def is_online(self, user_id) -> bool:
+        return user_id in self.users
+
+    def are_online(self, user_ids) -> list:
+        return [user_id in self.users for user_id in user_ids]
+
+
+class RedisUsagePool:
+    """
+    Models in use: a sorted set per model of the sessions using it, scored by the time
+    of their last update, and a set of the models in use.
+    """
+
+    def __init__(self, name, redis_url, redis_sentinels=[]):
+        self.name = name
+        self.redis = get_redis_connection(
+            redis_url, redis_sentinels, decode_responses=True
+        )
+        self.remove_expired = self.redis.register_script(REMOVE_EXPIRED_USAGE_SCRIPT)
+
+    def _model_key(self, model_id):
+        return f"{self.name}:model:{model_id}"
+
+    def _models_key(self):
+        return f"{self.name}:models"
+
+    def update(self, model_id, sid, updated_at) -> bool:
+        """Record the usage of a model, returning whether it was not in use."""
+        pipe = self.redis.pipeline()
+        pipe.zadd(self._model_key(model_id), {sid: updated_at})
+        pipe.sadd(self._models_key(), model_id)
+        return pipe.execute()[-1] == 1
+
+    def remove_expired_sessions(self, before) -> list:
+        """Remove the sessions last updated before the given time, returning the models
+        no longer in use."""
+        removed = []
+        for model_id in self.redis.smembers(self._models_key()):
+            if self.remove_expired(
+                keys=[self._model_key(model_id), self._models_key()],
+                args=[f"({before}", model_id],
+            ):
+                removed.append(model_id)
+        return removed
+
+    def get_model_ids(self) -> list:
+        return list(self.redis.smembers(self._models_key()))
+
+
+class UsagePool:
+    """In-memory RedisUsagePool, for a single worker."""
+
+    def __init__(self):
+        self.models = {}
+
+    def update(self, model_id, sid, updated_at) -> bool:
+        new = model_id not in self.models
+        self.models.setdefault(model_id, {})[sid] = updated_at
+        return new
+
+    def remove_expired_sessions(self, before) -> list:
+        removed = []
+        for model_id, sessions in list(self.models.items()):
+            for sid, updated_at in list(sessions.items()):
+                if updated_at < before:
+                    del sessions[sid]
+            if not sessions:
+                del self.models[model_id]
+                removed.append(model_id)
+        return removed
+
+    def get_model_ids(self) -> list:
+        return list(self.models)
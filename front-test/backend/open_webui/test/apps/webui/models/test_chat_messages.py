@@ -0,0 +1,149 @@
+import time
+import uuid
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+
+from open_webui.config import run_migrations
+from open_webui.env import OPEN_WEBUI_DIR
+from open_webui.internal.db import engine, get_db
+from open_webui.models.chats import ChatMessage, Chats
+
+# The revision before the chat_message table
+PREVIOUS_REVISION = "3781e22d8b01"
+
+chat_table = sa.table(
+    "chat",
+    sa.column("id", sa.String()),
+    sa.column("user_id", sa.String()),
+    sa.column("title", sa.Text()),
+    sa.column("chat", sa.JSON()),
+    sa.column("created_at", sa.BigInteger()),
+    sa.column("updated_at", sa.BigInteger()),
+    sa.column("archived", sa.Boolean()),
+)
+
+
+def get_alembic_config() -> Config:
+    alembic_cfg = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    alembic_cfg.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    return alembic_cfg
+
+
+def get_legacy_chat() -> dict:
+    # A chat as stored before the migration, with its messages in the history
+    user_message_id = str(uuid.uuid4())
+    assistant_message_id = str(uuid.uuid4())
+    return {
+        "title": "Legacy chat",
+        "models": ["model"],
+        "history": {
+            "currentId": assistant_message_id,
+            "messages": {
+                user_message_id: {
+                    "id": user_message_id,
+                    "parentId": None,
+                    "childrenIds": [assistant_message_id],
+                    "role": "user",
+                    "content": "Hello",
+                    "timestamp": 1700000000,
+                },
+                assistant_message_id: {
+                    "id": assistant_message_id,
+                    "parentId": user_message_id,
+                    "childrenIds": [],
+                    "role": "assistant",
+                    "content": "Hi! How can I help?",
+                    "model": "model",
+                    "done": True,
+                    "statusHistory": [{"description": "Searching", "done": True}],
+                    "timestamp": 1700000001,
+                },
+            },
+        },
+        "messages": [],
+    }
+
+
+class TestChatMessageMigration:
+    @classmethod
+    def setup_class(cls):
+        run_migrations()
+
+    def setup_method(self):
+        self.user_id = str(uuid.uuid4())
+
+    def teardown_method(self):
+        command.upgrade(get_alembic_config(), "head")
+        Chats.delete_chats_by_user_id(self.user_id)
+
+    def insert_legacy_chat(self, chat: dict) -> str:
+        id = str(uuid.uuid4())
+        with engine.begin() as connection:
+            connection.execute(
+                chat_table.insert().values(
+                    id=id,
+                    user_id=self.user_id,
+                    title=chat["title"],
+                    chat=chat,
+                    created_at=int(time.time()),
+                    updated_at=int(time.time()),
+                    archived=False,
+                )
+            )
+        return id
+
+    def get_legacy_chat_json(self, id: str) -> dict:
+        with engine.connect() as connection:
+            return connection.execute(
+                sa.select(chat_table.c.chat).where(chat_table.c.id == id)
+            ).scalar_one()
+
+    def test_round_trip(self):
+        alembic_cfg = get_alembic_config()
+        legacy_chat = get_legacy_chat()
+        messages = legacy_chat["history"]["messages"]
+
+        command.downgrade(alembic_cfg, PREVIOUS_REVISION)
+        id = self.insert_legacy_chat(legacy_chat)
+
+        # Upgraded: the messages have their own rows, and the chat reads the same
+        command.upgrade(alembic_cfg, "head")
+        assert "messages" not in self.get_legacy_chat_json(id)["history"]
+        with get_db() as db:
+            rows = db.query(ChatMessage).filter_by(chat_id=id).all()
+            assert {row.id for row in rows} == set(messages)
+            assert {row.id: row.content for row in rows} == {
+                message_id: message["content"]
+                for message_id, message in messages.items()
+            }
+        chat = Chats.get_chat_by_id(id)
+        assert chat.chat["history"]["messages"] == messages
+        assert chat.chat["history"]["currentId"] == legacy_chat["history"]["currentId"]
+
+        # Downgraded: the messages are back in the history, as they were
+        command.downgrade(alembic_cfg, PREVIOUS_REVISION)
+        assert self.get_legacy_chat_json(id) == legacy_chat
+
+    def test_messages_written_after_the_upgrade(self):
+        alembic_cfg = get_alembic_config()
+        legacy_chat = get_legacy_chat()
+
+        command.downgrade(alembic_cfg, PREVIOUS_REVISION)
+        id = self.insert_legacy_chat(legacy_chat)
+        command.upgrade(alembic_cfg, "head")
+
+        message_id = str(uuid.uuid4())
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            id, message_id, {"id": message_id, "role": "user", "content": "Thanks"}
+        )
+
+        command.downgrade(alembic_cfg, PREVIOUS_REVISION)
+        history = self.get_legacy_chat_json(id)["history"]
+        assert history["currentId"] == message_id
+        assert history["messages"][message_id]["content"] == "Thanks"
+        assert set(history["messages"]) == {
+            *legacy_chat["history"]["messages"],
+            message_id,
+        }
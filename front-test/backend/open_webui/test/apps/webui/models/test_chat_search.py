@@ -0,0 +1,135 @@
+"""
+Chat search against the configured database: the FTS5 index on SQLite (the default),
+the tsvector indexes when DATABASE_URL points to PostgreSQL.
+"""
+
+import uuid
+
+import pytest
+
+from open_webui.config import run_migrations
+from open_webui.internal.db import get_db
+from open_webui.models.chats import ChatForm, Chats
+
+
+def get_chat_form(title: str, contents: list[str]) -> ChatForm:
+    messages = {}
+    parent_id = None
+    for content in contents:
+        message_id = str(uuid.uuid4())
+        messages[message_id] = {
+            "id": message_id,
+            "parentId": parent_id,
+            "role": "user",
+            "content": content,
+        }
+        parent_id = message_id
+    return ChatForm(
+        chat={
+            "title": title,
+            "history": {"currentId": parent_id, "messages": messages},
+        }
+    )
+
+
+class TestChatSearch:
+    @classmethod
+    def setup_class(cls):
+        run_migrations()
+
+    def setup_method(self):
+        self.user_id = str(uuid.uuid4())
+
+    def teardown_method(self):
+        Chats.delete_chats_by_user_id(self.user_id)
+
+    def insert_chat(self, title: str, contents: list[str], user_id=None) -> str:
+        return Chats.insert_new_chat(
+            user_id or self.user_id, get_chat_form(title, contents)
+        ).id
+
+    def search(self, search_text: str, **kwargs) -> list[str]:
+        return [
+            chat.id
+            for chat in Chats.get_chats_by_user_id_and_search_text(
+                self.user_id, search_text, **kwargs
+            )
+        ]
+
+    def test_search_index(self):
+        # The searches go through the full-text index, not the LIKE fallback
+        with get_db() as db:
+            assert Chats._get_search_ranks(db, self.user_id, "word") is not None
+
+    def test_words_match_word_prefixes(self):
+        chat_id = self.insert_chat("Trip planning", ["Hello world, how are you?"])
+
+        assert self.search("hello") == [chat_id]
+        assert self.search("hel") == [chat_id]
+        assert self.search("HELLO Wor") == [chat_id]
+        assert self.search("plan") == [chat_id]
+        # Substrings inside a word no longer match
+        assert self.search("ello") == []
+        assert self.search("anning") == []
+
+    def test_every_word_in_the_title_or_the_same_message(self):
+        same_message = self.insert_chat("First", ["apple banana"])
+        self.insert_chat("Second", ["apple", "banana"])
+        in_title = self.insert_chat("apple banana", ["cherry"])
+
+        assert sorted(self.search("apple banana")) == sorted([same_message, in_title])
+        assert self.search("banana cherry") == []
+
+    def test_title_matches_rank_first(self):
+        in_title = self.insert_chat("Python tips", ["Some content"])
+        in_message = self.insert_chat("Other", ["I like python a lot"])
+
+        # Ranked by their best match before the most recently updated first
+        assert self.search("python") == [in_title, in_message]
+
+    def test_other_users_chats(self):
+        other_user_id = str(uuid.uuid4())
+        try:
+            self.insert_chat("Secret", ["secret"], user_id=other_user_id)
+            assert self.search("secret") == []
+        finally:
+            Chats.delete_chats_by_user_id(other_user_id)
+
+    def test_archived_chats(self):
+        chat_id = self.insert_chat("Archived", ["archived chat"])
+        Chats.toggle_chat_archive_by_id(chat_id)
+
+        assert self.search("archived") == []
+        assert self.search("archived", include_archived=True) == [chat_id]
+
+    def test_index_follows_updates(self):
+        chat_id = self.insert_chat("Before", ["original content"])
+        message_id = Chats.get_chat_by_id(chat_id).chat["history"]["currentId"]
+
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, message_id, {"content": "edited content"}
+        )
+        Chats.update_chat_title_by_id(chat_id, "After")
+
+        assert self.search("original") == []
+        assert self.search("before") == []
+        assert self.search("edited") == [chat_id]
+        assert self.search("after") == [chat_id]
+
+        Chats.delete_chat_by_id(chat_id)
+        assert self.search("edited") == []
+
+    def test_tags_and_words(self):
+        tagged = self.insert_chat("Tagged", ["notes"])
+        self.insert_chat("Untagged", ["notes"])
+        Chats.add_chat_tag_by_id_and_user_id_and_tag_name(tagged, self.user_id, "Work")
+
+        assert self.search("tag:work notes") == [tagged]
+
+    @pytest.mark.parametrize(
+        "search_text",
+        ['say "hi', "x++", "+++", "a AND b", "NOT x", "(", "col:umn", "*"],
+    )
+    def test_special_characters(self, search_text):
+        self.insert_chat("Title", ["content"])
+        assert self.search(search_text) == []
@@ -0,0 +1,88 @@
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.documents import Document
+
+from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.routers.retrieval import get_chunk_metadatas, save_docs_to_vector_db
+
+
+class EmbeddingFunction:
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts, **kwargs):
+        self.texts.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def get_request(ef: EmbeddingFunction) -> SimpleNamespace:
+    config = SimpleNamespace(
+        RAG_EMBEDDING_ENGINE="",
+        RAG_EMBEDDING_MODEL="test",
+        RAG_OPENAI_API_BASE_URL="",
+        RAG_OPENAI_API_KEY="",
+        RAG_OLLAMA_BASE_URL="",
+        RAG_OLLAMA_API_KEY="",
+        RAG_EMBEDDING_BATCH_SIZE=1,
+    )
+    return SimpleNamespace(
+        app=SimpleNamespace(state=SimpleNamespace(config=config, ef=ef, rf=None))
+    )
+
+
+def get_docs(file_id: str, count: int, edited: int = -1) -> list[Document]:
+    return [
+        Document(
+            page_content=f"{'Edited chunk' if idx == edited else 'Chunk'} {idx} of {file_id}",
+            metadata={"file_id": file_id, "start_index": idx},
+        )
+        for idx in range(count)
+    ]
+
+
+class TestIncrementalSave:
+    def setup_method(self):
+        self.collection_name = f"test-{uuid.uuid4()}"
+        self.ef = EmbeddingFunction()
+        self.request = get_request(self.ef)
+
+    def teardown_method(self):
+        if VECTOR_DB_CLIENT.has_collection(collection_name=self.collection_name):
+            VECTOR_DB_CLIENT.delete_collection(collection_name=self.collection_name)
+
+    def save(self, docs: list[Document]):
+        save_docs_to_vector_db(
+            self.request,
+            docs,
+            self.collection_name,
+            split=False,
+            add=True,
+            incremental=True,
+        )
+
+    def test_more_than_ten_chunks(self):
+        self.save(get_docs("a", 15))
+        self.save(get_docs("b", 12))
+        assert len(get_chunk_metadatas(self.collection_name, "a")) == 15
+        assert len(get_chunk_metadatas(self.collection_name, "b")) == 12
+        assert len(get_chunk_metadatas(self.collection_name)) == 27
+
+        # Only the edited chunk is embedded again, and the last chunk is deleted
+        self.ef.texts = []
+        self.save(get_docs("a", 14, edited=12))
+        assert self.ef.texts == ["Edited chunk 12 of a"]
+
+        documents = [
+            document
+            for result in VECTOR_DB_CLIENT.get_batches(
+                collection_name=self.collection_name
+            )
+            for document in result.documents[0]
+        ]
+        assert len(documents) == 26
+        assert "Chunk 12 of a" not in documents
+        assert "Chunk 14 of a" not in documents
+        assert "Edited chunk 12 of a" in documents
+        assert len(get_chunk_metadatas(self.collection_name, "b")) == 12
@@ -0,0 +1,104 @@
+import pytest
+import tiktoken
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
+from langchain_core.documents import Document
+
+from open_webui.retrieval import splitter
+from open_webui.retrieval.splitter import TextSplitter
+
+WORDS = ["the", "then", "there", "splitter", "split", "token", "chunk", "é", "日本"]
+
+
+def get_test_encoding() -> tiktoken.Encoding:
+    # A small byte-level BPE, so the tests do not download an encoding: every prefix
+    # of the words is a token, multi-byte characters can be split across tokens
+    ranks = {bytes([i]): i for i in range(256)}
+    for word in WORDS:
+        encoded = word.encode()
+        for end in range(2, len(encoded) + 1):
+            ranks.setdefault(encoded[:end], len(ranks))
+    return tiktoken.Encoding(
+        "test",
+        pat_str=r"""'s|'t| ?\w+| ?[^\s\w]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+@pytest.fixture(autouse=True)
+def test_encoding(monkeypatch):
+    encoding = get_test_encoding()
+    monkeypatch.setattr(splitter, "get_encoding", lambda encoding_name: encoding)
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda encoding_name: encoding)
+
+
+DOCS = [
+    Document(
+        page_content="Then the splitter split there, token by token. " * 40,
+        metadata={"page": 0},
+    ),
+    Document(page_content="chunk " * 7, metadata={"page": 1}),
+    Document(page_content="", metadata={"page": 2}),
+    Document(page_content="日本 é the chunk. " * 30, metadata={"page": 3}),
+]
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(50, 0), (50, 10), (17, 16)])
+def test_token_chunks_match_token_text_splitter(chunk_size, chunk_overlap):
+    chunks = TextSplitter("token", chunk_size, chunk_overlap, "test").split_documents(
+        DOCS
+    )
+    expected = TokenTextSplitter(
+        encoding_name="test", chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    ).split_documents([doc for doc in DOCS if doc.page_content])
+
+    assert [chunk.page_content for chunk in chunks] == [
+        chunk.page_content for chunk in expected
+    ]
+    assert [chunk.metadata["page"] for chunk in chunks] == [
+        chunk.metadata["page"] for chunk in expected
+    ]
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(50, 0), (50, 10)])
+def test_token_chunk_positions(chunk_size, chunk_overlap):
+    # Only on text without multi-byte characters, which windows can cut in half
+    docs = DOCS[:2]
+    for chunk in TextSplitter(
+        "token", chunk_size, chunk_overlap, "test"
+    ).split_documents(docs):
+        content = docs[chunk.metadata["page"]].page_content
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        assert content[start:end] == chunk.page_content
+
+
+@pytest.mark.parametrize(
+    "mode,chunk_size,chunk_overlap",
+    [("character", 100, 0), ("character", 100, 30), ("markdown", 30, 10)],
+)
+def test_chunk_positions_in_repeated_text(mode, chunk_size, chunk_overlap):
+    # The same text repeats, so a chunk must not be located at a later repeat
+    content = ("the chunk splitter. " * 20 + "\n\n") * 5
+    chunks = TextSplitter(mode, chunk_size, chunk_overlap, "test").split_documents(
+        [Document(page_content=content, metadata={})]
+    )
+
+    starts = [chunk.metadata["start_index"] for chunk in chunks]
+    assert starts == sorted(starts)
+    for chunk in chunks:
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        assert content[start:end] == chunk.page_content
+
+
+def test_chunk_positions_match_add_start_index():
+    content = ("the chunk splitter. " * 20 + "\n\n") * 5
+    chunks = TextSplitter("character", 100, 30, "test").split_documents(
+        [Document(page_content=content, metadata={})]
+    )
+    expected = RecursiveCharacterTextSplitter(
+        chunk_size=100, chunk_overlap=30, add_start_index=True
+    ).create_documents([content])
+
+    assert [chunk.metadata["start_index"] for chunk in chunks] == [
+        chunk.metadata["start_index"] for chunk in expected
+    ]
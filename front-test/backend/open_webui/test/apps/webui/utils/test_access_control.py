@@ -0,0 +1,150 @@
+import uuid
+
+import pytest
+
+from open_webui.config import run_migrations
+from open_webui.internal.db import get_db
+from open_webui.models.groups import GroupForm, GroupUpdateForm, Groups
+from open_webui.models.knowledge import Knowledge, KnowledgeForm, Knowledges
+from open_webui.models.prompts import Prompt, PromptForm, Prompts
+from open_webui.utils.access_control import get_accessible, has_access
+
+
+def get_access_controls(user_id: str, group_id: str, other_group_id: str) -> list:
+    other_user_id = str(uuid.uuid4())
+    return [
+        None,
+        {},
+        {
+            "read": {"group_ids": [], "user_ids": []},
+            "write": {"group_ids": [], "user_ids": []},
+        },
+        {"read": {"user_ids": [user_id]}},
+        {"read": {"user_ids": [other_user_id]}},
+        {"read": {"group_ids": [group_id]}},
+        {"read": {"group_ids": [other_group_id]}},
+        {"write": {"user_ids": [user_id]}},
+        {"write": {"group_ids": [other_group_id, group_id]}},
+        {"read": {"user_ids": [other_user_id]}, "write": {"group_ids": [group_id]}},
+        {"read": {"group_ids": [group_id]}, "write": {"user_ids": [other_user_id]}},
+    ]
+
+
+class TestGetAccessible:
+    @classmethod
+    def setup_class(cls):
+        run_migrations()
+
+    def setup_method(self):
+        self.user_id = str(uuid.uuid4())
+        self.owner_id = str(uuid.uuid4())
+        group = Groups.insert_new_group(
+            self.owner_id, GroupForm(name="Members", description="")
+        )
+        Groups.update_group_by_id(
+            group.id,
+            GroupUpdateForm(name="Members", description="", user_ids=[self.user_id]),
+        )
+        other_group = Groups.insert_new_group(
+            self.owner_id, GroupForm(name="Others", description="")
+        )
+        self.group_ids = [group.id, other_group.id]
+        self.access_controls = get_access_controls(
+            self.user_id, group.id, other_group.id
+        )
+
+    def teardown_method(self):
+        for group_id in self.group_ids:
+            Groups.delete_group_by_id(group_id)
+        with get_db() as db:
+            for model in (Prompt, Knowledge):
+                db.query(model).filter(
+                    model.user_id.in_([self.user_id, self.owner_id])
+                ).delete()
+            db.commit()
+
+    def insert_prompts(self):
+        for user_id in (self.owner_id, self.user_id):
+            for access_control in self.access_controls:
+                Prompts.insert_new_prompt(
+                    user_id,
+                    PromptForm(
+                        command=f"/{uuid.uuid4()}",
+                        title="Prompt",
+                        content="",
+                        access_control=access_control,
+                    ),
+                )
+
+    def insert_knowledge_bases(self):
+        for user_id in (self.owner_id, self.user_id):
+            for access_control in self.access_controls:
+                Knowledges.insert_new_knowledge(
+                    user_id,
+                    KnowledgeForm(
+                        name="Knowledge",
+                        description="",
+                        access_control=access_control,
+                    ),
+                )
+
+    def assert_parity(self, model, key: str, type: str):
+        with get_db() as db:
+            query = db.query(model).filter(
+                model.user_id.in_([self.user_id, self.owner_id])
+            )
+            rows = query.all()
+            accessible = get_accessible(query, model, self.user_id, type)
+
+        expected = {
+            getattr(row, key)
+            for row in rows
+            if row.user_id == self.user_id
+            or has_access(self.user_id, type, row.access_control)
+        }
+        assert {getattr(row, key) for row in accessible} == expected
+        # Every row of the user, and some rows of the owner only
+        assert len(rows) > len(expected) > len(self.access_controls)
+
+    @pytest.mark.parametrize("type", ["read", "write"])
+    def test_prompts(self, type):
+        self.insert_prompts()
+        self.assert_parity(Prompt, "command", type)
+
+    @pytest.mark.parametrize("type", ["read", "write"])
+    def test_knowledge_bases(self, type):
+        self.insert_knowledge_bases()
+        self.assert_parity(Knowledge, "id", type)
+
+    def test_group_membership_changes(self):
+        self.insert_prompts()
+        self.assert_parity(Prompt, "command", "read")
+
+        # The group access of the user is cached until the groups change
+        Groups.update_group_by_id(
+            self.group_ids[0],
+            GroupUpdateForm(name="Members", description="", user_ids=[]),
+        )
+        self.assert_parity(Prompt, "command", "read")
+
+    def test_listings(self):
+        self.insert_prompts()
+        self.insert_knowledge_bases()
+
+        prompts = Prompts.get_prompts_by_user_id(self.user_id, "read")
+        assert {prompt.command for prompt in prompts} == {
+            prompt.command
+            for prompt in Prompts.get_prompts()
+            if prompt.user_id == self.user_id
+            or has_access(self.user_id, "read", prompt.access_control)
+        }
+
+        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(
+            self.user_id, "write"
+        )
+        assert {knowledge.id for knowledge in knowledge_bases} == {
+            knowledge.id
+            for knowledge in Knowledges.get_knowledge_bases()
+            if knowledge.user_id == self.user_id
+            or has_access(self.user_id, "write", knowledge.access_control)
+        }
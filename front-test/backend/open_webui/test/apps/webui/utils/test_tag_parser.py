@@ -0,0 +1,119 @@
+import pytest
+
+from open_webui.utils.tag_parser import ContentBlockTagParser
+
+TAG_GROUPS = [
+    ("reasoning", [("think", "/think"), ("|begin_of_thought|", "|end_of_thought|")]),
+    ("code_interpreter", [("code_interpreter", "/code_interpreter")]),
+    ("solution", [("|begin_of_solution|", "|end_of_solution|")]),
+]
+
+
+def stream(content: str, chunk_size: int) -> tuple[list[dict], bool]:
+    # Append the content to the last block chunk by chunk, as the middleware does
+    parser = ContentBlockTagParser(TAG_GROUPS)
+    content_blocks = [{"type": "text", "content": ""}]
+    for start in range(0, len(content), chunk_size):
+        content_blocks[-1]["content"] += content[start : start + chunk_size]
+        if parser.parse(content_blocks):
+            return content_blocks, True
+    return content_blocks, False
+
+
+def get_blocks(content_blocks: list[dict]) -> list[tuple]:
+    # Without the timings. The text after a block is only stripped when it arrives
+    # with the end tag, so it depends on the chunks.
+    return [
+        (block["type"], block["content"].strip(), block.get("attributes"))
+        for block in content_blocks
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1000])
+def test_reasoning_block(chunk_size):
+    content_blocks, done = stream(
+        "<think>\nLet me think.\n</think>\nThe answer is 42.", chunk_size
+    )
+    assert not done
+    assert get_blocks(content_blocks) == [
+        ("reasoning", "Let me think.", {}),
+        ("text", "The answer is 42.", None),
+    ]
+    assert "duration" in content_blocks[0]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+def test_text_before_and_between_blocks(chunk_size):
+    content_blocks, _ = stream(
+        "Hello <|begin_of_thought|>a<|end_of_thought|> then "
+        "<|begin_of_solution|>b<|end_of_solution|> done",
+        chunk_size,
+    )
+    assert get_blocks(content_blocks) == [
+        ("text", "Hello", None),
+        ("reasoning", "a", {}),
+        ("text", "then", None),
+        ("solution", "b", {}),
+        ("text", "done", None),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_text_that_is_not_a_tag(chunk_size):
+    content = "if a < b and b > c: <div>x</div> <thinker>"
+    content_blocks, _ = stream(content, chunk_size)
+    assert get_blocks(content_blocks) == [("text", content, None)]
+
+
+def test_unclosed_block():
+    content_blocks, _ = stream("<think>still thinking", 3)
+    assert get_blocks(content_blocks) == [("reasoning", "still thinking", {})]
+    assert "ended_at" not in content_blocks[0]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 6, 1000])
+def test_code_interpreter_ends_the_response(chunk_size):
+    content_blocks, done = stream(
+        'Run it: <code_interpreter type="code" lang="python">print(1)'
+        "</code_interpreter> ignored",
+        chunk_size,
+    )
+    assert done
+    assert get_blocks(content_blocks) == [
+        ("text", "Run it:", None),
+        ("code_interpreter", "print(1)", {"type": "code", "lang": "python"}),
+    ]
+
+
+def test_new_block_after_tool_calls():
+    parser = ContentBlockTagParser(TAG_GROUPS)
+    content_blocks = [{"type": "text", "content": "<think>a</think>b"}]
+    parser.parse(content_blocks)
+
+    content_blocks.append({"type": "tool_calls", "content": []})
+    content_blocks.append({"type": "text", "content": "<think>c</think>d"})
+    parser.parse(content_blocks)
+
+    assert [block["type"] for block in content_blocks] == [
+        "reasoning",
+        "text",
+        "tool_calls",
+        "reasoning",
+        "text",
+    ]
+    assert content_blocks[-1]["content"] == "d"
+
+
+def test_no_tags():
+    parser = ContentBlockTagParser([])
+    content_blocks = [{"type": "text", "content": "<think>a</think>"}]
+    assert not parser.parse(content_blocks)
+    assert content_blocks == [{"type": "text", "content": "<think>a</think>"}]
+
+
+def test_strip_blocks():
+    parser = ContentBlockTagParser(TAG_GROUPS)
+    assert (
+        parser.strip_blocks("<think>\na\n</think>b<|begin_of_solution|>c")
+        == "b<|begin_of_solution|>c"
+    )
@@ -0,0 +1,67 @@
+"""
+Benchmark of a local embedding model under concurrent load: embeddings per second when
+concurrent requests call the model directly, as before, against the embedding worker
+that coalesces them into batches.
+
+    python -m open_webui.test.benchmarks.bench_embedding_worker [model] [concurrency]
+
+Every request embeds one short query, as chats and memory lookups do.
+"""
+
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sentence_transformers import SentenceTransformer
+
+from open_webui.retrieval.models.embedding_worker import EmbeddingWorker
+
+NUM_REQUESTS = 2000
+
+
+def make_queries(num_queries: int) -> list[str]:
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    return [
+        " ".join(rng.choices(words, k=rng.randint(5, 25))) for _ in range(num_queries)
+    ]
+
+
+def bench(name: str, encode, queries: list[str], concurrency: int):
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(encode, queries))
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<12} {len(queries) / elapsed:8.1f} embeddings/s | "
+        f"{elapsed / len(queries) * concurrency * 1000:7.1f} ms per request"
+    )
+
+
+def main():
+    model_name = (
+        sys.argv[1] if len(sys.argv) > 1 else "sentence-transformers/all-MiniLM-L6-v2"
+    )
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    model = SentenceTransformer(model_name, device="cpu")
+    queries = make_queries(NUM_REQUESTS)
+    print(f"{model_name}, {len(queries)} requests, {concurrency} concurrent")
+
+    # Warm up
+    model.encode(queries[:64])
+
+    bench("direct", lambda query: model.encode(query), queries, concurrency)
+
+    worker = EmbeddingWorker(model)
+    bench("worker", lambda query: worker.encode(query), queries, concurrency)
+    worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the event emitter under concurrent streams: each stream emits status and
+message events, as tools and filters do, while a ticker measures how late the event loop
+runs it. The events are written to the database inline in the emitter, as before, and
+through the chat event writer.
+
+    python -m open_webui.test.benchmarks.bench_event_emitter [streams] [events]
+
+Writes to the database configured by DATA_DIR / DATABASE_URL, migrating it first.
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+
+from open_webui.config import run_migrations
+from open_webui.models.chats import ChatForm, Chats
+from open_webui.utils.chat_save import CHAT_EVENT_WRITER, add_event, write_events
+
+TICK = 0.005
+
+
+def create_chats(num_streams: int) -> list[tuple[str, str]]:
+    keys = []
+    for _ in range(num_streams):
+        message_id = str(uuid.uuid4())
+        chat = Chats.insert_new_chat(
+            "bench-event-emitter",
+            ChatForm(
+                chat={
+                    "title": "bench",
+                    "history": {
+                        "currentId": message_id,
+                        "messages": {
+                            message_id: {
+                                "id": message_id,
+                                "role": "assistant",
+                                "content": "",
+                            }
+                        },
+                    },
+                }
+            ),
+        )
+        keys.append((chat.id, message_id))
+    return keys
+
+
+def get_events(num_events: int) -> list[dict]:
+    return [
+        (
+            {"type": "status", "data": {"description": f"Step {i}", "done": False}}
+            if i % 2 == 0
+            else {"type": "message", "data": {"content": f"token {i} "}}
+        )
+        for i in range(num_events)
+    ]
+
+
+async def emit_inline(chat_id: str, message_id: str, event: dict):
+    # The emitter as it was before the chat event writer
+    write = add_event({"statuses": [], "content": None, "append": ""}, event)
+    write_events((chat_id, message_id), write)
+
+
+async def emit_queued(chat_id: str, message_id: str, event: dict):
+    await CHAT_EVENT_WRITER.put(chat_id, message_id, event)
+
+
+async def run_streams(emit, keys, events) -> tuple[float, float]:
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    async def stream(chat_id, message_id):
+        for event in events:
+            await emit(chat_id, message_id, event)
+            # Between two chunks of the response
+            await asyncio.sleep(0)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(stream(*key) for key in keys))
+    for key in keys:
+        await CHAT_EVENT_WRITER.flush(*key)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+
+    return elapsed, max(lags, default=0)
+
+
+def check(keys, num_events: int):
+    for chat_id, message_id in keys:
+        message = Chats.get_message_by_id_and_message_id(chat_id, message_id)
+        assert len(message["statusHistory"]) == (num_events + 1) // 2
+        assert message["content"].count("token") == num_events // 2
+
+
+def bench(name: str, emit, keys, events, start_writer: bool = False):
+    async def main():
+        if start_writer:
+            CHAT_EVENT_WRITER.start()
+        result = await run_streams(emit, keys, events)
+        await CHAT_EVENT_WRITER.close()
+        return result
+
+    elapsed, max_lag = asyncio.run(main())
+    print(
+        f"{name:<7} {elapsed * 1000:9.1f} ms | "
+        f"max event loop lag {max_lag * 1000:8.1f} ms"
+    )
+    check(keys, len(events))
+
+
+def main():
+    num_streams = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    num_events = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    run_migrations()
+
+    events = get_events(num_events)
+    print(f"{num_streams} streams, {num_events} events each")
+
+    bench("inline", emit_inline, create_chats(num_streams), events)
+    bench("queued", emit_queued, create_chats(num_streams), events, start_writer=True)
+    print(f"writer metrics: {CHAT_EVENT_WRITER.metrics}")
+
+    Chats.delete_chats_by_user_id("bench-event-emitter")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of the local vector DB against Chroma: ingest throughput, search latency and
+metadata filter latency, through the VECTOR_DB_CLIENT interface of both.
+
+    python -m open_webui.test.benchmarks.bench_local_vector_db [num_items] [dimension]
+
+Collections are created under the configured data paths and deleted at the end.
+"""
+
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from open_webui.retrieval.vector.dbs.chroma import ChromaClient
+from open_webui.retrieval.vector.dbs.local import LocalClient
+
+BATCH_SIZE = 500
+NUM_QUERIES = 200
+K = 5
+
+
+def make_items(num_items: int, dimension: int) -> tuple[list[dict], np.ndarray]:
+    vectors = np.random.default_rng(0).standard_normal((num_items, dimension))
+    vectors = vectors.astype(np.float32)
+    items = [
+        {
+            "id": str(uuid.uuid4()),
+            "text": f"chunk {idx} " + "lorem ipsum " * 50,
+            "vector": vectors[idx].tolist(),
+            "metadata": {"file_id": f"file-{idx % 100}", "start_index": idx},
+        }
+        for idx in range(num_items)
+    ]
+    return items, vectors
+
+
+def bench(name: str, client, items: list[dict], vectors: np.ndarray):
+    collection_name = f"benchmark-{uuid.uuid4().hex[:8]}"
+    try:
+        start = time.perf_counter()
+        for idx in range(0, len(items), BATCH_SIZE):
+            client.insert(collection_name, items[idx : idx + BATCH_SIZE])
+        # Until searchable: the local index is built on the first search after writes
+        client.search(collection_name, [vectors[0].tolist()], K)
+        ingest = time.perf_counter() - start
+
+        queries = vectors[:NUM_QUERIES] + 0.1
+        latencies = []
+        hits = 0
+        for idx, query in enumerate(queries):
+            start = time.perf_counter()
+            result = client.search(collection_name, [query.tolist()], K)
+            latencies.append(time.perf_counter() - start)
+            hits += items[idx]["id"] in result.ids[0]
+
+        start = time.perf_counter()
+        for idx in range(NUM_QUERIES):
+            client.query(collection_name, filter={"file_id": f"file-{idx % 100}"})
+        filter_latency = (time.perf_counter() - start) / NUM_QUERIES
+
+        latencies = np.array(latencies) * 1000
+        print(
+            f"{name:<8} ingest {len(items) / ingest:9.0f} items/s | "
+            f"search p50 {np.percentile(latencies, 50):6.2f} ms "
+            f"p99 {np.percentile(latencies, 99):6.2f} ms "
+            f"recall@{K} {hits / NUM_QUERIES:.2f} | "
+            f"filter {filter_latency * 1000:6.2f} ms"
+        )
+    finally:
+        client.delete_collection(collection_name)
+
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+
+    items, vectors = make_items(num_items, dimension)
+    print(f"{num_items} items of dimension {dimension}")
+    bench("local", LocalClient(), items, vectors)
+    bench("chroma", ChromaClient(), items, vectors)
+
+
+if __name__ == "__main__":
+    main()
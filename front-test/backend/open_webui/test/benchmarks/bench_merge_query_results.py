@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of merge_and_sort_query_results on large fan-outs.
+
+    python -m open_webui.test.benchmarks.bench_merge_query_results
+"""
+
+import hashlib
+import random
+import timeit
+
+from open_webui.retrieval.utils import merge_and_sort_query_results
+
+
+def merge_and_sort_query_results_md5(query_results: list[dict], k: int) -> dict:
+    # Previous implementation: md5 of every document and a full sort
+    combined = dict()
+    for data in query_results:
+        for distance, document, metadata in zip(
+            data["distances"][0], data["documents"][0], data["metadatas"][0]
+        ):
+            if isinstance(document, str):
+                doc_hash = hashlib.md5(document.encode()).hexdigest()
+                if doc_hash not in combined or distance > combined[doc_hash][0]:
+                    combined[doc_hash] = (distance, document, metadata)
+
+    combined = sorted(combined.values(), key=lambda x: x[0], reverse=True)[:k]
+    return {
+        "distances": [[d for d, _, _ in combined]],
+        "documents": [[doc for _, doc, _ in combined]],
+        "metadatas": [[m for _, _, m in combined]],
+    }
+
+
+def make_query_results(num_queries: int, k: int, pool_size: int) -> list[dict]:
+    # Every query returns k chunks out of a shared pool, so results overlap
+    rng = random.Random(0)
+    pool = [
+        f"chunk {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(pool_size)
+    ]
+
+    query_results = []
+    for _ in range(num_queries):
+        picks = sorted(
+            ((rng.random(), rng.randrange(pool_size)) for _ in range(k)), reverse=True
+        )
+        query_results.append(
+            {
+                "distances": [[distance for distance, _ in picks]],
+                # Copies, as results deserialized from a vector DB are distinct objects
+                "documents": [["".join(pool[idx]) for _, idx in picks]],
+                "metadatas": [[{"source": str(idx)} for _, idx in picks]],
+            }
+        )
+    return query_results
+
+
+def main():
+    k = 10
+    for num_queries, per_query_k, pool_size in [
+        (3, 10, 100),
+        (20, 50, 1_000),
+        (100, 200, 20_000),
+    ]:
+        query_results = make_query_results(num_queries, per_query_k, pool_size)
+        number = max(1, 2_000 // num_queries)
+
+        print(f"{num_queries} queries x {per_query_k} results, top {k}:")
+        for name, fn in [
+            ("md5 + sort", lambda: merge_and_sort_query_results_md5(query_results, k)),
+            ("heap", lambda: merge_and_sort_query_results(query_results, k)),
+            (
+                "heap + rrf",
+                lambda: merge_and_sort_query_results(
+                    query_results, k, reciprocal_rank_fusion=True
+                ),
+            ),
+        ]:
+            seconds = timeit.timeit(fn, number=number) / number
+            print(f"  {name:<12} {seconds * 1e6:10.1f} us")
+
+        assert merge_and_sort_query_results(
+            query_results, k
+        ) == merge_and_sort_query_results_md5(query_results, k)
+
+
+if __name__ == "__main__":
+    main()
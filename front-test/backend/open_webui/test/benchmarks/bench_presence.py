@@ -0,0 +1,137 @@
+"""
+Benchmark of the presence broadcasts during a reconnect storm: every client of a worker
+disconnects, as on a deploy, and reconnects at a random time within a window. The
+socket events are replayed on a simulated clock, and the messages delivered to the
+clients are counted for the full user-list sent to every client on every connect and
+disconnect, as before, and for the debounced user-list:diff events.
+
+    python -m open_webui.test.benchmarks.bench_presence [num_clients] [window_seconds]
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+from open_webui.socket.main import PresenceBroadcaster
+from open_webui.socket.utils import SessionPool
+
+INTERVAL = 1.0
+
+
+def record_storm(num_clients: int, window: float) -> tuple[list, list]:
+    # About two sessions per user: clients disconnect over the first second, and
+    # reconnect with a new session id within the window
+    rng = random.Random(0)
+    user_ids = [str(uuid.uuid4()) for _ in range(num_clients // 2)]
+    clients = [(f"sid-{i}", rng.choice(user_ids)) for i in range(num_clients)]
+
+    events = []
+    for sid, user_id in clients:
+        disconnected_at = rng.uniform(0, 1)
+        events.append((disconnected_at, "disconnect", sid, user_id))
+        events.append(
+            (rng.uniform(disconnected_at, window), "connect", f"{sid}-2", user_id)
+        )
+    return clients, sorted(events)
+
+
+class Deliveries:
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def add(self, clients: int, payload: dict):
+        self.messages += clients
+        self.bytes += clients * len(json.dumps(payload))
+
+
+def replay_full_lists(clients, events) -> Deliveries:
+    pool = SessionPool()
+    for sid, user_id in clients:
+        pool.add(sid, {"id": user_id})
+
+    deliveries = Deliveries()
+    for _, event, sid, user_id in events:
+        if event == "connect":
+            pool.add(sid, {"id": user_id})
+        else:
+            pool.remove(sid)
+        deliveries.add(len(pool.sessions), {"user_ids": pool.get_online_user_ids()})
+    return deliveries
+
+
+async def replay_diffs(clients, events) -> Deliveries:
+    pool = SessionPool()
+    for sid, user_id in clients:
+        pool.add(sid, {"id": user_id})
+
+    deliveries = Deliveries()
+
+    async def emit(event, payload):
+        deliveries.add(len(pool.sessions), payload)
+
+    # Flushed on the simulated clock instead of by its own task
+    presence = PresenceBroadcaster(emit, pool, 3600)
+    flush_at = None
+
+    async def flush():
+        presence.flush_task.cancel()
+        presence.flush_task = None
+        await presence.flush()
+
+    for at, event, sid, user_id in events:
+        if flush_at is not None and flush_at <= at:
+            await flush()
+            flush_at = None
+
+        if event == "connect":
+            if pool.add(sid, {"id": user_id}):
+                presence.update(user_id, True)
+            # The full list, to the connecting client only
+            deliveries.add(1, {"user_ids": pool.get_online_user_ids()})
+        else:
+            user_id, went_offline = pool.remove(sid)
+            if went_offline:
+                presence.update(user_id, False)
+
+        if flush_at is None and presence.flush_task is not None:
+            flush_at = at + INTERVAL
+
+    if presence.flush_task is not None:
+        await flush()
+    return deliveries
+
+
+def bench(name: str, replay, clients, events) -> Deliveries:
+    start = time.perf_counter()
+    deliveries = replay(clients, events)
+    if asyncio.iscoroutine(deliveries):
+        deliveries = asyncio.run(deliveries)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<11} {deliveries.messages:>12,} messages | "
+        f"{deliveries.bytes / 1e6:10.1f} MB | {elapsed * 1000:8.1f} ms"
+    )
+    return deliveries
+
+
+def main():
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    window = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+    clients, events = record_storm(num_clients, window)
+    print(
+        f"{num_clients} clients reconnecting within {window:g} s, "
+        f"{len(events)} connects and disconnects"
+    )
+
+    bench("full lists", replay_full_lists, clients, events)
+    bench("diffs", replay_diffs, clients, events)
+
+
+if __name__ == "__main__":
+    main()
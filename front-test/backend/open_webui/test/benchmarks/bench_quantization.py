@@ -0,0 +1,69 @@
+"""
+Benchmark of the quantized search of the local vector DB: index size, recall@k against
+exact search, and latency, for int8 and binary codes at several oversampling factors.
+
+    python -m open_webui.test.benchmarks.bench_quantization [num_items] [dimension]
+
+The vectors are drawn around random cluster centers, which is closer to text embeddings
+than isotropic noise.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from open_webui.retrieval.vector.dbs.local import QuantizedIndex, normalize
+
+NUM_QUERIES = 100
+K = 10
+
+
+def make_vectors(num_items: int, dimension: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, num_items // 100), dimension))
+    vectors = centers[rng.integers(len(centers), size=num_items)]
+    vectors = vectors + 0.6 * rng.standard_normal((num_items, dimension))
+    queries = vectors[:NUM_QUERIES] + 0.3 * rng.standard_normal(
+        (NUM_QUERIES, dimension)
+    )
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+
+    vectors, queries = make_vectors(num_items, dimension)
+    exact = np.argsort(1 - normalize(queries) @ normalize(vectors).T, axis=1)[:, :K]
+    print(
+        f"{num_items} items of dimension {dimension}, float32 {vectors.nbytes >> 20} MB"
+    )
+
+    for quantization in ["int8", "binary"]:
+        for oversampling in [1, 2, 4, 8]:
+            index = QuantizedIndex(
+                dimension, quantization, oversampling, lambda rows: vectors[rows]
+            )
+            index.add_items(vectors, np.arange(num_items))
+            size = index.codes.nbytes + index.scales.nbytes
+
+            start = time.perf_counter()
+            labels, _ = index.knn_query(queries, k=K)
+            latency = (time.perf_counter() - start) / NUM_QUERIES
+
+            recall = np.mean(
+                [
+                    len(set(a) & set(b)) / K
+                    for a, b in zip(labels.tolist(), exact.tolist())
+                ]
+            )
+            print(
+                f"{quantization:<7} oversampling {oversampling}: "
+                f"{size >> 20:4d} MB ({vectors.nbytes / size:4.1f}x smaller) | "
+                f"recall@{K} {recall:.3f} | {latency * 1000:6.2f} ms/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark of the tag detection of streamed chat responses: a recorded 10k token stream
+with reasoning, solution and code interpreter blocks is replayed delta by delta through
+the regex handler that rescanned the whole response on every delta, as before, and
+through the incremental tag parser.
+
+    python -m open_webui.test.benchmarks.bench_tag_parser [num_tokens]
+"""
+
+import random
+import re
+import sys
+import time
+
+from open_webui.utils.tag_parser import ContentBlockTagParser, extract_attributes
+
+TAG_GROUPS = [
+    (
+        "reasoning",
+        [
+            ("think", "/think"),
+            ("thinking", "/thinking"),
+            ("reason", "/reason"),
+            ("reasoning", "/reasoning"),
+            ("thought", "/thought"),
+            ("Thought", "/Thought"),
+            ("|begin_of_thought|", "|end_of_thought|"),
+        ],
+    ),
+    ("code_interpreter", [("code_interpreter", "/code_interpreter")]),
+    ("solution", [("|begin_of_solution|", "|end_of_solution|")]),
+]
+
+
+def record_stream(num_tokens: int) -> list[str]:
+    # Tokens of 1 to 6 characters, so tags are split across deltas
+    rng = random.Random(0)
+    words = ["the", "value", "x < y", "<b>", "list", "if", "a <= b", "return", "\n"]
+
+    def text(n: int) -> str:
+        return " ".join(rng.choices(words, k=n))
+
+    response = (
+        f"<think>{text(num_tokens * 4 // 10)}</think>\n\n"
+        f"{text(num_tokens // 10)}\n"
+        f"<|begin_of_solution|>{text(num_tokens * 3 // 10)}<|end_of_solution|>\n"
+        f'{text(num_tokens // 10)}\n<code_interpreter type="code" lang="python">\n'
+        f"{text(num_tokens // 10)}\n</code_interpreter>"
+    )
+
+    deltas = []
+    while response:
+        size = rng.randint(1, 6)
+        deltas.append(response[:size])
+        response = response[size:]
+    return deltas
+
+
+def tag_content_handler(content_type, tags, content, content_blocks):
+    # The regex handler as it was before the tag parser, condensed
+    end_flag = False
+
+    if content_blocks[-1]["type"] == "text":
+        for start_tag, end_tag in tags:
+            match = re.search(rf"<{re.escape(start_tag)}(\s.*?)?>", content)
+            if match:
+                before_tag = content[: match.start()]
+                after_tag = content[match.end() :]
+                content_blocks[-1]["content"] = content_blocks[-1]["content"].replace(
+                    match.group(0) + after_tag, ""
+                )
+                if before_tag:
+                    content_blocks[-1]["content"] = before_tag
+                if not content_blocks[-1]["content"]:
+                    content_blocks.pop()
+                content_blocks.append(
+                    {
+                        "type": content_type,
+                        "start_tag": start_tag,
+                        "end_tag": end_tag,
+                        "attributes": extract_attributes(match.group(1)),
+                        "content": after_tag,
+                        "started_at": time.time(),
+                    }
+                )
+                break
+    elif content_blocks[-1]["type"] == content_type:
+        start_tag = content_blocks[-1]["start_tag"]
+        end_tag = content_blocks[-1]["end_tag"]
+        end_tag_pattern = rf"<{re.escape(end_tag)}>"
+        if re.search(end_tag_pattern, content):
+            end_flag = True
+            block_content = re.sub(
+                rf"<{re.escape(start_tag)}(.*?)>", "", content_blocks[-1]["content"]
+            ).strip()
+            split_content = re.split(end_tag_pattern, block_content, maxsplit=1)
+            block_content = split_content[0].strip()
+            leftover_content = (
+                split_content[1].strip() if len(split_content) > 1 else ""
+            )
+
+            if block_content:
+                content_blocks[-1]["content"] = block_content
+                content_blocks[-1]["ended_at"] = time.time()
+                content_blocks[-1]["duration"] = int(
+                    content_blocks[-1]["ended_at"] - content_blocks[-1]["started_at"]
+                )
+                if content_type != "code_interpreter":
+                    content_blocks.append({"type": "text", "content": leftover_content})
+            else:
+                content_blocks.pop()
+                content_blocks.append({"type": "text", "content": leftover_content})
+
+            content = re.sub(
+                rf"<{re.escape(start_tag)}(.*?)>(.|\n)*?<{re.escape(end_tag)}>",
+                "",
+                content,
+                flags=re.DOTALL,
+            )
+
+    return content, content_blocks, end_flag
+
+
+def replay_regex(deltas: list[str]) -> list[dict]:
+    content = ""
+    content_blocks = [{"type": "text", "content": ""}]
+    for value in deltas:
+        content = f"{content}{value}"
+        content_blocks[-1]["content"] = content_blocks[-1]["content"] + value
+        for content_type, tags in TAG_GROUPS:
+            content, content_blocks, end = tag_content_handler(
+                content_type, tags, content, content_blocks
+            )
+            if end and content_type == "code_interpreter":
+                return content_blocks
+    return content_blocks
+
+
+def replay_parser(deltas: list[str]) -> list[dict]:
+    tag_parser = ContentBlockTagParser(TAG_GROUPS)
+    content_blocks = [{"type": "text", "content": ""}]
+    for value in deltas:
+        content_blocks[-1]["content"] = content_blocks[-1]["content"] + value
+        if tag_parser.parse(content_blocks):
+            break
+    return content_blocks
+
+
+def bench(name: str, replay, deltas: list[str]) -> list[dict]:
+    start = time.perf_counter()
+    content_blocks = replay(deltas)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<8} {elapsed * 1000:9.1f} ms | "
+        f"{elapsed / len(deltas) * 1e6:7.2f} us per delta | "
+        f"blocks: {', '.join(block['type'] for block in content_blocks)}"
+    )
+    return content_blocks
+
+
+def main():
+    num_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    deltas = record_stream(num_tokens)
+    print(f"{len(deltas)} deltas, {sum(len(delta) for delta in deltas)} characters")
+
+    regex_blocks = bench("regex", replay_regex, deltas)
+    parser_blocks = bench("parser", replay_parser, deltas)
+
+    assert [block["type"] for block in regex_blocks] == [
+        block["type"] for block in parser_blocks
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark of the text splitters on a large document: throughput of the splitter service
+against the langchain splitters created for every upload, as they were before.
+
+    python -m open_webui.test.benchmarks.bench_text_splitter [file.pdf] [encoding_name]
+
+Without a PDF, 2000 pages of generated markdown-like text are split.
+"""
+
+import random
+import sys
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
+from langchain_core.documents import Document
+
+from open_webui.retrieval.splitter import get_splitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+NUM_PAGES = 2000
+
+
+def make_pages(num_pages: int) -> list[Document]:
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+
+    def sentence() -> str:
+        return " ".join(rng.choices(words, k=rng.randint(5, 25))).capitalize() + "."
+
+    pages = []
+    for page in range(num_pages):
+        paragraphs = [f"## {sentence()}"] + [
+            " ".join(sentence() for _ in range(rng.randint(2, 8)))
+            for _ in range(rng.randint(3, 8))
+        ]
+        pages.append(
+            Document(page_content="\n\n".join(paragraphs), metadata={"page": page})
+        )
+    return pages
+
+
+def load_pdf(path: str) -> list[Document]:
+    from open_webui.retrieval.loaders.pdf import ParallelPyPDFLoader
+
+    return ParallelPyPDFLoader(path).load()
+
+
+def bench(name: str, split, pages: list[Document]):
+    start = time.perf_counter()
+    chunks = split(pages)
+    elapsed = time.perf_counter() - start
+
+    size = sum(len(page.page_content) for page in pages) / 1e6
+    print(
+        f"{name:<28} {len(chunks):6d} chunks | {elapsed:6.2f} s | "
+        f"{len(pages) / elapsed:8.1f} pages/s | {size / elapsed:6.2f} MB/s"
+    )
+
+
+def main():
+    pages = load_pdf(sys.argv[1]) if len(sys.argv) > 1 else make_pages(NUM_PAGES)
+    encoding_name = sys.argv[2] if len(sys.argv) > 2 else "cl100k_base"
+    print(f"{len(pages)} pages, {sum(len(p.page_content) for p in pages)} characters")
+
+    bench(
+        "character (langchain)",
+        lambda docs: RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+        ).split_documents(docs),
+        pages,
+    )
+    bench(
+        "character",
+        get_splitter(
+            "character", CHUNK_SIZE, CHUNK_OVERLAP, encoding_name
+        ).split_documents,
+        pages,
+    )
+    bench(
+        "token (langchain)",
+        lambda docs: TokenTextSplitter(
+            encoding_name=encoding_name,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            add_start_index=True,
+        ).split_documents(docs),
+        pages,
+    )
+    bench(
+        "token",
+        get_splitter("token", CHUNK_SIZE, CHUNK_OVERLAP, encoding_name).split_documents,
+        pages,
+    )
+    bench(
+        "markdown",
+        get_splitter(
+            "markdown", CHUNK_SIZE, CHUNK_OVERLAP, encoding_name
+        ).split_documents,
+        pages,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 from typing import Optional, Union, List, Dict, Any
 from open_webui.models.users import Users, UserModel
 from open_webui.models.groups import Groups
+from open_webui.utils.user_cache import USER_CACHE
 
 
 from open_webui.config import DEFAULT_USER_PERMISSIONS
+from pydantic import BaseModel
+from sqlalchemy import bindparam, or_, text
 import json
 
 
+class UserAccess(BaseModel):
+    """The groups of a user, resolved once and cached until any group changes."""
+
+    group_ids: set[str]
+    # Most permissive value of every group permission, before the defaults
+    permissions: Dict[str, Any]
+
+
 def fill_missing_permissions(
     permissions: Dict[str, Any], default_permissions: Dict[str, Any]
 ) -> Dict[str, Any]:
@@ -25,6 +36,44 @@ def fill_missing_permissions(
     return permissions
 
 
+def combine_permissions(
+    permissions: Dict[str, Any], group_permissions: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Combine permissions from multiple groups by taking the most permissive value."""
+    for key, value in group_permissions.items():
+        if isinstance(value, dict):
+            if key not in permissions:
+                permissions[key] = {}
+            permissions[key] = combine_permissions(permissions[key], value)
+        else:
+            if key not in permissions:
+                permissions[key] = value
+            else:
+                permissions[key] = (
+                    permissions[key] or value
+                )  # Use the most permissive value (True > False)
+    return permissions
+
+
+def get_user_access(user_id: str) -> UserAccess:
+    """
+    Get the group ids and combined group permissions of a user, from the cache when
+    the groups have not changed since.
+    """
+    access = USER_CACHE.get_access(user_id)
+    if access is None:
+        version = USER_CACHE.version
+        permissions = {}
+        group_ids = set()
+        for group in Groups.get_groups_by_member_id(user_id):
+            group_ids.add(group.id)
+            permissions = combine_permissions(permissions, group.permissions or {})
+
+        access = UserAccess(group_ids=group_ids, permissions=permissions)
+        USER_CACHE.set_access(user_id, access, version)
+    return access
+
+
 def get_permissions(
     user_id: str,
     default_permissions: Dict[str, Any],
@@ -35,33 +84,11 @@ def get_permissions(
     Permissions are nested in a dict with the permission key as the key and a boolean as the value.
     """
 
-    def combine_permissions(
-        permissions: Dict[str, Any], group_permissions: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Combine permissions from multiple groups by taking the most permissive value."""
-        for key, value in group_permissions.items():
-            if isinstance(value, dict):
-                if key not in permissions:
-                    permissions[key] = {}
-                permissions[key] = combine_permissions(permissions[key], value)
-            else:
-                if key not in permissions:
-                    permissions[key] = value
-                else:
-                    permissions[key] = (
-                        permissions[key] or value
-                    )  # Use the most permissive value (True > False)
-        return permissions
-
-    user_groups = Groups.get_groups_by_member_id(user_id)
-
     # Deep copy default permissions to avoid modifying the original dict
     permissions = json.loads(json.dumps(default_permissions))
 
     # Combine permissions from all user groups
-    for group in user_groups:
-        group_permissions = group.permissions
-        permissions = combine_permissions(permissions, group_permissions)
+    permissions = combine_permissions(permissions, get_user_access(user_id).permissions)
 
     # Ensure all fields from default_permissions are present and filled in
     permissions = fill_missing_permissions(permissions, default_permissions)
@@ -93,12 +120,8 @@ def has_permission(
     permission_hierarchy = permission_key.split(".")
 
     # Retrieve user group permissions
-    user_groups = Groups.get_groups_by_member_id(user_id)
-
-    for group in user_groups:
-        group_permissions = group.permissions
-        if get_permission(group_permissions, permission_hierarchy):
-            return True
+    if get_permission(get_user_access(user_id).permissions, permission_hierarchy):
+        return True
 
     # Check default permissions afterward if the group permissions don't allow it
     default_permissions = fill_missing_permissions(
@@ -115,8 +138,7 @@ def has_access(
     if access_control is None:
         return type == "read"
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
-    user_group_ids = [group.id for group in user_groups]
+    user_group_ids = get_user_access(user_id).group_ids
     permission_access = access_control.get(type, {})
     permitted_group_ids = permission_access.get("group_ids", [])
     permitted_user_ids = permission_access.get("user_ids", [])
@@ -126,6 +148,70 @@ def has_access(
     )
 
 
+def get_accessible(query, model, user_id: str, type: str = "write") -> list:
+    """
+    Get the rows of a query on a model with an access_control column that the user
+    owns or has access to, as has_access would allow them, filtering in SQL.
+    """
+    db = query.session
+    user_group_ids = list(get_user_access(user_id).group_ids)
+    table = model.__tablename__
+
+    if db.bind.dialect.name == "sqlite":
+        access_filter = text(
+            f"(EXISTS (SELECT 1 FROM json_each({table}.access_control, :user_ids_path) "
+            "WHERE json_each.value = :access_user_id) "
+            f"OR EXISTS (SELECT 1 FROM json_each({table}.access_control, :group_ids_path) "
+            "WHERE json_each.value IN :access_group_ids))"
+        )
+        public_filter = text(
+            f"({table}.access_control IS NULL "
+            f"OR json_type({table}.access_control) = 'null')"
+        )
+        params = {
+            "user_ids_path": f"$.{type}.user_ids",
+            "group_ids_path": f"$.{type}.group_ids",
+        }
+    elif db.bind.dialect.name == "postgresql":
+        access_filter = text(
+            "(EXISTS (SELECT 1 FROM json_array_elements_text("
+            f"{table}.access_control->:access_type->'user_ids') elem "
+            "WHERE elem = :access_user_id) "
+            "OR EXISTS (SELECT 1 FROM json_array_elements_text("
+            f"{table}.access_control->:access_type->'group_ids') elem "
+            "WHERE elem IN :access_group_ids))"
+        )
+        public_filter = text(
+            f"({table}.access_control IS NULL "
+            f"OR json_typeof({table}.access_control) = 'null')"
+        )
+        params = {"access_type": type}
+    else:
+        # Filtered in Python, without querying the groups again
+        return [
+            row
+            for row in query.all()
+            if row.user_id == user_id or has_access(user_id, type, row.access_control)
+        ]
+
+    access_filter = access_filter.bindparams(
+        bindparam("access_group_ids", expanding=True)
+    )
+    conditions = [model.user_id == user_id, access_filter]
+    if type == "read":
+        conditions.append(public_filter)
+
+    return (
+        query.filter(or_(*conditions))
+        .params(
+            access_user_id=user_id,
+            access_group_ids=user_group_ids,
+            **params,
+        )
+        .all()
+    )
+
+
 # Get all users with access to a resource
 def get_users_with_access(
     type: str = "write", access_control: Optional[dict] = None
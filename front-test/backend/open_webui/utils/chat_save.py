@@ -0,0 +1,352 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: journals of other workers are not told apart from abandoned ones
+    fcntl = None
+
+from open_webui.env import (
+    CHAT_EVENT_WRITE_QUEUE_SIZE,
+    DATA_DIR,
+    REALTIME_CHAT_SAVE_INTERVAL,
+    REALTIME_CHAT_SAVE_JOURNAL_INTERVAL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.chats import Chats
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+JOURNAL_DIR = DATA_DIR / "chat_save_journal"
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer of the realtime chat saves. Updates of a message are merged in
+    memory, as upsert_message_to_chat_by_id_and_message_id merges them into the chat,
+    and the chat is written once per interval instead of once per delta. Values may be
+    callables, only called when the message is written or journaled.
+
+    Until they are written, the buffered messages are appended to a journal every
+    journal interval. Each worker keeps its own journal, locked while it runs: journals
+    left by a crashed worker are replayed into the database on start.
+    """
+
+    def __init__(self, interval: float, journal_interval: float):
+        self.interval = interval
+        self.journal_interval = journal_interval
+
+        # (chat_id, message_id) -> merged message, and those not journaled yet
+        self.pending: dict[tuple[str, str], dict] = {}
+        self.unjournaled: set[tuple[str, str]] = set()
+
+        # Writes of a message never overtake each other
+        self.lock = asyncio.Lock()
+        self.journal = None
+        self.task: Optional[asyncio.Task] = None
+
+    def update(self, chat_id: str, message_id: str, message: dict):
+        key = (chat_id, message_id)
+        self.pending[key] = {**self.pending.get(key, {}), **message}
+        self.unjournaled.add(key)
+
+    async def flush(
+        self, chat_id: Optional[str] = None, message_id: Optional[str] = None
+    ):
+        # Write the buffered messages, or only the given one
+        async with self.lock:
+            if chat_id is None:
+                keys = list(self.pending)
+            else:
+                keys = (
+                    [(chat_id, message_id)]
+                    if (chat_id, message_id) in self.pending
+                    else []
+                )
+
+            messages = {key: resolve_message(self.pending.pop(key)) for key in keys}
+            self.unjournaled.difference_update(keys)
+            if messages:
+                await run_in_threadpool(write_messages, messages)
+
+            # Only what is still buffered is kept in the journal
+            if self.journal and messages:
+                self.journal.seek(0)
+                self.journal.truncate()
+                self.unjournaled.update(self.pending)
+                self.write_journal()
+
+    def write_journal(self):
+        if self.journal is None or not self.unjournaled:
+            return
+
+        for chat_id, message_id in self.unjournaled:
+            self.journal.write(
+                json.dumps(
+                    {
+                        "chat_id": chat_id,
+                        "message_id": message_id,
+                        "message": resolve_message(self.pending[(chat_id, message_id)]),
+                    }
+                )
+                + "\n"
+            )
+        # Handed to the OS, which keeps it if the worker crashes
+        self.journal.flush()
+        self.unjournaled.clear()
+
+    def open_journal(self):
+        JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        replay_journals()
+
+        self.journal = open(JOURNAL_DIR / f"{os.getpid()}.jsonl", "w")
+        if fcntl:
+            fcntl.flock(self.journal, fcntl.LOCK_EX)
+
+    async def run(self):
+        self.open_journal()
+
+        last_flush = time.monotonic()
+        while True:
+            await asyncio.sleep(self.journal_interval)
+            if time.monotonic() - last_flush >= self.interval:
+                last_flush = time.monotonic()
+                try:
+                    await self.flush()
+                except Exception as e:
+                    log.exception(f"Error writing buffered chat messages: {e}")
+            self.write_journal()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+        await self.flush()
+        if self.journal:
+            self.journal.close()
+            os.remove(self.journal.name)
+            self.journal = None
+
+
+def resolve_message(message: dict) -> dict:
+    return {
+        key: value() if callable(value) else value for key, value in message.items()
+    }
+
+
+def write_messages(messages: dict[tuple[str, str], dict]):
+    for (chat_id, message_id), message in messages.items():
+        try:
+            Chats.upsert_message_to_chat_by_id_and_message_id(
+                chat_id, message_id, message
+            )
+        except Exception as e:
+            log.warning(f"Error saving message {message_id} of chat {chat_id}: {e}")
+
+
+def replay_journals():
+    for path in JOURNAL_DIR.glob("*.jsonl"):
+        try:
+            f = open(path, "r")
+        except FileNotFoundError:
+            # Replayed by a worker starting at the same time
+            continue
+
+        with f:
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Journal of a running worker
+                    continue
+
+            messages = {}
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Cut off by the crash
+                    continue
+                key = (entry["chat_id"], entry["message_id"])
+                messages[key] = {**messages.get(key, {}), **entry["message"]}
+
+            if messages:
+                log.info(f"Replaying {len(messages)} messages from {path.name}")
+                write_messages(messages)
+            path.unlink(missing_ok=True)
+
+
+# Seconds between warnings about event emitters waiting for the database
+EVENT_WRITE_WAIT_WARNING_INTERVAL = 60
+
+
+class ChatEventWriter:
+    """
+    Writes the status, message and replace events of the event emitters to the
+    database on a background task, after they are sent to the clients. Events are
+    queued per message and coalesced while queued: statuses are appended in one write,
+    and content appends and replacements folded into one content update.
+
+    The queue holds at most max_size messages. Emitters wait for room when it is full,
+    which is counted in the metrics along with the time spent waiting.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+
+        # (chat_id, message_id) -> {"statuses", "content", "append"}
+        self.pending: dict[tuple[str, str], dict] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "events": 0,
+            "coalesced": 0,
+            "writes": 0,
+            "errors": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_depth": 0,
+        }
+        self.last_wait_warning = 0.0
+
+    async def put(self, chat_id: str, message_id: str, event: dict):
+        key = (chat_id, message_id)
+        self.metrics["events"] += 1
+
+        if self.task is None:
+            # Not started: written right away, still off the event loop
+            write = add_event({"statuses": [], "content": None, "append": ""}, event)
+            async with self.lock:
+                await run_in_threadpool(write_events, key, write)
+            return
+
+        if key in self.pending:
+            self.metrics["coalesced"] += 1
+            add_event(self.pending[key], event)
+            return
+
+        self.pending[key] = add_event(
+            {"statuses": [], "content": None, "append": ""}, event
+        )
+        if self.queue.full():
+            await self.wait_for_room(key)
+        else:
+            self.queue.put_nowait(key)
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.queue.qsize())
+
+    async def wait_for_room(self, key: tuple[str, str]):
+        start = time.monotonic()
+        await self.queue.put(key)
+        waited = time.monotonic() - start
+
+        self.metrics["waits"] += 1
+        self.metrics["wait_seconds"] += waited
+        if (
+            time.monotonic() - self.last_wait_warning
+            >= EVENT_WRITE_WAIT_WARNING_INTERVAL
+        ):
+            self.last_wait_warning = time.monotonic()
+            log.warning(
+                f"Chat event write queue full ({self.max_size} messages), "
+                f"emitter waited {waited:.3f}s: {self.metrics}"
+            )
+
+    async def flush(self, chat_id: str, message_id: str):
+        # Write the queued events of a message, after any write of it in progress
+        async with self.lock:
+            write = self.pending.pop((chat_id, message_id), None)
+            if write:
+                await self.write((chat_id, message_id), write)
+
+    async def write(self, key: tuple[str, str], write: dict):
+        try:
+            await run_in_threadpool(write_events, key, write)
+            self.metrics["writes"] += 1
+        except Exception as e:
+            self.metrics["errors"] += 1
+            log.exception(f"Error writing events of message {key[1]}: {e}")
+
+    async def run(self):
+        while True:
+            key = await self.queue.get()
+            async with self.lock:
+                # None when written by flush
+                write = self.pending.pop(key, None)
+                if write:
+                    await self.write(key, write)
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.metrics,
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "pending": len(self.pending),
+            "max_size": self.max_size,
+        }
+
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=self.max_size)
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+        async with self.lock:
+            pending, self.pending = self.pending, {}
+            for key, write in pending.items():
+                await self.write(key, write)
+
+
+def add_event(write: dict, event: dict) -> dict:
+    data = event.get("data", {})
+    if event["type"] == "status":
+        write["statuses"].append(data)
+    elif event["type"] == "message":
+        write["append"] += data.get("content", "")
+    elif event["type"] == "replace":
+        write["content"] = data.get("content", "")
+        write["append"] = ""
+    return write
+
+
+def write_events(key: tuple[str, str], write: dict):
+    chat_id, message_id = key
+    if write["statuses"]:
+        Chats.add_message_statuses_to_chat_by_id_and_message_id(
+            chat_id, message_id, write["statuses"]
+        )
+
+    content = write["content"]
+    if content is None and write["append"]:
+        message = Chats.get_message_by_id_and_message_id(chat_id, message_id)
+        if message:
+            content = message.get("content", "")
+
+    if content is not None:
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, message_id, {"content": content + write["append"]}
+        )
+
+
+MESSAGE_WRITE_BUFFER = MessageWriteBuffer(
+    REALTIME_CHAT_SAVE_INTERVAL, REALTIME_CHAT_SAVE_JOURNAL_INTERVAL
+)
+CHAT_EVENT_WRITER = ChatEventWriter(CHAT_EVENT_WRITE_QUEUE_SIZE)
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: runs are only serialized within the process
+    fcntl = None
+
+from open_webui.config import (
+    VECTOR_DB_GC_BATCH_SIZE,
+    VECTOR_DB_GC_INTERVAL,
+    VECTOR_DB_GC_TTL,
+)
+from open_webui.env import DATA_DIR, SRC_LOG_LEVELS
+from open_webui.models.files import Files
+from open_webui.models.knowledge import Knowledges
+from open_webui.models.users import Users
+from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.utils.reindex import get_shadow_collection_names
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+GC_STATE_PATH = DATA_DIR / "vector_db_gc.json"
+GC_LOCK_PATH = DATA_DIR / "vector_db_gc.lock"
+
+# Collections named after a row, garbage as soon as the row is gone. Every other
+# unreferenced collection (web searches, URLs and texts added to chats) expires after
+# VECTOR_DB_GC_TTL.
+OWNED_COLLECTION_PREFIXES = ["file-", "user-memory-"]
+
+# Delay before the first run after a start, if one is due
+GC_STARTUP_DELAY = 300
+
+_gc_task: Optional[asyncio.Task] = None
+
+
+####################################
+#
+# State
+#
+####################################
+
+
+def load_state() -> dict:
+    try:
+        with open(GC_STATE_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.exception(f"Error loading collection GC state: {e}")
+        return {}
+
+
+def save_state(state: dict):
+    # Write to a temporary file first so a crash never leaves a truncated state
+    tmp_path = f"{GC_STATE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, GC_STATE_PATH)
+
+
+def get_collection_gc_status() -> dict:
+    return {
+        "running": is_collection_gc_running(),
+        "last_run": load_state().get("last_run"),
+    }
+
+
+def is_collection_gc_running() -> bool:
+    return _gc_task is not None and not _gc_task.done()
+
+
+@contextmanager
+def gc_lock():
+    # Every worker schedules the job: only one of them runs it at a time
+    with open(GC_LOCK_PATH, "a") as f:
+        if fcntl:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+
+
+####################################
+#
+# Collections
+#
+####################################
+
+
+def get_collection_key(collection_name: str) -> str:
+    # Milvus stores collection names with "_" in place of "-"
+    return collection_name.replace("-", "_")
+
+
+def get_referenced_collection_keys() -> set[str]:
+    collection_names = [f"file-{id}" for id in Files.get_file_ids()]
+    collection_names += Knowledges.get_knowledge_ids()
+    collection_names += get_shadow_collection_names()
+    collection_names += [f"user-memory-{id}" for id in Users.get_user_ids()]
+    return {get_collection_key(name) for name in collection_names}
+
+
+def find_garbage_collections(state: dict) -> tuple[list[str], list[str]]:
+    """
+    Return the orphaned collections and the expired ones. The age of a collection is
+    counted from the first run that found it unreferenced, as the vector databases do
+    not all record when a collection was created.
+    """
+    # Listed first: the row of a collection is always created before the collection
+    collection_names = VECTOR_DB_CLIENT.list_collections()
+    referenced_keys = get_referenced_collection_keys()
+    owned_prefixes = tuple(
+        get_collection_key(prefix) for prefix in OWNED_COLLECTION_PREFIXES
+    )
+
+    now = int(time.time())
+    first_seen = state.get("first_seen", {})
+    state["first_seen"] = {}
+
+    orphaned = []
+    expired = []
+    for collection_name in collection_names:
+        key = get_collection_key(collection_name)
+        if key in referenced_keys:
+            continue
+
+        state["first_seen"][key] = first_seen.get(key, now)
+        if key.startswith(owned_prefixes):
+            orphaned.append(collection_name)
+        elif now - state["first_seen"][key] >= VECTOR_DB_GC_TTL:
+            expired.append(collection_name)
+
+    return orphaned, expired
+
+
+def delete_collections(collection_names: list[str]) -> list[str]:
+    deleted = []
+    for collection_name in collection_names:
+        try:
+            VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+            deleted.append(collection_name)
+        except Exception as e:
+            log.warning(f"Error deleting collection {collection_name}: {e}")
+    return deleted
+
+
+def get_vector_db_size() -> Optional[int]:
+    # Only known for the databases stored locally or in Postgres
+    if not hasattr(VECTOR_DB_CLIENT, "get_size"):
+        return None
+    return VECTOR_DB_CLIENT.get_size()
+
+
+def compact_vector_db():
+    if hasattr(VECTOR_DB_CLIENT, "compact"):
+        try:
+            VECTOR_DB_CLIENT.compact()
+        except Exception as e:
+            log.warning(f"Error compacting the vector database: {e}")
+
+
+####################################
+#
+# Job
+#
+####################################
+
+
+async def run_collection_gc() -> Optional[dict]:
+    """
+    Delete the orphaned and expired collections in batches, compact the vector database
+    where supported, and report what was reclaimed. Returns None if another worker is
+    already running it.
+    """
+    with gc_lock() as acquired:
+        if not acquired:
+            return None
+
+        started_at = int(time.time())
+        state = load_state()
+        size_before = await run_in_threadpool(get_vector_db_size)
+        orphaned, expired = await run_in_threadpool(find_garbage_collections, state)
+        save_state(state)
+
+        garbage = orphaned + expired
+        if garbage:
+            log.info(
+                f"Deleting {len(orphaned)} orphaned and {len(expired)} expired collections"
+            )
+
+        deleted = []
+        for start in range(0, len(garbage), VECTOR_DB_GC_BATCH_SIZE):
+            batch = garbage[start : start + VECTOR_DB_GC_BATCH_SIZE]
+            batch_deleted = await run_in_threadpool(delete_collections, batch)
+            for collection_name in batch_deleted:
+                state["first_seen"].pop(get_collection_key(collection_name), None)
+            deleted += batch_deleted
+            save_state(state)
+
+        if deleted:
+            await run_in_threadpool(compact_vector_db)
+        size_after = await run_in_threadpool(get_vector_db_size)
+
+        state["last_run"] = {
+            "started_at": started_at,
+            "finished_at": int(time.time()),
+            "orphaned_collections": len(orphaned),
+            "expired_collections": len(expired),
+            "deleted_collections": len(deleted),
+            "failed_collections": len(garbage) - len(deleted),
+            "reclaimed_bytes": (
+                max(0, size_before - size_after)
+                if size_before is not None and size_after is not None
+                else None
+            ),
+        }
+        save_state(state)
+
+    log.info(f"Collection GC completed: {state['last_run']}")
+    return state["last_run"]
+
+
+async def run_collection_gc_task():
+    try:
+        await run_collection_gc()
+    except Exception as e:
+        log.exception(f"Error during collection GC: {e}")
+
+
+def start_collection_gc() -> bool:
+    global _gc_task
+
+    if is_collection_gc_running():
+        return False
+
+    _gc_task = asyncio.create_task(run_collection_gc_task())
+    return True
+
+
+async def periodic_collection_gc():
+    if VECTOR_DB_GC_INTERVAL <= 0:
+        return
+
+    # Keep the schedule across restarts
+    last_run = load_state().get("last_run") or {}
+    delay = last_run.get("finished_at", 0) + VECTOR_DB_GC_INTERVAL - time.time()
+
+    await asyncio.sleep(max(delay, GC_STARTUP_DELAY))
+    while True:
+        if start_collection_gc():
+            await _gc_task
+        await asyncio.sleep(VECTOR_DB_GC_INTERVAL)
@@ -25,6 +25,7 @@ from starlette.responses import Response, StreamingResponse
 from open_webui.models.chats import Chats
 from open_webui.models.users import Users
 from open_webui.socket.main import (
+    ChatCompletionStream,
     get_event_call,
     get_event_emitter,
     get_active_status_by_user_id,
@@ -35,7 +36,7 @@ from open_webui.routers.tasks import (
     generate_image_prompt,
     generate_chat_tags,
 )
-from open_webui.routers.retrieval import process_web_search, SearchForm
+from open_webui.routers.retrieval import process_web_searches
 from open_webui.routers.images import image_generations, GenerateImageForm
 from open_webui.routers.pipelines import (
     process_pipeline_inlet_filter,
@@ -61,6 +62,7 @@ from open_webui.utils.task import (
 from open_webui.utils.misc import (
     deep_update,
     get_message_list,
+    get_messages_content,
     add_or_update_system_message,
     add_or_update_user_message,
     get_last_user_message,
@@ -75,6 +77,8 @@ from open_webui.utils.filter import (
     process_filter_functions,
 )
 from open_webui.utils.code_interpreter import execute_code_jupyter
+from open_webui.utils.tag_parser import ContentBlockTagParser
+from open_webui.utils.chat_save import CHAT_EVENT_WRITER, MESSAGE_WRITE_BUFFER
 
 from open_webui.tasks import create_task
 
@@ -82,6 +86,7 @@ from open_webui.config import (
     CACHE_DIR,
     DEFAULT_TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
     DEFAULT_CODE_INTERPRETER_PROMPT,
+    RAG_FULL_CONTEXT_MAX_TOKENS,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -368,63 +373,17 @@ async def chat_web_search_handler(
             }
         )
 
-        try:
-            results = await process_web_search(
-                request,
-                SearchForm(
-                    **{
-                        "query": searchQuery,
-                    }
-                ),
-                user=user,
-            )
-
-            if results:
-                all_results.append(results)
-                files = form_data.get("files", [])
-
-                if results.get("collection_names"):
-                    for col_idx, collection_name in enumerate(
-                        results.get("collection_names")
-                    ):
-                        files.append(
-                            {
-                                "collection_name": collection_name,
-                                "name": searchQuery,
-                                "type": "web_search",
-                                "urls": [results["filenames"][col_idx]],
-                            }
-                        )
-                elif results.get("docs"):
-                    # Invoked when bypass embedding and retrieval is set to True
-                    docs = results["docs"]
-
-                    if len(docs) == len(results["filenames"]):
-                        # the number of docs and filenames (urls) should be the same
-                        for doc_idx, doc in enumerate(docs):
-                            files.append(
-                                {
-                                    "docs": [doc],
-                                    "name": searchQuery,
-                                    "type": "web_search",
-                                    "urls": [results["filenames"][doc_idx]],
-                                }
-                            )
-                    else:
-                        # edge case when the number of docs and filenames (urls) are not the same
-                        # this should not happen, but if it does, we will just append the docs
-                        files.append(
-                            {
-                                "docs": results.get("docs", []),
-                                "name": searchQuery,
-                                "type": "web_search",
-                                "urls": results["filenames"],
-                            }
-                        )
+    # All the queries are searched concurrently
+    try:
+        query_results = await process_web_searches(request, queries, user=user)
+    except Exception as e:
+        log.exception(e)
+        query_results = [e] * len(queries)
 
-                form_data["files"] = files
-        except Exception as e:
-            log.exception(e)
+    # Pages found by several queries are only added once
+    added_urls = set()
+    for searchQuery, results in zip(queries, query_results):
+        if isinstance(results, Exception):
             await event_emitter(
                 {
                     "type": "status",
@@ -437,12 +396,68 @@ async def chat_web_search_handler(
                     },
                 }
             )
+            continue
+
+        if results:
+            all_results.append(results)
+            files = form_data.get("files", [])
+
+            if results.get("collection_names"):
+                for col_idx, collection_name in enumerate(
+                    results.get("collection_names")
+                ):
+                    url = results["filenames"][col_idx]
+                    if url in added_urls:
+                        continue
+                    added_urls.add(url)
+
+                    files.append(
+                        {
+                            "collection_name": collection_name,
+                            "name": searchQuery,
+                            "type": "web_search",
+                            "urls": [url],
+                        }
+                    )
+            elif results.get("docs"):
+                # Invoked when bypass embedding and retrieval is set to True
+                docs = results["docs"]
+
+                if len(docs) == len(results["filenames"]):
+                    # the number of docs and filenames (urls) should be the same
+                    for doc_idx, doc in enumerate(docs):
+                        url = results["filenames"][doc_idx]
+                        if url in added_urls:
+                            continue
+                        added_urls.add(url)
+
+                        files.append(
+                            {
+                                "docs": [doc],
+                                "name": searchQuery,
+                                "type": "web_search",
+                                "urls": [url],
+                            }
+                        )
+                else:
+                    # edge case when the number of docs and filenames (urls) are not the same
+                    # this should not happen, but if it does, we will just append the docs
+                    files.append(
+                        {
+                            "docs": results.get("docs", []),
+                            "name": searchQuery,
+                            "type": "web_search",
+                            "urls": results["filenames"],
+                        }
+                    )
+
+            form_data["files"] = files
 
     if all_results:
         urls = []
         for results in all_results:
             if "filenames" in results:
-                urls.extend(results["filenames"])
+                urls.extend(url for url in results["filenames"] if url not in urls)
 
         await event_emitter(
             {
@@ -610,6 +625,29 @@ async def chat_completion_files_handler(
         if len(queries) == 0:
             queries = [get_last_user_message(body["messages"])]
 
+        # Full context mode stops reading collections once the context window is filled,
+        # leaving room for the messages and the response
+        model_info = (body.get("metadata", {}).get("model") or {}).get("info") or {}
+        params = model_info.get("params") or {}
+        options = body.get("options") or {}
+        max_context_tokens = None
+        num_ctx = options.get("num_ctx") or params.get("num_ctx")
+        if num_ctx:
+            response_tokens = (
+                body.get("max_tokens")
+                or options.get("num_predict")
+                or params.get("max_tokens")
+                or num_ctx // 4
+            )
+            # Roughly four characters per token
+            prompt_tokens = len(get_messages_content(body["messages"])) // 4
+            max_context_tokens = max(num_ctx - response_tokens - prompt_tokens, 1)
+        if RAG_FULL_CONTEXT_MAX_TOKENS:
+            max_context_tokens = min(
+                max_context_tokens or RAG_FULL_CONTEXT_MAX_TOKENS,
+                RAG_FULL_CONTEXT_MAX_TOKENS,
+            )
+
         try:
             # Offload get_sources_from_files to a separate thread
             loop = asyncio.get_running_loop()
@@ -629,6 +667,7 @@ async def chat_completion_files_handler(
                         r=request.app.state.config.RELEVANCE_THRESHOLD,
                         hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
                         full_context=request.app.state.config.RAG_FULL_CONTEXT,
+                        max_context_tokens=max_context_tokens,
                     ),
                 )
         except Exception as e:
@@ -1119,7 +1158,10 @@ async def process_chat_response(
                         }
                     )
 
-                    # Save message in the database
+                    # Save message in the database, after the events written so far
+                    await CHAT_EVENT_WRITER.flush(
+                        metadata["chat_id"], metadata["message_id"]
+                    )
                     Chats.upsert_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
@@ -1357,152 +1399,7 @@ async def process_chat_response(
 
                 return messages
 
-            def tag_content_handler(content_type, tags, content, content_blocks):
-                end_flag = False
-
-                def extract_attributes(tag_content):
-                    """Extract attributes from a tag if they exist."""
-                    attributes = {}
-                    if not tag_content:  # Ensure tag_content is not None
-                        return attributes
-                    # Match attributes in the format: key="value" (ignores single quotes for simplicity)
-                    matches = re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content)
-                    for key, value in matches:
-                        attributes[key] = value
-                    return attributes
-
-                if content_blocks[-1]["type"] == "text":
-                    for start_tag, end_tag in tags:
-                        # Match start tag e.g., <tag> or <tag attr="value">
-                        start_tag_pattern = rf"<{re.escape(start_tag)}(\s.*?)?>"
-                        match = re.search(start_tag_pattern, content)
-                        if match:
-                            attr_content = (
-                                match.group(1) if match.group(1) else ""
-                            )  # Ensure it's not None
-                            attributes = extract_attributes(
-                                attr_content
-                            )  # Extract attributes safely
-
-                            # Capture everything before and after the matched tag
-                            before_tag = content[
-                                : match.start()
-                            ]  # Content before opening tag
-                            after_tag = content[
-                                match.end() :
-                            ]  # Content after opening tag
-
-                            # Remove the start tag and after from the currently handling text block
-                            content_blocks[-1]["content"] = content_blocks[-1][
-                                "content"
-                            ].replace(match.group(0) + after_tag, "")
-
-                            if before_tag:
-                                content_blocks[-1]["content"] = before_tag
-
-                            if not content_blocks[-1]["content"]:
-                                content_blocks.pop()
-
-                            # Append the new block
-                            content_blocks.append(
-                                {
-                                    "type": content_type,
-                                    "start_tag": start_tag,
-                                    "end_tag": end_tag,
-                                    "attributes": attributes,
-                                    "content": "",
-                                    "started_at": time.time(),
-                                }
-                            )
-
-                            if after_tag:
-                                content_blocks[-1]["content"] = after_tag
-
-                            break
-                elif content_blocks[-1]["type"] == content_type:
-                    start_tag = content_blocks[-1]["start_tag"]
-                    end_tag = content_blocks[-1]["end_tag"]
-                    # Match end tag e.g., </tag>
-                    end_tag_pattern = rf"<{re.escape(end_tag)}>"
-
-                    # Check if the content has the end tag
-                    if re.search(end_tag_pattern, content):
-                        end_flag = True
-
-                        block_content = content_blocks[-1]["content"]
-                        # Strip start and end tags from the content
-                        start_tag_pattern = rf"<{re.escape(start_tag)}(.*?)>"
-                        block_content = re.sub(
-                            start_tag_pattern, "", block_content
-                        ).strip()
-
-                        end_tag_regex = re.compile(end_tag_pattern, re.DOTALL)
-                        split_content = end_tag_regex.split(block_content, maxsplit=1)
-
-                        # Content inside the tag
-                        block_content = (
-                            split_content[0].strip() if split_content else ""
-                        )
-
-                        # Leftover content (everything after `</tag>`)
-                        leftover_content = (
-                            split_content[1].strip() if len(split_content) > 1 else ""
-                        )
-
-                        if block_content:
-                            content_blocks[-1]["content"] = block_content
-                            content_blocks[-1]["ended_at"] = time.time()
-                            content_blocks[-1]["duration"] = int(
-                                content_blocks[-1]["ended_at"]
-                                - content_blocks[-1]["started_at"]
-                            )
-
-                            # Reset the content_blocks by appending a new text block
-                            if content_type != "code_interpreter":
-                                if leftover_content:
-
-                                    content_blocks.append(
-                                        {
-                                            "type": "text",
-                                            "content": leftover_content,
-                                        }
-                                    )
-                                else:
-                                    content_blocks.append(
-                                        {
-                                            "type": "text",
-                                            "content": "",
-                                        }
-                                    )
-
-                        else:
-                            # Remove the block if content is empty
-                            content_blocks.pop()
-
-                            if leftover_content:
-                                content_blocks.append(
-                                    {
-                                        "type": "text",
-                                        "content": leftover_content,
-                                    }
-                                )
-                            else:
-                                content_blocks.append(
-                                    {
-                                        "type": "text",
-                                        "content": "",
-                                    }
-                                )
-
-                        # Clean processed content
-                        content = re.sub(
-                            rf"<{re.escape(start_tag)}(.*?)>(.|\n)*?<{re.escape(end_tag)}>",
-                            "",
-                            content,
-                            flags=re.DOTALL,
-                        )
-
-                return content, content_blocks, end_flag
+            stream = ChatCompletionStream(event_emitter)
 
             message = Chats.get_message_by_id_and_message_id(
                 metadata["chat_id"], metadata["message_id"]
@@ -1553,14 +1450,19 @@ async def process_chat_response(
 
             solution_tags = [("|begin_of_solution|", "|end_of_solution|")]
 
+            tag_parser = ContentBlockTagParser(
+                ([("reasoning", reasoning_tags)] if DETECT_REASONING else [])
+                + (
+                    [("code_interpreter", code_interpreter_tags)]
+                    if DETECT_CODE_INTERPRETER
+                    else []
+                )
+                + ([("solution", solution_tags)] if DETECT_SOLUTION else [])
+            )
+
             try:
                 for event in events:
-                    await event_emitter(
-                        {
-                            "type": "chat:completion",
-                            "data": event,
-                        }
-                    )
+                    await stream.emit(event)
 
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
@@ -1605,6 +1507,7 @@ async def process_chat_response(
 
                             if data:
                                 if "event" in data:
+                                    await stream.flush()
                                     await event_emitter(data.get("event", {}))
 
                                 if "selected_model_id" in data:
@@ -1621,24 +1524,10 @@ async def process_chat_response(
                                     if not choices:
                                         error = data.get("error", {})
                                         if error:
-                                            await event_emitter(
-                                                {
-                                                    "type": "chat:completion",
-                                                    "data": {
-                                                        "error": error,
-                                                    },
-                                                }
-                                            )
+                                            await stream.emit({"error": error})
                                         usage = data.get("usage", {})
                                         if usage:
-                                            await event_emitter(
-                                                {
-                                                    "type": "chat:completion",
-                                                    "data": {
-                                                        "usage": usage,
-                                                    },
-                                                }
-                                            )
+                                            await stream.emit({"usage": usage})
                                         continue
 
                                     delta = choices[0].get("delta", {})
@@ -1719,11 +1608,8 @@ async def process_chat_response(
 
                                         reasoning_block["content"] += reasoning_content
 
-                                        data = {
-                                            "content": serialize_content_blocks(
-                                                content_blocks
-                                            )
-                                        }
+                                        # Serialized when the next frame is sent
+                                        data = None
 
                                     if value:
                                         if (
@@ -1762,63 +1648,32 @@ async def process_chat_response(
                                             content_blocks[-1]["content"] + value
                                         )
 
-                                        if DETECT_REASONING:
-                                            content, content_blocks, _ = (
-                                                tag_content_handler(
-                                                    "reasoning",
-                                                    reasoning_tags,
-                                                    content,
-                                                    content_blocks,
-                                                )
-                                            )
-
-                                        if DETECT_CODE_INTERPRETER:
-                                            content, content_blocks, end = (
-                                                tag_content_handler(
-                                                    "code_interpreter",
-                                                    code_interpreter_tags,
-                                                    content,
-                                                    content_blocks,
-                                                )
-                                            )
-
-                                            if end:
-                                                break
-
-                                        if DETECT_SOLUTION:
-                                            content, content_blocks, _ = (
-                                                tag_content_handler(
-                                                    "solution",
-                                                    solution_tags,
-                                                    content,
-                                                    content_blocks,
-                                                )
-                                            )
+                                        # Only the new text is scanned for tags
+                                        if tag_parser.parse(content_blocks):
+                                            break
 
                                         if ENABLE_REALTIME_CHAT_SAVE:
-                                            # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                                            # Written to the database every interval,
+                                            # and only serialized then
+                                            MESSAGE_WRITE_BUFFER.update(
                                                 metadata["chat_id"],
                                                 metadata["message_id"],
                                                 {
-                                                    "content": serialize_content_blocks(
+                                                    "content": lambda: serialize_content_blocks(
                                                         content_blocks
                                                     ),
                                                 },
                                             )
                                         else:
-                                            data = {
-                                                "content": serialize_content_blocks(
-                                                    content_blocks
-                                                ),
-                                            }
+                                            # Serialized when the next frame is sent
+                                            data = None
 
-                                await event_emitter(
-                                    {
-                                        "type": "chat:completion",
-                                        "data": data,
-                                    }
-                                )
+                                if data is None:
+                                    await stream.update(
+                                        lambda: serialize_content_blocks(content_blocks)
+                                    )
+                                else:
+                                    await stream.emit(data)
                         except Exception as e:
                             done = "data: [DONE]" in line
                             if done:
@@ -1868,13 +1723,8 @@ async def process_chat_response(
                         }
                     )
 
-                    await event_emitter(
-                        {
-                            "type": "chat:completion",
-                            "data": {
-                                "content": serialize_content_blocks(content_blocks),
-                            },
-                        }
+                    await stream.emit(
+                        {"content": serialize_content_blocks(content_blocks)}
                     )
 
                     tools = metadata.get("tools", {})
@@ -1980,13 +1830,8 @@ async def process_chat_response(
                         }
                     )
 
-                    await event_emitter(
-                        {
-                            "type": "chat:completion",
-                            "data": {
-                                "content": serialize_content_blocks(content_blocks),
-                            },
-                        }
+                    await stream.emit(
+                        {"content": serialize_content_blocks(content_blocks)}
                     )
 
                     try:
@@ -2020,13 +1865,8 @@ async def process_chat_response(
                         content_blocks[-1]["type"] == "code_interpreter"
                         and retries < MAX_RETRIES
                     ):
-                        await event_emitter(
-                            {
-                                "type": "chat:completion",
-                                "data": {
-                                    "content": serialize_content_blocks(content_blocks),
-                                },
-                            }
+                        await stream.emit(
+                            {"content": serialize_content_blocks(content_blocks)}
                         )
 
                         retries += 1
@@ -2157,13 +1997,8 @@ async def process_chat_response(
                             }
                         )
 
-                        await event_emitter(
-                            {
-                                "type": "chat:completion",
-                                "data": {
-                                    "content": serialize_content_blocks(content_blocks),
-                                },
-                            }
+                        await stream.emit(
+                            {"content": serialize_content_blocks(content_blocks)}
                         )
 
                         try:
@@ -2200,7 +2035,14 @@ async def process_chat_response(
                     "title": title,
                 }
 
-                if not ENABLE_REALTIME_CHAT_SAVE:
+                await CHAT_EVENT_WRITER.flush(
+                    metadata["chat_id"], metadata["message_id"]
+                )
+                if ENABLE_REALTIME_CHAT_SAVE:
+                    await MESSAGE_WRITE_BUFFER.flush(
+                        metadata["chat_id"], metadata["message_id"]
+                    )
+                else:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
@@ -2214,6 +2056,7 @@ async def process_chat_response(
                 if get_active_status_by_user_id(user.id) is None:
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
                     if webhook_url:
+                        content = tag_parser.strip_blocks(content)
                         post_webhook(
                             request.app.state.WEBUI_NAME,
                             webhook_url,
@@ -2226,19 +2069,22 @@ async def process_chat_response(
                             },
                         )
 
-                await event_emitter(
-                    {
-                        "type": "chat:completion",
-                        "data": data,
-                    }
-                )
+                await stream.emit(data)
 
                 await background_tasks_handler()
             except asyncio.CancelledError:
                 log.warning("Task was cancelled!")
+                stream.cancel()
                 await event_emitter({"type": "task-cancelled"})
 
-                if not ENABLE_REALTIME_CHAT_SAVE:
+                await CHAT_EVENT_WRITER.flush(
+                    metadata["chat_id"], metadata["message_id"]
+                )
+                if ENABLE_REALTIME_CHAT_SAVE:
+                    await MESSAGE_WRITE_BUFFER.flush(
+                        metadata["chat_id"], metadata["message_id"]
+                    )
+                else:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import IO, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: jobs are only serialized within the process
+    fcntl = None
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.config import RAG_REINDEX_CONCURRENCY
+from open_webui.env import DATA_DIR, SRC_LOG_LEVELS
+from open_webui.models.files import Files
+from open_webui.models.knowledge import Knowledges
+from open_webui.models.users import Users
+from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.routers.retrieval import ProcessFileForm, index_file
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+REINDEX_CHECKPOINT_PATH = DATA_DIR / "knowledge_reindex.json"
+REINDEX_LOCK_PATH = DATA_DIR / "knowledge_reindex.lock"
+
+_reindex_task: Optional[asyncio.Task] = None
+
+
+####################################
+#
+# Checkpoint
+#
+####################################
+
+
+def load_checkpoint() -> Optional[dict]:
+    try:
+        with open(REINDEX_CHECKPOINT_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.exception(f"Error loading reindex checkpoint: {e}")
+        return None
+
+
+def save_checkpoint(job: dict):
+    job["updated_at"] = int(time.time())
+
+    # Write to a temporary file first so a crash never leaves a truncated checkpoint
+    tmp_path = f"{REINDEX_CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, REINDEX_CHECKPOINT_PATH)
+
+
+def get_shadow_collection_name(collection_name: str, job_id: str) -> str:
+    # Unique per job: on the vector databases that swap collections through an alias,
+    # the shadow collection of the previous job is the live one
+    return f"{collection_name}-reindex-{job_id[:8]}"
+
+
+def get_shadow_collection_names() -> list[str]:
+    job = load_checkpoint()
+    if job is None or job["status"] != "running":
+        return []
+    return [
+        get_shadow_collection_name(knowledge_id, job["id"])
+        for knowledge_id in job["knowledge_bases"]
+    ]
+
+
+def get_reindex_status() -> Optional[dict]:
+    job = load_checkpoint()
+    if job is None:
+        return None
+
+    knowledge_bases = job["knowledge_bases"].values()
+    return {
+        **job,
+        "running": is_reindex_running(),
+        "total_files": sum(kb["total"] for kb in knowledge_bases),
+        "processed_files": sum(
+            len(kb["completed_file_ids"]) + len(kb["failed_files"])
+            for kb in knowledge_bases
+        ),
+    }
+
+
+def is_reindex_running() -> bool:
+    if _reindex_task is not None and not _reindex_task.done():
+        return True
+
+    # The job may run in another worker, which holds the lock
+    lock = acquire_reindex_lock()
+    if lock is None:
+        return True
+    lock.close()
+    return False
+
+
+def acquire_reindex_lock() -> Optional[IO]:
+    """
+    Every worker may start or resume the job: the one holding the lock on the
+    checkpoint runs it, until the returned file is closed.
+    """
+    f = open(REINDEX_LOCK_PATH, "a")
+    if fcntl:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
+
+
+####################################
+#
+# Job
+#
+####################################
+
+
+def create_reindex_job(user_id: str) -> dict:
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "running",
+        "user_id": user_id,
+        "started_at": int(time.time()),
+        "updated_at": int(time.time()),
+        "knowledge_bases": {
+            knowledge_base.id: {
+                "status": "pending",
+                "total": len((knowledge_base.data or {}).get("file_ids", [])),
+                "completed_file_ids": [],
+                "failed_files": [],
+            }
+            for knowledge_base in Knowledges.get_knowledge_bases()
+        },
+    }
+    save_checkpoint(job)
+    return job
+
+
+async def reindex_knowledge_base(
+    request: Request,
+    job: dict,
+    knowledge_id: str,
+    user,
+    semaphore: asyncio.Semaphore,
+):
+    progress = job["knowledge_bases"][knowledge_id]
+    knowledge = Knowledges.get_knowledge_by_id(knowledge_id)
+    if knowledge is None:
+        progress["status"] = "failed"
+        save_checkpoint(job)
+        return
+
+    # The new index is built next to the live collection, which keeps serving searches
+    shadow_collection_name = get_shadow_collection_name(knowledge.id, job["id"])
+    if progress["status"] == "pending" and VECTOR_DB_CLIENT.has_collection(
+        collection_name=shadow_collection_name
+    ):
+        # Leftover from an aborted job that was not resumed
+        VECTOR_DB_CLIENT.delete_collection(collection_name=shadow_collection_name)
+
+    progress["status"] = "running"
+    # Files that failed before a restart are retried
+    progress["failed_files"] = []
+    save_checkpoint(job)
+
+    async def reindex_file(file):
+        async with semaphore:
+            try:
+                # The files keep their live collection in their metadata, as the
+                # shadow collection is only a name until the swap
+                await run_in_threadpool(
+                    index_file,
+                    request,
+                    ProcessFileForm(
+                        file_id=file.id, collection_name=shadow_collection_name
+                    ),
+                    user=user,
+                    save_collection_name=False,
+                )
+                progress["completed_file_ids"].append(file.id)
+            except HTTPException as e:
+                if e.detail == ERROR_MESSAGES.DUPLICATE_CONTENT:
+                    # Indexed before a restart, but not checkpointed yet
+                    progress["completed_file_ids"].append(file.id)
+                else:
+                    log.error(
+                        f"Error processing file {file.filename} (ID: {file.id}): {e.detail}"
+                    )
+                    progress["failed_files"].append(
+                        {"file_id": file.id, "error": str(e.detail)}
+                    )
+            except Exception as e:
+                log.error(
+                    f"Error processing file {file.filename} (ID: {file.id}): {str(e)}"
+                )
+                progress["failed_files"].append({"file_id": file.id, "error": str(e)})
+
+            save_checkpoint(job)
+
+    # Files added to the knowledge base while the job runs go to the live collection,
+    # which the swap replaces: the file ids are read again until none is new
+    attempted_file_ids = set(progress["completed_file_ids"])
+    while True:
+        knowledge = Knowledges.get_knowledge_by_id(knowledge_id)
+        if knowledge is None:
+            progress["status"] = "failed"
+            save_checkpoint(job)
+            return
+
+        file_ids = (knowledge.data or {}).get("file_ids", [])
+        new_file_ids = [id for id in file_ids if id not in attempted_file_ids]
+        if not new_file_ids:
+            break
+
+        attempted_file_ids.update(new_file_ids)
+        progress["total"] = len(file_ids)
+        await asyncio.gather(
+            *[reindex_file(file) for file in Files.get_files_by_ids(new_file_ids)]
+        )
+
+    if progress["failed_files"]:
+        # Swapping would drop the failed files from the knowledge base: the live
+        # collection is kept as it is
+        log.warning(
+            f"Failed to process {len(progress['failed_files'])} files in knowledge base {knowledge.id}, keeping its collection"
+        )
+        if VECTOR_DB_CLIENT.has_collection(collection_name=shadow_collection_name):
+            VECTOR_DB_CLIENT.delete_collection(collection_name=shadow_collection_name)
+        progress["status"] = "failed"
+        save_checkpoint(job)
+        return
+
+    # Files removed from the knowledge base while the job runs
+    removed_file_ids = set(progress["completed_file_ids"]) - set(file_ids)
+    if removed_file_ids and VECTOR_DB_CLIENT.has_collection(
+        collection_name=shadow_collection_name
+    ):
+        for file_id in removed_file_ids:
+            VECTOR_DB_CLIENT.delete(
+                collection_name=shadow_collection_name, filter={"file_id": file_id}
+            )
+
+    # Swap the shadow collection in place of the live one
+    try:
+        if VECTOR_DB_CLIENT.has_collection(collection_name=shadow_collection_name):
+            await run_in_threadpool(
+                VECTOR_DB_CLIENT.rename_collection,
+                shadow_collection_name,
+                knowledge.id,
+            )
+        elif VECTOR_DB_CLIENT.has_collection(collection_name=knowledge.id):
+            # Nothing was indexed, e.g. the knowledge base has no files
+            VECTOR_DB_CLIENT.delete_collection(collection_name=knowledge.id)
+        progress["status"] = "completed"
+    except Exception as e:
+        log.exception(f"Error swapping collection {knowledge.id}: {e}")
+        progress["status"] = "failed"
+
+    save_checkpoint(job)
+
+
+async def run_reindex_job(app: FastAPI, job: dict, lock: IO):
+    try:
+        await reindex_knowledge_bases(app, job)
+    finally:
+        lock.close()
+
+
+async def reindex_knowledge_bases(app: FastAPI, job: dict):
+    user = Users.get_user_by_id(job["user_id"])
+    request = Request({"type": "http", "app": app})
+    semaphore = asyncio.Semaphore(RAG_REINDEX_CONCURRENCY)
+
+    knowledge_ids = [
+        knowledge_id
+        for knowledge_id, progress in job["knowledge_bases"].items()
+        if progress["status"] in ["pending", "running"]
+    ]
+    log.info(f"Starting reindexing for {len(knowledge_ids)} knowledge bases")
+
+    try:
+        await asyncio.gather(
+            *[
+                reindex_knowledge_base(request, job, knowledge_id, user, semaphore)
+                for knowledge_id in knowledge_ids
+            ]
+        )
+        job["status"] = "completed"
+        log.info("Reindexing completed successfully")
+    except Exception as e:
+        log.exception(f"Error during reindexing: {e}")
+        job["status"] = "failed"
+    finally:
+        save_checkpoint(job)
+
+
+def start_reindex_job(app: FastAPI, user_id: str) -> dict:
+    global _reindex_task
+
+    if _reindex_task is not None and not _reindex_task.done():
+        return load_checkpoint()
+
+    lock = acquire_reindex_lock()
+    if lock is None:
+        # Running in another worker
+        return load_checkpoint()
+
+    job = create_reindex_job(user_id)
+    _reindex_task = asyncio.create_task(run_reindex_job(app, job, lock))
+    return job
+
+
+def resume_reindex_job(app: FastAPI):
+    """
+    Resume a reindex job that was interrupted by a restart, using its checkpoint.
+    """
+    global _reindex_task
+
+    if _reindex_task is not None and not _reindex_task.done():
+        return
+
+    lock = acquire_reindex_lock()
+    if lock is None:
+        # Resumed, or still running, in another worker
+        return
+
+    job = load_checkpoint()
+    if job is None or job["status"] != "running":
+        lock.close()
+        return
+
+    log.info(f"Resuming reindex job {job['id']}")
+    _reindex_task = asyncio.create_task(run_reindex_job(app, job, lock))
@@ -0,0 +1,163 @@
+import re
+import time
+from typing import Optional
+
+
+def extract_attributes(tag_content: str) -> dict:
+    # Attributes in the format key="value"
+    return dict(re.findall(r'(\w+)\s*=\s*"([^"]+)"', tag_content or ""))
+
+
+class ContentBlockTagParser:
+    """
+    Splits a streamed response into content blocks on tags such as <think>...</think>,
+    as they arrive. Only the text added since the last call is scanned, plus the end of
+    the last block while it may hold the start of a tag split across chunks, so a
+    stream is parsed in linear time.
+
+    tag_groups lists the block types and their (start_tag, end_tag) pairs, e.g.
+    [("reasoning", [("think", "/think")])]. Start tags are looked for in text blocks,
+    the end tag of an open block in that block.
+    """
+
+    def __init__(self, tag_groups: list[tuple[str, list[tuple[str, str]]]]):
+        self.tags = {
+            start_tag: (content_type, end_tag)
+            for content_type, tags in tag_groups
+            for start_tag, end_tag in tags
+        }
+        self.start_tag_pattern = (
+            re.compile(
+                rf"<({'|'.join(re.escape(start_tag) for start_tag in self.tags)})(\s.*?)?>"
+            )
+            if self.tags
+            else None
+        )
+        self.content_types = {content_type for content_type, _ in tag_groups}
+
+        # Last block scanned, and where its unscanned content starts
+        self.block: Optional[dict] = None
+        self.scan_from = 0
+
+    def _may_start_tag(self, content: str, start: int) -> bool:
+        # Whether the end of the content, from a "<" at start, can still become a tag
+        tail = content[start + 1 :]
+        if ">" in tail:
+            return False
+        for start_tag in self.tags:
+            if start_tag.startswith(tail):
+                return True
+            if (
+                tail.startswith(start_tag)
+                and tail[len(start_tag)].isspace()
+                and "\n" not in tail[len(start_tag) + 1 :]
+            ):
+                return True
+        return False
+
+    def _get_text_scan_from(self, content: str, start: int) -> int:
+        index = content.find("<", start)
+        while index != -1:
+            if self._may_start_tag(content, index):
+                return index
+            index = content.find("<", index + 1)
+        return len(content)
+
+    def _open_block(self, content_blocks: list[dict]) -> bool:
+        block = content_blocks[-1]
+        match = self.start_tag_pattern.search(block["content"], self.scan_from)
+        if match is None:
+            self.scan_from = self._get_text_scan_from(block["content"], self.scan_from)
+            return False
+
+        start_tag = match.group(1)
+        content_type, end_tag = self.tags[start_tag]
+        before_tag = block["content"][: match.start()]
+        after_tag = block["content"][match.end() :]
+
+        block["content"] = before_tag
+        if not before_tag:
+            content_blocks.pop()
+
+        content_blocks.append(
+            {
+                "type": content_type,
+                "start_tag": start_tag,
+                "end_tag": end_tag,
+                "attributes": extract_attributes(match.group(2)),
+                "content": after_tag,
+                "started_at": time.time(),
+            }
+        )
+        self.block = content_blocks[-1]
+        self.scan_from = 0
+        return True
+
+    def _close_block(self, content_blocks: list[dict]) -> bool:
+        block = content_blocks[-1]
+        end_tag = f"<{block['end_tag']}>"
+        index = block["content"].find(end_tag, self.scan_from)
+        if index == -1:
+            # The end tag may be split across chunks
+            self.scan_from = max(0, len(block["content"]) - len(end_tag) + 1)
+            return False
+
+        block_content = re.sub(
+            rf"<{re.escape(block['start_tag'])}(.*?)>",
+            "",
+            block["content"][:index],
+        ).strip()
+        leftover_content = block["content"][index + len(end_tag) :].strip()
+
+        if block_content:
+            block["content"] = block_content
+            block["ended_at"] = time.time()
+            block["duration"] = int(block["ended_at"] - block["started_at"])
+        else:
+            content_blocks.pop()
+
+        # Code is run before the response continues, in a new text block
+        if not block_content or block["type"] != "code_interpreter":
+            content_blocks.append({"type": "text", "content": leftover_content})
+        self.block = content_blocks[-1]
+        self.scan_from = 0
+        return True
+
+    def strip_blocks(self, content: str) -> str:
+        # The content without the closed blocks
+        for start_tag, (_, end_tag) in self.tags.items():
+            content = re.sub(
+                rf"<{re.escape(start_tag)}(.*?)>(.|\n)*?<{re.escape(end_tag)}>",
+                "",
+                content,
+                flags=re.DOTALL,
+            )
+        return content
+
+    def parse(self, content_blocks: list[dict]) -> bool:
+        """
+        Update the content blocks after text was appended to the last one. Returns True
+        once a code_interpreter block is closed, which ends the response.
+        """
+        if self.start_tag_pattern is None:
+            return False
+
+        if content_blocks[-1] is not self.block:
+            # New block, e.g. after tool calls
+            self.block = content_blocks[-1]
+            self.scan_from = 0
+        self.scan_from = min(self.scan_from, len(self.block["content"]))
+
+        while True:
+            block = content_blocks[-1]
+            if block["type"] == "text":
+                if not self._open_block(content_blocks):
+                    return False
+            elif block["type"] in self.content_types and "ended_at" not in block:
+                closed_type = block["type"]
+                if not self._close_block(content_blocks):
+                    return False
+                if closed_type == "code_interpreter":
+                    return True
+            else:
+                return False
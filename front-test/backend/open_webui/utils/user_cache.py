@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from open_webui.env import (
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+    USER_CACHE_TTL,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+REDIS_USER_CACHE_CHANNEL = "open-webui:user-cache"
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class UserCache:
+    """
+    Users of the authenticated requests, kept for ttl seconds by user id and by API key
+    hash, along with their resolved group access. Writes of a user invalidate it, and
+    writes of any group the access of every user; with Redis, the invalidations are
+    published so every worker drops them, and a worker that lost the channel drops
+    everything.
+
+    Last active timestamps are kept in memory too, and written in one batch every flush
+    interval.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        flush_interval: float,
+        redis_url: Optional[str] = None,
+        redis_sentinels: Optional[list] = [],
+    ):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        # user id -> (expiry, user), API key hash -> (expiry, user id)
+        self.users: dict[str, tuple[float, object]] = {}
+        self.api_keys: dict[str, tuple[float, str]] = {}
+        # user id -> (expiry, access)
+        self.access: dict[str, tuple[float, object]] = {}
+        # Incremented on every invalidation, so that a user read from the database
+        # before it is not cached after it
+        self.version = 0
+
+        # user id -> last active timestamp not written yet
+        self.last_active: dict[str, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+        self.redis = None
+        if ttl > 0 and redis_url:
+            self.redis = get_redis_connection(
+                redis_url, redis_sentinels, decode_responses=True
+            )
+            # Invalidations published by this worker are already applied
+            self.origin = str(uuid.uuid4())
+            threading.Thread(
+                target=self._listen, name="user-cache-listener", daemon=True
+            ).start()
+
+    def get(self, user_id: str):
+        entry = self.users.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        # Callers may modify the user they are given
+        return entry[1].model_copy(deep=True)
+
+    def get_by_api_key(self, api_key: str):
+        entry = self.api_keys.get(hash_api_key(api_key))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return self.get(entry[1])
+
+    def set(self, user, version: int, api_key: Optional[str] = None):
+        if self.ttl <= 0 or version != self.version:
+            return
+
+        expiry = time.monotonic() + self.ttl
+        self.users[user.id] = (expiry, user.model_copy(deep=True))
+        if api_key:
+            self.api_keys[hash_api_key(api_key)] = (expiry, user.id)
+
+        if len(self.users) > 10000:
+            self.evict()
+
+    def get_access(self, user_id: str):
+        # Shared, not copied: the access is never modified
+        entry = self.access.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set_access(self, user_id: str, access, version: int):
+        if self.ttl <= 0 or version != self.version:
+            return
+
+        self.access[user_id] = (time.monotonic() + self.ttl, access)
+        if len(self.access) > 10000:
+            self.evict()
+
+    def evict(self):
+        now = time.monotonic()
+        for user_id, (expiry, _) in list(self.users.items()):
+            if expiry < now:
+                self.users.pop(user_id, None)
+        for user_id, (expiry, _) in list(self.access.items()):
+            if expiry < now:
+                self.access.pop(user_id, None)
+        for key_hash, (expiry, _) in list(self.api_keys.items()):
+            if expiry < now:
+                self.api_keys.pop(key_hash, None)
+
+    def invalidate(self, user_id: str, publish: bool = True):
+        self.version += 1
+        self.users.pop(user_id, None)
+        self.access.pop(user_id, None)
+        for key_hash, (_, key_user_id) in list(self.api_keys.items()):
+            if key_user_id == user_id:
+                self.api_keys.pop(key_hash, None)
+
+        if publish:
+            self.publish({"user_id": user_id})
+
+    def invalidate_groups(self, publish: bool = True):
+        self.version += 1
+        self.access.clear()
+
+        if publish:
+            self.publish({"groups": True})
+
+    def publish(self, invalidation: dict):
+        if self.redis is None:
+            return
+
+        try:
+            self.redis.publish(
+                REDIS_USER_CACHE_CHANNEL,
+                json.dumps({**invalidation, "origin": self.origin}),
+            )
+        except Exception as e:
+            log.warning(f"Error publishing the user cache invalidation: {e}")
+
+    def clear(self):
+        self.version += 1
+        self.users.clear()
+        self.api_keys.clear()
+        self.access.clear()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_USER_CACHE_CHANNEL)
+                # Invalidations published while disconnected are lost
+                self.clear()
+
+                for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except json.JSONDecodeError:
+                        continue
+                    if data.get("origin") == self.origin:
+                        continue
+                    if data.get("groups"):
+                        self.invalidate_groups(publish=False)
+                    else:
+                        self.invalidate(data["user_id"], publish=False)
+            except Exception as e:
+                log.warning(f"User cache listener disconnected from Redis: {e}")
+                time.sleep(1)
+
+    def update_last_active(self, user_id: str):
+        self.last_active[user_id] = int(time.time())
+
+    async def flush(self):
+        if not self.last_active:
+            return
+
+        last_active, self.last_active = self.last_active, {}
+        await run_in_threadpool(self.write_last_active, last_active)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.exception(f"Error writing last active timestamps: {e}")
+
+    def start(self, write_last_active: Callable[[dict[str, int]], None]):
+        self.write_last_active = write_last_active
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            await self.flush()
+
+
+USER_CACHE = UserCache(
+    USER_CACHE_TTL,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
+    redis_url=REDIS_URL,
+    redis_sentinels=get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+)